@@ -1,5 +1,10 @@
+import atexit
 import os
 import pickle
+import shutil
+import subprocess
+import tempfile
+from itertools import count
 
 import casadi as ca
 import errno
@@ -112,6 +117,29 @@ def zeros(x, y):
     return ca.SX.zeros(x, y)
 
 
+def sparse_zeros(x, y):
+    """
+    :return: x times y matrix without any structural nonzeros
+    """
+    return ca.SX(x, y)
+
+
+def vstack(rows):
+    """
+    :param rows: matrices with the same number of columns
+    :type rows: list
+    :return: matrix with rows stacked on top of each other
+    """
+    return ca.vertcat(*rows)
+
+
+def veccat(*args):
+    """
+    :return: column vector containing all entries of args
+    """
+    return ca.veccat(*args)
+
+
 def Abs(x):
     """
     :type x: Union[float, Symbol]
@@ -222,31 +250,110 @@ def safe_compiled_function(f, file_name):
         except OSError as exc:  # Guard against race condition
             if exc.errno != errno.EEXIST:
                 raise
-    with open(file_name, 'w') as file:
-        pickle.dump(f, file)
+    with open(file_name, 'wb') as file:
+        pickle.dump(f, file, protocol=pickle.HIGHEST_PROTOCOL)
         logging.loginfo(u'saved {}'.format(file_name))
 
 
 def load_compiled_function(file_name):
+    """
+    :param file_name: file created with safe_compiled_function
+    :type file_name: str
+    :return: the unpickled object or None if it doesn't exist or is broken, broken files are deleted
+    """
     if os.path.isfile(file_name):
         try:
-            with open(file_name, u'r') as file:
+            with open(file_name, u'rb') as file:
                 fast_f = pickle.load(file)
-                return fast_f
-        except EOFError as e:
-            os.remove(file_name)
-            logging.logerr(u'{} deleted because it was corrupted'.format(file_name))
+            # mark as recently used, limit_function_cache_size deletes the least recently used files first
+            os.utime(file_name, None)
+            return fast_f
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            remove_cache_entry(file_name)
+            logging.logerr(u'{} deleted because it was corrupted: {}'.format(file_name, e))
+        except RuntimeError as e:
+            # raised by ca.external if the shared library of a compiled function is missing or broken
+            remove_cache_entry(file_name)
+            logging.logerr(u'{} deleted because its shared library could not be loaded: {}'.format(file_name, e))
+
+
+def get_cache_entry(path):
+    """
+    :return: path of the pickle that belongs to path, shared libraries belong to the pickle with the same name
+    :rtype: str
+    """
+    if path.endswith(u'.so'):
+        return path[:-len(u'.so')]
+    return path
+
+
+def remove_cache_entry(file_name):
+    """
+    Deletes a pickled function and its shared library.
+    :type file_name: str
+    """
+    for path in (file_name, file_name + u'.so'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def limit_function_cache_size(folder, max_size):
+    """
+    Deletes the least recently used functions in folder and its sub folders until their total size is below max_size.
+    A pickled function and its shared library are deleted together, their size is the sum of both files and the
+    more recently used one of them determines when they were used last.
+    :param folder: folder in which compiled functions are saved
+    :type folder: str
+    :param max_size: in bytes
+    :type max_size: int
+    """
+    entries = {}
+    for root, _, file_names in os.walk(folder):
+        for file_name in file_names:
+            path = os.path.join(root, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = get_cache_entry(path)
+            mtime, size = entries.get(entry, (stat.st_mtime, 0))
+            entries[entry] = (max(mtime, stat.st_mtime), size + stat.st_size)
+    total_size = sum(size for _, size in entries.values())
+    for mtime, size, entry in sorted((mtime, size, entry) for entry, (mtime, size) in entries.items()):
+        if total_size <= max_size:
+            break
+        remove_cache_entry(entry)
+        total_size -= size
+        logging.loginfo(u'deleted {} to keep the function cache below {}MB'.format(entry, max_size / 1e6))
 
 
 class CompiledFunction(object):
-    def __init__(self, str_params, fast_f, l, shape):
+    def __init__(self, str_params, fast_f, l, shape, library=None):
         self.str_params = str_params
         self.fast_f = fast_f
         self.shape = shape
+        self.library = library
         self.buf, self.f_eval = fast_f.buffer()
         self.out = np.zeros(self.shape, order='F')
         self.buf.set_res(0, memoryview(self.out))
 
+    def __getstate__(self):
+        # buffers can't be pickled, they are recreated in __setstate__
+        if self.library is not None:
+            # only remember where the shared library is, it gets loaded again in __setstate__
+            return self.str_params, None, self.shape, self.library
+        return self.str_params, self.fast_f, self.shape, None
+
+    def __setstate__(self, state):
+        str_params, fast_f, shape, library = state
+        if library is not None:
+            fast_f = ca.external(u'f', library)
+            # mark as recently used, limit_function_cache_size deletes the least recently used files first
+            os.utime(library, None)
+        self.__init__(str_params, fast_f, 0, shape, library)
+
     def __call__(self, **kwargs):
         filtered_args = [kwargs[k] for k in self.str_params]
         return self.call2(filtered_args)
@@ -258,13 +365,76 @@ class CompiledFunction(object):
         :return:
         """
 
-        filtered_args = np.array(filtered_args, dtype=float)
+        # float64 arrays, e.g. from a god map SymbolVector, are used without copying them
+        filtered_args = np.asarray(filtered_args, dtype=float)
         self.buf.set_arg(0, memoryview(filtered_args))
         self.f_eval()
         return self.out
 
 
-def speed_up(function, parameters, backend=u'clang'):
+_temporary_library_folder = None
+_temporary_library_ids = count()
+
+
+def get_temporary_library_name():
+    """
+    :return: path without file ending in a temporary folder, which is deleted when the process exits
+    :rtype: str
+    """
+    global _temporary_library_folder
+    if _temporary_library_folder is None:
+        _temporary_library_folder = tempfile.mkdtemp(prefix=u'giskardpy_')
+        atexit.register(shutil.rmtree, _temporary_library_folder, True)
+    return os.path.join(_temporary_library_folder, u'f{}'.format(next(_temporary_library_ids)))
+
+
+def compile_to_shared_library(f, compiler, file_name=None):
+    """
+    Generates c code for f and compiles it into a shared library with the system compiler.
+    :param f: casadi function
+    :type f: ca.Function
+    :param compiler: name of the compiler executable, e.g. gcc or clang
+    :type compiler: str
+    :param file_name: path of the library without file ending, a temporary file that is deleted when the process
+                      exits is used if None
+    :type file_name: str
+    :return: f loaded from the shared library and the path to the library
+    :rtype: (ca.Function, str)
+    """
+    if file_name is None:
+        file_name = get_temporary_library_name()
+    folder, name = os.path.split(file_name)
+    if folder and not os.path.exists(folder):
+        try:
+            os.makedirs(folder)
+        except OSError as exc:  # Guard against race condition
+            if exc.errno != errno.EEXIST:
+                raise
+    c_file = file_name + u'.c'
+    library = file_name + u'.so'
+    cg = ca.CodeGenerator(name + u'.c')
+    cg.add(f)
+    cg.generate(os.path.join(folder, u''))
+    try:
+        subprocess.check_call([compiler, u'-O1', u'-fPIC', u'-shared', c_file, u'-o', library])
+    finally:
+        os.remove(c_file)
+    return ca.external(f.name(), library), library
+
+
+def speed_up(function, parameters, backend=None, file_name=None):
+    """
+    :param function: expression that will be compiled
+    :param parameters: free symbols of function, the compiled function expects the values in this order
+    :type parameters: list
+    :param backend: None uses the casadi virtual machine,
+                    the name of a c compiler (e.g. gcc or clang) generates c code and compiles it into a shared library,
+                    which takes longer to create but is faster to evaluate.
+    :type backend: str
+    :param file_name: where the shared library is saved without file ending, only used if backend is not None.
+    :type file_name: str
+    :rtype: CompiledFunction
+    """
     str_params = [str(x) for x in parameters]
     try:
         f = ca.Function('f', [Matrix(parameters)], [ca.densify(function)])
@@ -273,7 +443,94 @@ def speed_up(function, parameters, backend=u'clang'):
         f = ca.Function('f', [Matrix(parameters)], ca.densify(function))
         # except:
         #     f = ca.Function('f', parameters, [ca.densify(function)])
-    return CompiledFunction(str_params, f, 0, function.shape)
+    library = None
+    if backend is not None:
+        try:
+            f, library = compile_to_shared_library(f, backend, file_name)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.logwarn(u'failed to compile function with {}, using casadi instead: {}'.format(backend, e))
+    return CompiledFunction(str_params, f, 0, function.shape, library)
+
+
+class CompiledSparseFunction(object):
+    """
+    Function with multiple outputs that only evaluates their structural nonzeros.
+    The nonzeros are scattered into dense numpy arrays, which are allocated once and reused in every call.
+    """
+
+    def __init__(self, str_params, fast_f, library=None):
+        self.str_params = str_params
+        self.fast_f = fast_f
+        self.library = library
+        self.buf, self.f_eval = fast_f.buffer()
+        self.out = []
+        self.nonzeros = []
+        self.indices = []
+        for i in range(fast_f.n_out()):
+            sparsity = fast_f.sparsity_out(i)
+            rows, columns = sparsity.get_triplet()
+            nonzeros = np.zeros(sparsity.nnz())
+            self.buf.set_res(i, memoryview(nonzeros))
+            self.nonzeros.append(nonzeros)
+            if sparsity.shape[1] == 1:
+                # column vectors are returned as 1d arrays
+                self.out.append(np.zeros(sparsity.shape[0]))
+                self.indices.append(np.array(rows, dtype=int))
+            else:
+                self.out.append(np.zeros(sparsity.shape))
+                self.indices.append(np.array(rows, dtype=int) * sparsity.shape[1] + np.array(columns, dtype=int))
+
+    def __getstate__(self):
+        # buffers can't be pickled, they are recreated in __setstate__
+        if self.library is not None:
+            return self.str_params, None, self.library
+        return self.str_params, self.fast_f, None
+
+    def __setstate__(self, state):
+        str_params, fast_f, library = state
+        if library is not None:
+            fast_f = ca.external(u'f', library)
+            os.utime(library, None)
+        self.__init__(str_params, fast_f, library)
+
+    def call2(self, filtered_args):
+        """
+        :param filtered_args: parameter values in the same order as in self.str_params
+        :type filtered_args: list
+        :return: one array per output, they are overwritten by the next call
+        :rtype: list
+        """
+        # float64 arrays, e.g. from a god map SymbolVector, are used without copying them
+        filtered_args = np.asarray(filtered_args, dtype=float)
+        self.buf.set_arg(0, memoryview(filtered_args))
+        self.f_eval()
+        for out, indices, nonzeros in zip(self.out, self.indices, self.nonzeros):
+            out.put(indices, nonzeros)
+        return self.out
+
+
+def speed_up_sparse(functions, parameters, backend=None, file_name=None):
+    """
+    Like speed_up, but compiles multiple expressions into one function without densifying them.
+    :param functions: expressions that will be compiled
+    :type functions: list
+    :param parameters: free symbols of functions, the compiled function expects the values in this order
+    :type parameters: list
+    :param backend: see speed_up
+    :type backend: str
+    :param file_name: see speed_up
+    :type file_name: str
+    :rtype: CompiledSparseFunction
+    """
+    str_params = [str(x) for x in parameters]
+    f = ca.Function('f', [Matrix(parameters)], [ca.sparsify(x) for x in functions])
+    library = None
+    if backend is not None:
+        try:
+            f, library = compile_to_shared_library(f, backend, file_name)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.logwarn(u'failed to compile function with {}, using casadi instead: {}'.format(backend, e))
+    return CompiledSparseFunction(str_params, f, library)
 
 
 def cross(u, v):
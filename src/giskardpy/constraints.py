@@ -12,7 +12,7 @@ from giskard_msgs.msg import Constraint as Constraint_msg
 import giskardpy.identifier as identifier
 import giskardpy.tfwrapper as tf
 from giskardpy import casadi_wrapper as w
-from giskardpy.data_types import SoftConstraint
+from giskardpy.data_types import SoftConstraint, Collisions
 from giskardpy.exceptions import GiskardException, ConstraintException
 from giskardpy.input_system import \
     PoseStampedInput, Point3Input, Vector3Input, \
@@ -1579,32 +1579,34 @@ class ExternalCollisionAvoidance(Constraint):
         return Vector3Input(self.god_map.to_symbol,
                             prefix=identifier.closest_point + [u'get_external_collisions',
                                                                (self.link_name,),
-                                                               self.idx,
-                                                               u'get_contact_normal_in_root',
-                                                               tuple()]).get_expression()
+                                                               self.idx],
+                            x=(Collisions.CONTACT_NORMAL,),
+                            y=(Collisions.CONTACT_NORMAL + 1,),
+                            z=(Collisions.CONTACT_NORMAL + 2,)).get_expression()
 
     def get_closest_point_on_a_in_a(self):
         return Point3Input(self.god_map.to_symbol,
                            prefix=identifier.closest_point + [u'get_external_collisions',
                                                               (self.link_name,),
-                                                              self.idx,
-                                                              u'get_position_on_a_in_a',
-                                                              tuple()]).get_expression()
+                                                              self.idx],
+                           x=(Collisions.POSITION_ON_A,),
+                           y=(Collisions.POSITION_ON_A + 1,),
+                           z=(Collisions.POSITION_ON_A + 2,)).get_expression()
 
     def get_closest_point_on_b_in_root(self):
         return Point3Input(self.god_map.to_symbol,
                            prefix=identifier.closest_point + [u'get_external_collisions',
                                                               (self.link_name,),
-                                                              self.idx,
-                                                              u'get_position_on_b_in_root',
-                                                              tuple()]).get_expression()
+                                                              self.idx],
+                           x=(Collisions.POSITION_ON_B,),
+                           y=(Collisions.POSITION_ON_B + 1,),
+                           z=(Collisions.POSITION_ON_B + 2,)).get_expression()
 
     def get_actual_distance(self):
         return self.god_map.to_symbol(identifier.closest_point + [u'get_external_collisions',
                                                                   (self.link_name,),
                                                                   self.idx,
-                                                                  u'get_contact_distance',
-                                                                  tuple()])
+                                                                  Collisions.CONTACT_DISTANCE])
 
     def get_number_of_external_collisions(self):
         return self.god_map.to_symbol(identifier.closest_point + [u'get_number_of_external_collisions',
@@ -1735,37 +1737,41 @@ class CollisionAvoidanceHint(Constraint):
     def get_contact_normal_on_b_in_root(self):
         return Vector3Input(self.god_map.to_symbol,
                             prefix=identifier.closest_point + [u'get_external_collisions_long_key',
-                                                               self.key,
-                                                               u'get_contact_normal_in_root',
-                                                               tuple()]).get_expression()
+                                                               self.key],
+                            x=(Collisions.CONTACT_NORMAL,),
+                            y=(Collisions.CONTACT_NORMAL + 1,),
+                            z=(Collisions.CONTACT_NORMAL + 2,)).get_expression()
 
     def get_closest_point_on_a_in_a(self):
         return Point3Input(self.god_map.to_symbol,
                            prefix=identifier.closest_point + [u'get_external_collisions_long_key',
-                                                              self.key,
-                                                              u'get_position_on_a_in_a',
-                                                              tuple()]).get_expression()
+                                                              self.key],
+                           x=(Collisions.POSITION_ON_A,),
+                           y=(Collisions.POSITION_ON_A + 1,),
+                           z=(Collisions.POSITION_ON_A + 2,)).get_expression()
 
     def get_closest_point_on_b_in_root(self):
         return Point3Input(self.god_map.to_symbol,
                            prefix=identifier.closest_point + [u'get_external_collisions_long_key',
-                                                              self.key,
-                                                              u'get_position_on_b_in_root',
-                                                              tuple()]).get_expression()
+                                                              self.key],
+                           x=(Collisions.POSITION_ON_B,),
+                           y=(Collisions.POSITION_ON_B + 1,),
+                           z=(Collisions.POSITION_ON_B + 2,)).get_expression()
 
     def get_actual_distance(self):
         return self.god_map.to_symbol(identifier.closest_point + [u'get_external_collisions_long_key',
                                                                   self.key,
-                                                                  u'get_contact_distance',
-                                                                  tuple()])
+                                                                  Collisions.CONTACT_DISTANCE])
 
     def get_body_b(self):
         return self.god_map.to_symbol(identifier.closest_point + [u'get_external_collisions_long_key',
-                                                                  self.key, u'get_body_b_hash', tuple()])
+                                                                  self.key,
+                                                                  Collisions.BODY_B_HASH])
 
     def get_link_b(self):
         return self.god_map.to_symbol(identifier.closest_point + [u'get_external_collisions_long_key',
-                                                                  self.key, u'get_link_b_hash', tuple()])
+                                                                  self.key,
+                                                                  Collisions.LINK_B_HASH])
 
     def make_constraints(self):
         weight = self.get_input_float(self.weight_id)
@@ -1838,32 +1844,35 @@ class SelfCollisionAvoidance(Constraint):
         return Vector3Input(self.god_map.to_symbol,
                             prefix=identifier.closest_point + [u'get_self_collisions',
                                                                (self.link_a, self.link_b),
-                                                               self.idx,
-                                                               u'get_contact_normal_in_b',
-                                                               tuple()]).get_expression()
+                                                               self.idx],
+                            x=(Collisions.CONTACT_NORMAL,),
+                            y=(Collisions.CONTACT_NORMAL + 1,),
+                            z=(Collisions.CONTACT_NORMAL + 2,)).get_expression()
 
     def get_position_on_a_in_a(self):
         return Point3Input(self.god_map.to_symbol,
                            prefix=identifier.closest_point + [u'get_self_collisions',
                                                               (self.link_a, self.link_b),
-                                                              self.idx,
-                                                              u'get_position_on_a_in_a',
-                                                              tuple()]).get_expression()
+                                                              self.idx],
+                           x=(Collisions.POSITION_ON_A,),
+                           y=(Collisions.POSITION_ON_A + 1,),
+                           z=(Collisions.POSITION_ON_A + 2,)).get_expression()
 
     def get_b_T_pb(self):
-        return TranslationInput(self.god_map.to_symbol,
-                                prefix=identifier.closest_point + [u'get_self_collisions',
-                                                                   (self.link_a, self.link_b),
-                                                                   self.idx,
-                                                                   u'get_position_on_b_in_b',
-                                                                   tuple()]).get_frame()
+        b_P_pb = Point3Input(self.god_map.to_symbol,
+                             prefix=identifier.closest_point + [u'get_self_collisions',
+                                                                (self.link_a, self.link_b),
+                                                                self.idx],
+                             x=(Collisions.POSITION_ON_B,),
+                             y=(Collisions.POSITION_ON_B + 1,),
+                             z=(Collisions.POSITION_ON_B + 2,))
+        return w.translation3(b_P_pb.x, b_P_pb.y, b_P_pb.z)
 
     def get_actual_distance(self):
         return self.god_map.to_symbol(identifier.closest_point + [u'get_self_collisions',
                                                                   (self.link_a, self.link_b),
                                                                   self.idx,
-                                                                  u'get_contact_distance',
-                                                                  tuple()])
+                                                                  Collisions.CONTACT_DISTANCE])
 
     def get_number_of_self_collisions(self):
         return self.god_map.to_symbol(identifier.closest_point + [u'get_number_of_self_collisions',
@@ -1,8 +1,8 @@
+from bisect import bisect_left, bisect_right
 from collections import OrderedDict, defaultdict, namedtuple
 
 import numpy as np
-from sortedcontainers import SortedKeyList
-from giskardpy.tfwrapper import kdl_to_np, np_vector, np_point
+from giskardpy.tfwrapper import kdl_to_np
 
 SoftConstraint = namedtuple(u'SoftConstraint', [u'lbA', u'ubA',
                                                 u'weight', u'expression', u'goal_constraint',
@@ -12,6 +12,11 @@ SoftConstraint = namedtuple(u'SoftConstraint', [u'lbA', u'ubA',
 HardConstraint = namedtuple(u'HardConstraint', [u'lower', u'upper', u'expression'])
 JointConstraint = namedtuple(u'JointConstraint', [u'lower', u'upper', u'weight', u'linear_weight'])
 
+# closest points between a robot link and another link in map frame, see PyBulletWorld.get_closest_points
+CONTACT_DTYPE = np.dtype([('link_a', object), ('body_b', object), ('link_b', object),
+                          ('position_on_a', np.float64, 3), ('position_on_b', np.float64, 3),
+                          ('contact_normal', np.float64, 3), ('contact_distance', np.float64)])
+
 
 class SingleJointState(object):
     def __init__(self, name='', position=0.0, velocity=0.0, effort=0.0):
@@ -24,38 +29,319 @@ class SingleJointState(object):
         return u'{}: {}, {}, {}'.format(self.name, self.position, self.velocity, self.effort)
 
 
+class JointStateArrays(object):
+    """
+    Joint states in contiguous position and velocity arrays.
+    Behaves like a read only OrderedDict that maps joint names to SingleJointState, which are only created when they are
+    accessed.
+    """
+
+    def __init__(self, names, index, position, velocity):
+        """
+        :param names: joint names in the order of the arrays
+        :type names: list
+        :param index: joint name -> index in the arrays, can be shared between joint states with the same names
+        :type index: dict
+        :type position: np.ndarray
+        :type velocity: np.ndarray
+        """
+        self.names = names
+        self.index = index
+        self.position = position
+        self.velocity = velocity
+        self._joint_states = {}
+
+    @classmethod
+    def from_joint_states(cls, joint_states, names=()):
+        """
+        :param joint_states: joint name -> SingleJointState
+        :type joint_states: dict
+        :param names: these joints come first, the remaining joints of joint_states are appended
+        :type names: list
+        :rtype: JointStateArrays
+        """
+        names = list(names)
+        first_names = set(names)
+        names.extend(joint_name for joint_name in joint_states if joint_name not in first_names)
+        index = {joint_name: i for i, joint_name in enumerate(names)}
+        position = np.array([joint_states[joint_name].position for joint_name in names], dtype=float)
+        velocity = np.array([joint_states[joint_name].velocity for joint_name in names], dtype=float)
+        return cls(names, index, position, velocity)
+
+    def position_items(self):
+        """
+        :return: (joint name, position) tuples, without creating SingleJointStates
+        :rtype: iterator
+        """
+        return zip(self.names, self.position.tolist())
+
+    def __getitem__(self, joint_name):
+        try:
+            return self._joint_states[joint_name]
+        except KeyError:
+            i = self.index[joint_name]
+            joint_state = SingleJointState(joint_name, float(self.position[i]), float(self.velocity[i]))
+            self._joint_states[joint_name] = joint_state
+            return joint_state
+
+    def get(self, joint_name, default=None):
+        if joint_name in self.index:
+            return self[joint_name]
+        return default
+
+    def __contains__(self, joint_name):
+        return joint_name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def values(self):
+        return [self[joint_name] for joint_name in self.names]
+
+    def items(self):
+        return [(joint_name, self[joint_name]) for joint_name in self.names]
+
+
 class Trajectory(object):
+    """
+    Append only joint trajectory. The positions and velocities of all points are stored in growable arrays with one row
+    per point and one column per joint, points are returned as JointStateArrays that are views into these arrays.
+    """
+    initial_capacity = 128
+
     def __init__(self):
-        self._points = OrderedDict()
+        self._times = []
+        self.names = None
+        self.index = None
+        self._position = None
+        self._velocity = None
+        # joint names of the last point that was set and the columns of its joints in it
+        self._point_names = None
+        self._point_columns = None
+
+    def __len__(self):
+        return len(self._times)
+
+    def _row(self, time):
+        row = bisect_left(self._times, time)
+        if row == len(self._times) or self._times[row] != time:
+            raise KeyError(time)
+        return row
+
+    def _get_point(self, row):
+        return JointStateArrays(self.names, self.index, self._position[row], self._velocity[row])
 
     def get_exact(self, time):
-        return self._points[time]
+        """
+        :rtype: JointStateArrays
+        """
+        return self._get_point(self._row(time))
 
     def get_closest(self, time):
-        pass
+        """
+        :return: point with the time that is closest to time
+        :rtype: JointStateArrays
+        """
+        row = bisect_left(self._times, time)
+        if row == len(self._times) or (row > 0 and time - self._times[row - 1] < self._times[row] - time):
+            row -= 1
+        return self._get_point(row)
 
     def get_sub_trajectory(self, start_time, end_time):
-        pass
+        """
+        :return: copy of the points with start_time <= time <= end_time
+        :rtype: Trajectory
+        """
+        start = bisect_left(self._times, start_time)
+        end = bisect_right(self._times, end_time)
+        sub_trajectory = Trajectory()
+        sub_trajectory._times = self._times[start:end]
+        if self.names is not None:
+            sub_trajectory.names = self.names
+            sub_trajectory.index = self.index
+            sub_trajectory._position = self._position[start:end].copy()
+            sub_trajectory._velocity = self._velocity[start:end].copy()
+        return sub_trajectory
+
+    def _init_columns(self, point):
+        if not isinstance(point, JointStateArrays):
+            point = JointStateArrays.from_joint_states(point)
+        self.names = point.names
+        self.index = point.index
+        self._position = np.empty((self.initial_capacity, len(self.names)))
+        self._velocity = np.empty((self.initial_capacity, len(self.names)))
+
+    def _get_columns(self, point):
+        """
+        :return: positions and velocities of point in the column order of this trajectory
+        :rtype: tuple
+        """
+        if not isinstance(point, JointStateArrays):
+            self._check_joint_names(point)
+            return ([point[joint_name].position for joint_name in self.names],
+                    [point[joint_name].velocity for joint_name in self.names])
+        if point.names is self.names:
+            return point.position, point.velocity
+        if point.names is not self._point_names:
+            self._check_joint_names(point.index)
+            self._point_names = point.names
+            self._point_columns = np.array([point.index[joint_name] for joint_name in self.names], dtype=int)
+        return point.position[self._point_columns], point.velocity[self._point_columns]
+
+    def _check_joint_names(self, joint_names):
+        """
+        :param joint_names: container of the joint names of a point
+        :raises: KeyError if they differ from the joints of this trajectory
+        """
+        if len(joint_names) != len(self.names) or any(joint_name not in joint_names for joint_name in self.names):
+            raise KeyError(u'Cannot append a trajectory point with other joints than the first point.')
 
     def set(self, time, point):
-        if len(self._points) > 0 and list(self._points.keys())[-1] > time:
+        """
+        Appends point, it replaces the last point if time is equal to its time.
+        All points have to contain the same joints as the first point, their order may differ.
+        :param point: joint name -> SingleJointState
+        :type point: dict
+        """
+        if len(self._times) > 0 and self._times[-1] > time:
             raise KeyError(u'Cannot append a trajectory point that is before the current end time of the trajectory.')
-        self._points[time] = point
+        if self.names is None:
+            self._init_columns(point)
+        position, velocity = self._get_columns(point)
+        if len(self._times) > 0 and self._times[-1] == time:
+            row = len(self._times) - 1
+        else:
+            row = len(self._times)
+            if row == len(self._position):
+                self._position = np.concatenate((self._position, np.empty(self._position.shape)))
+                self._velocity = np.concatenate((self._velocity, np.empty(self._velocity.shape)))
+        self._position[row] = position
+        self._velocity[row] = velocity
+        if row == len(self._times):
+            # the time is added last, readers of other threads don't see the row before it is complete
+            self._times.append(time)
 
     def delete(self, time):
-        del self._points[time]
+        row = self._row(time)
+        length = len(self._times)
+        self._position[row:length - 1] = self._position[row + 1:length]
+        self._velocity[row:length - 1] = self._velocity[row + 1:length]
+        del self._times[row]
 
     def delete_last(self):
-        self.delete(self._points.keys()[-1])
+        self.delete(self._times[-1])
 
     def items(self):
-        return self._points.items()
+        return [(time, self._get_point(row)) for row, time in enumerate(self._times)]
 
     def keys(self):
-        return self._points.keys()
+        return list(self._times)
 
     def values(self):
-        return self._points.values()
+        return [self._get_point(row) for row in range(len(self._times))]
+
+    def get_columns(self, joint_names):
+        """
+        :return: indices of the columns of joint_names, a slice if they are next to each other
+        :rtype: slice or np.ndarray
+        """
+        columns = np.array([self.index[joint_name] for joint_name in joint_names], dtype=int)
+        if len(columns) > 0 and (columns == np.arange(columns[0], columns[0] + len(columns))).all():
+            return slice(columns[0], columns[0] + len(columns))
+        return columns
+
+    def get_times(self):
+        """
+        :rtype: np.ndarray
+        """
+        return np.array(self._times)
+
+    def get_positions(self, joint_names=None):
+        """
+        :param joint_names: None returns all joints in the order of names
+        :type joint_names: list
+        :return: positions with one row per point and one column per joint, a view if the joints are next to each other
+        :rtype: np.ndarray
+        """
+        if self.names is None:
+            return np.empty((len(self._times), 0 if joint_names is None else len(joint_names)))
+        position = self._position[:len(self._times)]
+        if joint_names is None:
+            return position
+        return position[:, self.get_columns(joint_names)]
+
+    def get_velocities(self, joint_names=None):
+        """
+        see get_positions
+        :rtype: np.ndarray
+        """
+        if self.names is None:
+            return np.empty((len(self._times), 0 if joint_names is None else len(joint_names)))
+        velocity = self._velocity[:len(self._times)]
+        if joint_names is None:
+            return velocity
+        return velocity[:, self.get_columns(joint_names)]
+
+
+class QuantizedStateHistory(object):
+    """
+    Bounded set of the last states, e.g. joint positions.
+    States are quantized to integers and only the hash of the integer array is kept, when more than size states are
+    added, the oldest ones are forgotten.
+    """
+
+    def __init__(self, scale, size):
+        """
+        :param scale: states are multiplied with it before they are rounded, e.g. 10**precision for each entry
+        :type scale: np.ndarray
+        :param size: maximum number of states that are kept
+        :type size: int
+        """
+        self.scale = scale
+        self.size = size
+        self._scaled = np.empty(len(scale))
+        self._quantized = np.empty(len(scale), dtype=np.int64)
+        self.clear()
+
+    def clear(self):
+        self._keys = set()
+        self._history = [None] * self.size
+        self._last = -1
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get_key(self, state):
+        """
+        :type state: np.ndarray
+        :return: hash of the quantized state
+        :rtype: int
+        """
+        np.multiply(state, self.scale, out=self._scaled)
+        np.rint(self._scaled, out=self._scaled)
+        self._quantized[:] = self._scaled
+        return hash(self._quantized.tobytes())
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def add(self, key):
+        """
+        :param key: created with get_key
+        :type key: int
+        """
+        if key in self._keys:
+            return
+        self._last = (self._last + 1) % self.size
+        self._keys.discard(self._history[self._last])
+        self._history[self._last] = key
+        self._keys.add(key)
 
 
 class Collision(object):
@@ -161,7 +447,18 @@ class Collision(object):
 
 
 class Collisions(object):
-
+    """
+    Closest points of the robot, stored in arrays with one row per collision.
+    Constraints read the rows directly from the god map, the column indices are the class attributes below.
+    Position on b and contact normal are in root frame for external collisions and in b frame for self collisions.
+    """
+    POSITION_ON_A = 0  # in a, x, y, z in columns 0 to 2
+    POSITION_ON_B = 3
+    CONTACT_NORMAL = 6
+    CONTACT_DISTANCE = 9
+    BODY_B_HASH = 10
+    LINK_B_HASH = 11
+    SIZE = 12
 
     def __init__(self, robot, collision_list_size):
         """
@@ -170,125 +467,138 @@ class Collisions(object):
         self.robot = robot
         self.root_T_map = kdl_to_np(self.robot.root_T_map)
         self.robot_root = self.robot.get_root()
+        self.robot_name_hash = self.robot.get_name().__hash__()
         self.collision_list_size = collision_list_size
 
-        # @profile
-        def sort(x):
-            return x.get_contact_distance()
-
-
-
-        # @profile
-        def default_f():
-            return SortedKeyList([self._default_collision('', '', '')] * collision_list_size,
-                                 key=sort)
-
-        self.default_result = default_f()
-
-        self.self_collisions = defaultdict(default_f)
-        self.external_collision = defaultdict(default_f)
-        self.external_collision_long_key = defaultdict(lambda : self._default_collision('', '', ''))
-        self.all_collisions = set()
+        self.default_collision = np.zeros(self.SIZE)
+        self.default_collision[self.CONTACT_NORMAL + 2] = 1
+        self.default_collision[self.CONTACT_DISTANCE] = 100
+        self.default_collision[self.BODY_B_HASH] = u''.__hash__()
+        self.default_collision[self.LINK_B_HASH] = u''.__hash__()
+        self.default_result = np.tile(self.default_collision, (collision_list_size, 1))
+
+        self.self_collisions = {}
+        self.external_collision = {}
+        self.external_collision_long_key = defaultdict(lambda: self.default_collision)
+        self.all_collisions = np.zeros(0, dtype=CONTACT_DTYPE)
         self.number_of_self_collisions = defaultdict(int)
         self.number_of_external_collisions = defaultdict(int)
 
-
     # @profile
-    def add(self, collision):
+    def add(self, contacts):
         """
-        :type collision: Collision
-        :return:
+        :param contacts: closest points in map frame with dtype CONTACT_DTYPE, position_on_a has to be on link_a.
+        :type contacts: np.ndarray
         """
-        collision = self.transform_closest_point(collision)
-        self.all_collisions.add(collision)
-
-        if collision.get_body_b() == self.robot.get_name():
-            key = collision.get_link_a(), collision.get_link_b()
-            self.self_collisions[key].add(collision)
-            self.number_of_self_collisions[key] = min(self.collision_list_size,
-                                                      self.number_of_self_collisions[key] + 1)
-        else:
-            key = collision.get_link_a()
-            self.external_collision[key].add(collision)
-            self.number_of_external_collisions[key] = min(self.collision_list_size,
-                                                          self.number_of_external_collisions[key] + 1)
-            key_long = (collision.get_original_link_a(),collision.get_body_b(), collision.get_original_link_b())
-            if key_long not in self.external_collision_long_key:
-                self.external_collision_long_key[key_long] = collision
+        self.all_collisions = np.concatenate((self.all_collisions, contacts))
+        if len(contacts) == 0:
+            return
+
+        # contacts with the same link_a, body_b and link_b are grouped by sorting them by the hashes of the names
+        hashes = np.empty((len(contacts), 3), dtype=np.int64)
+        for column, name in enumerate((u'link_a', u'body_b', u'link_b')):
+            hashes[:, column] = np.fromiter(map(hash, contacts[name]), dtype=np.int64, count=len(contacts))
+        _, inverse = np.unique(hashes, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        contacts = contacts[np.argsort(inverse, kind=u'mergesort')]
+        counts = np.bincount(inverse)
+        ends = np.cumsum(counts)
+        starts = ends - counts
+
+        r_P_pb = transform_points(self.root_T_map, contacts['position_on_b'])
+        r_V_n = transform_vectors(self.root_T_map, contacts['contact_normal'])
+        robot_name = self.robot.get_name()
+        for start, end in zip(starts, ends):
+            link_a = contacts['link_a'][start]
+            body_b = contacts['body_b'][start]
+            link_b = contacts['link_b'][start]
+            if body_b == robot_name:
+                self.add_self_collisions(link_a, link_b, contacts[start:end])
             else:
-                self.external_collision_long_key[key_long] = min(collision, self.external_collision_long_key[key_long],
-                                                            key=lambda x: x.get_contact_distance())
+                self.add_external_collisions(link_a, body_b, link_b, contacts[start:end],
+                                             r_P_pb[start:end], r_V_n[start:end])
 
-
-
-    def transform_closest_point(self, collision):
+    def add_self_collisions(self, link_a, link_b, contacts):
         """
-        :type collision: Collision
-        :rtype: Collision
+        :param contacts: closest points between link_a and link_b in map frame
+        :type contacts: np.ndarray
         """
-        if collision.get_body_b() == self.robot.get_name():
-            return self.transform_self_collision(collision)
-        else:
-            return self.transform_external_collision(collision)
-
-
-    def transform_self_collision(self, collision):
-        """
-        :type collision: Collision
-        :rtype: Collision
-        """
-        link_a = collision.get_original_link_a()
-        link_b = collision.get_original_link_b()
+        position_on_a = contacts['position_on_a']
+        position_on_b = contacts['position_on_b']
+        contact_normal = contacts['contact_normal']
         new_link_a, new_link_b = self.robot.get_chain_reduced_to_controlled_joints(link_a, link_b)
         if new_link_a > new_link_b:
-            collision = collision.reverse()
+            position_on_a, position_on_b = position_on_b, position_on_a
+            contact_normal = -contact_normal
             new_link_a, new_link_b = new_link_b, new_link_a
 
-        new_b_T_r = self.robot.get_fk_np(new_link_b, self.robot_root)
-        new_a_T_r = self.robot.get_fk_np(new_link_a, self.robot_root)
-        collision.set_link_a(new_link_a)
-        collision.set_link_b(new_link_b)
-
-        new_b_T_map = np.dot(new_b_T_r, self.root_T_map)
+        new_a_T_map = np.dot(self.robot.get_fk_np(new_link_a, self.robot_root), self.root_T_map)
+        new_b_T_map = np.dot(self.robot.get_fk_np(new_link_b, self.robot_root), self.root_T_map)
 
-        new_a_P_pa = np.dot(np.dot(new_a_T_r, self.root_T_map), np_point(*collision.get_position_on_a_in_map()))
-        new_b_P_pb = np.dot(new_b_T_map, np_point(*collision.get_position_on_b_in_map()))
-        # r_P_pb = np.dot(self.root_T_map, np_point(*closest_point.position_on_b))
-        new_b_V_n = np.dot(new_b_T_map, np_vector(*collision.get_contact_normal_in_map()))
-        collision.set_position_on_a_in_a(new_a_P_pa[:-1])
-        collision.set_position_on_b_in_b(new_b_P_pb[:-1])
-        collision.set_contact_normal_in_b(new_b_V_n[:-1])
-        return collision
+        rows = np.empty((len(contacts), self.SIZE))
+        rows[:, self.POSITION_ON_A:self.POSITION_ON_A + 3] = transform_points(new_a_T_map, position_on_a)
+        rows[:, self.POSITION_ON_B:self.POSITION_ON_B + 3] = transform_points(new_b_T_map, position_on_b)
+        rows[:, self.CONTACT_NORMAL:self.CONTACT_NORMAL + 3] = transform_vectors(new_b_T_map, contact_normal)
+        rows[:, self.CONTACT_DISTANCE] = contacts['contact_distance']
+        rows[:, self.BODY_B_HASH] = self.robot_name_hash
+        rows[:, self.LINK_B_HASH] = new_link_b.__hash__()
+        self._insert(self.self_collisions, self.number_of_self_collisions, (new_link_a, new_link_b), rows)
 
-
-    def transform_external_collision(self, collision):
+    def add_external_collisions(self, link_a, body_b, link_b, contacts, r_P_pb, r_V_n):
         """
-        :type collision: Collision
-        :rtype: Collision
+        :param contacts: closest points between link_a and link_b of body_b in map frame
+        :type contacts: np.ndarray
+        :param r_P_pb: position_on_b of contacts in root frame
+        :type r_P_pb: np.ndarray
+        :param r_V_n: contact_normal of contacts in root frame
+        :type r_V_n: np.ndarray
         """
-        movable_joint = self.robot.get_controlled_parent_joint(collision.get_original_link_a())
+        movable_joint = self.robot.get_controlled_parent_joint(link_a)
         new_a = self.robot.get_child_link_of_joint(movable_joint)
-        new_a_T_r = self.robot.get_fk_np(new_a, self.robot_root)
-        collision.set_link_a(new_a)
-
-        new_a_P_pa = np.dot(np.dot(new_a_T_r, self.root_T_map), np_point(*collision.get_position_on_a_in_map()))
-        r_P_pb = np.dot(self.root_T_map, np_point(*collision.get_position_on_b_in_map()))
-        r_V_n = np.dot(self.root_T_map, np_vector(*collision.get_contact_normal_in_map()))
-        collision.set_position_on_a_in_a(new_a_P_pa[:-1])
-        collision.set_position_on_b_in_root(r_P_pb[:-1])
-        collision.set_contact_normal_in_root(r_V_n[:-1])
-        return collision
-
-
-    def _default_collision(self, link_a, body_b, link_b):
-        return Collision(link_a, body_b, link_b, [0, 0, 0], [0, 0, 0], [0, 0, 1], 100)
+        new_a_T_map = np.dot(self.robot.get_fk_np(new_a, self.robot_root), self.root_T_map)
+
+        rows = np.empty((len(contacts), self.SIZE))
+        rows[:, self.POSITION_ON_A:self.POSITION_ON_A + 3] = transform_points(new_a_T_map,
+                                                                              contacts['position_on_a'])
+        rows[:, self.POSITION_ON_B:self.POSITION_ON_B + 3] = r_P_pb
+        rows[:, self.CONTACT_NORMAL:self.CONTACT_NORMAL + 3] = r_V_n
+        rows[:, self.CONTACT_DISTANCE] = contacts['contact_distance']
+        rows[:, self.BODY_B_HASH] = body_b.__hash__()
+        rows[:, self.LINK_B_HASH] = link_b.__hash__()
+        self._insert(self.external_collision, self.number_of_external_collisions, new_a, rows)
+
+        key_long = (link_a, body_b, link_b)
+        if key_long in self.external_collision_long_key:
+            rows = np.vstack((self.external_collision_long_key[key_long], rows))
+        self.external_collision_long_key[key_long] = rows[np.argmin(rows[:, self.CONTACT_DISTANCE])]
+
+    def _insert(self, collisions, number_of_collisions, key, rows):
+        """
+        Merges rows into the collision_list_size closest collisions of key, which are sorted by contact distance.
+        :type collisions: dict
+        :type number_of_collisions: dict
+        :type rows: np.ndarray
+        """
+        n = number_of_collisions[key]
+        if n > 0:
+            rows = np.vstack((collisions[key][:n], rows))
+        distances = rows[:, self.CONTACT_DISTANCE]
+        if len(rows) > self.collision_list_size:
+            closest = np.argpartition(distances, self.collision_list_size - 1)[:self.collision_list_size]
+            rows = rows[closest]
+            distances = distances[closest]
+        result = self.default_result.copy()
+        result[:len(rows)] = rows[np.argsort(distances, kind=u'mergesort')]
+        collisions[key] = result
+        number_of_collisions[key] = len(rows)
 
     # @profile
     def get_external_collisions(self, joint_name):
         """
-        Collisions are saved as a list for each movable robot joint, sorted by contact distance
+        Collisions are saved as an array for each movable robot joint, sorted by contact distance
         :type joint_name: str
-        :rtype: SortedKeyList
+        :return: array with collision_list_size rows, unused rows are filled with default collisions
+        :rtype: np.ndarray
         """
         if joint_name in self.external_collision:
             return self.external_collision[joint_name]
@@ -296,9 +606,8 @@ class Collisions(object):
 
     def get_external_collisions_long_key(self, link_a, body_b, link_b):
         """
-        Collisions are saved as a list for each movable robot joint, sorted by contact distance
-        :type joint_name: str
-        :rtype: SortedKeyList
+        :return: row of the closest collision between link_a and link_b of body_b
+        :rtype: np.ndarray
         """
         return self.external_collision_long_key[link_a, body_b, link_b]
 
@@ -313,8 +622,8 @@ class Collisions(object):
         Make sure that link_a < link_b, the reverse collision is not saved.
         :type link_a: str
         :type link_b: str
-        :return:
-        :rtype: SortedKeyList
+        :return: array with collision_list_size rows, unused rows are filled with default collisions
+        :rtype: np.ndarray
         """
         # FIXME maybe check for reverse key?
         if (link_a, link_b) in self.self_collisions:
@@ -331,4 +640,28 @@ class Collisions(object):
 
 
     def items(self):
+        """
+        :return: all collisions in map frame with dtype CONTACT_DTYPE
+        :rtype: np.ndarray
+        """
         return self.all_collisions
+
+
+def transform_points(a_T_b, b_P):
+    """
+    :type a_T_b: np.ndarray
+    :param b_P: points as rows
+    :type b_P: np.ndarray
+    :rtype: np.ndarray
+    """
+    return np.dot(b_P, a_T_b[:3, :3].T) + a_T_b[:3, 3]
+
+
+def transform_vectors(a_T_b, b_V):
+    """
+    :type a_T_b: np.ndarray
+    :param b_V: vectors as rows
+    :type b_V: np.ndarray
+    :rtype: np.ndarray
+    """
+    return np.dot(b_V, a_T_b[:3, :3].T)
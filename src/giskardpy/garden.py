@@ -25,6 +25,7 @@ from giskardpy.plugin_cleanup import CleanUp
 from giskardpy.plugin_collision_checker import CollisionChecker
 from giskardpy.plugin_collision_marker import CollisionMarker
 from giskardpy.plugin_configuration import ConfigurationPlugin
+from giskardpy.plugin_convergence import ConvergenceDetector
 from giskardpy.plugin_goal_reached import GoalReachedPlugin
 from giskardpy.plugin_if import IF
 from giskardpy.plugin_instantaneous_controller import ControllerPlugin
@@ -62,6 +63,10 @@ def initialize_god_map():
 
     load_config_file()
 
+    # the world and collisions are modified in place, they are evaluated by the symbol vector in every update
+    for namespace in (identifier.rosparam, identifier.constraints_identifier, identifier.time,
+                      identifier.last_joint_states):
+        god_map.add_versioned_namespace(namespace)
     god_map.set_data(identifier.rosparam, rospy.get_param(rospy.get_name()))
     god_map.set_data(identifier.robot_description, rospy.get_param(u'robot_description'))
     path_to_data_folder = god_map.get_data(identifier.data_folder)
@@ -76,6 +81,14 @@ def initialize_god_map():
         nWSR = None
     god_map.set_data(identifier.nWSR, nWSR)
 
+    # fix function cache size
+    if god_map.get_data(identifier.function_cache_size) == u'None':
+        god_map.set_data(identifier.function_cache_size, None)
+
+    # fix compiler
+    if god_map.get_data(identifier.compiler) == u'None':
+        god_map.set_data(identifier.compiler, None)
+
     pbw.start_pybullet(god_map.get_data(identifier.gui))
     while not rospy.is_shutdown():
         try:
@@ -131,7 +144,9 @@ def initialize_god_map():
                         controlled_joints)
     world.add_robot(robot, None, controlled_joints,
                     ignored_pairs=god_map.get_data(identifier.ignored_self_collisions),
-                    added_pairs=god_map.get_data(identifier.added_self_collisions))
+                    added_pairs=god_map.get_data(identifier.added_self_collisions),
+                    compiler=god_map.get_data(identifier.compiler),
+                    number_of_processes=god_map.get_data(identifier.self_collision_matrix_processes))
 
     joint_position_symbols = JointStatesInput(blackboard.god_map.to_symbol, world.robot.get_movable_joints(),
                                               identifier.joint_states,
@@ -179,6 +194,8 @@ def grow_tree():
     planning_3.add_plugin(WiggleCancel(u'wiggle'))
     planning_3.add_plugin(LoopDetector(u'loop detector'))
     planning_3.add_plugin(GoalReachedPlugin(u'goal reached'))
+    if god_map.get_data(identifier.enable_ConvergenceDetector):
+        planning_3.add_plugin(ConvergenceDetector(u'convergence'))
     planning_3.add_plugin(TimePlugin(u'time'))
     # planning_3.add_plugin(MaxTrajLength(u'traj length check'))
     # ----------------------------------------------
@@ -1,6 +1,11 @@
 import copy
+from collections import defaultdict, OrderedDict
 from copy import copy
 from multiprocessing import Lock
+from operator import itemgetter, attrgetter, methodcaller
+from threading import current_thread
+
+import numpy as np
 
 from giskardpy import casadi_wrapper as w
 
@@ -27,157 +32,149 @@ def get_member(identifier, member):
     except RuntimeError:
         pass
 
-class GetMember(object):
-    def __init__(self, default_value):
-        self.member = None
-        self.default_value = default_value
-        self.child = None
-
-
-    def init_call(self, identifier, data):
-        self.member = identifier[0]
-        sub_data = self.c(data)
-        if len(identifier) == 2:
-            self.child = GetMemberLeaf(self.default_value)
-            return self.child.init_call(identifier[-1], sub_data)
-        elif len(identifier) > 2:
-            self.child = GetMember(self.default_value)
-            return self.child.init_call(identifier[1:], sub_data)
-        return sub_data
 
+def set_member(data, member, value):
+    """
+    :type data: Union[dict, list, object]
+    """
+    if isinstance(data, dict):
+        data[member] = value
+    elif isinstance(data, list):
+        data[int(member)] = value
+    else:
+        setattr(data, member, value)
 
 
-    def __call__(self, a):
-        return self.c(a)
+# returned by MemberAccessor if the member does not exist, replaced with the default value of the god map
+MISSING = object()
 
 
-    def c(self, a):
+def compile_member_access(data, member):
+    """
+    Determines how member has to be accessed in data.
+    :param data:
+    :type data: Union[None, dict, list, tuple, object]
+    :param member:
+    :return: function that returns member of data or of other objects of the same type, whether it is a function call
+    :rtype: tuple
+    """
+    if hasattr(data, '__getitem__'):
+        if isinstance(member, float):
+            member = int(member)
         try:
-            r = a[self.member]
-            self.c = self.return_dict
-            return r
+            data[member]
+            return itemgetter(member), False
+        except (KeyError, IndexError):
+            # the member might get added later
+            return itemgetter(member), False
         except TypeError:
-            if callable(a):
-                r = a(*self.member)
-                self.c = self.return_function_result
-                return r
-            try:
-                r = getattr(a, self.member)
-                self.c = self.return_attribute
-                return r
-            except TypeError:
-                pass
-        except IndexError:
-            r = a[int(self.member)]
-            self.c = self.return_list
-            return r
-        except RuntimeError:
+            # e.g. attributes of namedtuples
             pass
-        return self.default_value
-
-
-    def return_dict(self, a):
-        return self.child.c(a[self.member])
+    if callable(data):
+        return methodcaller('__call__', *member), True
+    return attrgetter(str(member)), False
 
 
-    def return_list(self, a):
-        return self.child.c(a[int(self.member)])
-
-
-    def return_attribute(self, a):
-        return self.child.c(getattr(a, self.member))
-
-
-    def return_function_result(self, a):
-        return self.child.c(a(*self.member))
-
-class GetMemberLeaf(object):
-    def __init__(self, default_value):
-        self.member = None
-        self.default_value = default_value
-        self.child = None
+class MemberAccessor(object):
+    """
+    Accesses a member of data with an operator function.
+    The function is compiled on the first call and whenever the type of data changes.
+    """
 
-    def init_call(self, member, data):
+    def __init__(self, member):
         self.member = member
-        return self.c(data)
-
-
-
-    def __call__(self, a):
-        return self.c(a)
-
-
-    def c(self, a):
-        try:
-            r = a[self.member]
-            self.c = self.return_dict
-            return r
-        except TypeError:
-            if callable(a):
-                r = a(*self.member)
-                self.c = self.return_function_result
-                return r
+        # type of data, access function, whether it is a function call; replaced as a whole, because readers of
+        # different threads use the same accessor
+        self.compiled = (None, None, False)
+
+    def __call__(self, data):
+        if data is MISSING:
+            return MISSING
+        data_type, access, is_call = self.compiled
+        if type(data) is not data_type:
+            access, is_call = compile_member_access(data, self.member)
+            self.compiled = (type(data), access, is_call)
+        if is_call:
+            # errors of the function itself, e.g. wrong number of parameters, are not hidden
             try:
-                r = getattr(a, self.member)
-                self.c = self.return_attribute
-                return r
-            except TypeError:
-                pass
-        except IndexError:
-            r = a[int(self.member)]
-            self.c = self.return_list
-            return r
-        except RuntimeError:
-            pass
-        return self.default_value
-
-
-    def return_dict(self, a):
-        return a[self.member]
-
-
-    def return_list(self, a):
-        return a[int(self.member)]
-
-
-    def return_attribute(self, a):
-        return getattr(a, self.member)
-
-
-    def return_function_result(self, a):
-        return a(*self.member)
-
+                return access(data)
+            except (KeyError, IndexError, AttributeError):
+                return MISSING
+        try:
+            return access(data)
+        except (KeyError, IndexError, AttributeError, TypeError, RuntimeError):
+            return MISSING
 
 
-def get_data(identifier, data, default_value=0.0):
+class SymbolVector(object):
     """
-    :param identifier: Identifier in the form of ['pose', 'position', 'x'],
-                       to access class member: robot.joint_state = ['robot', 'joint_state']
-                       to access dicts: robot.joint_state['torso_lift_joint'] = ['robot', 'joint_state', ('torso_lift_joint')]
-                       to access lists or other indexable stuff: robot.l[-1] = ['robot', 'l', -1]
-                       to access functions: lib.str_to_ascii('muh') = ['lib', 'str_to_acii', ['muh']]
-                       to access functions without params: robot.get_pybullet_id() = ['robot', 'get_pybullet_id', []]
-    :type identifier: list
-    :return: object that is saved at key
+    Values of registered symbols in a float64 array that is allocated once.
+    The array is updated in place and can be handed to compiled functions without copying it.
+    All identifiers are evaluated in one pass, identifiers with the same prefix share its evaluation.
+    Identifiers of versioned namespaces are only evaluated, if their change counter has increased since the last
+    update, identifiers of all other namespaces are evaluated every time.
+    In snapshot mode, the writer evaluates its own data and all other threads the last published snapshot, both
+    without the lock. Other threads evaluate all namespaces, because the change counters belong to the writer's data.
     """
-    try:
-        if len(identifier) == 1:
-            shortcut = GetMemberLeaf(default_value)
-            result = shortcut.init_call(identifier[0], data)
-        else:
-            shortcut = GetMember(default_value)
-            result = shortcut.init_call(identifier, data)
-    except AttributeError:
-        return default_value, None
-    except KeyError as e:
-        # traceback.print_exc()
-        # raise KeyError(identifier)
-        # TODO is this really a good idea?
-        # I do this because it automatically sets weights for unused goals to 0
-        return default_value, None
-    except IndexError:
-        return default_value, None
-    return result, shortcut
+
+    def __init__(self, god_map, symbols):
+        """
+        :type god_map: GodMap
+        :param symbols: str of symbols created with god_map.to_symbol
+        :type symbols: list
+        """
+        self.god_map = god_map
+        self.symbols = symbols
+        self.identifiers = [god_map.expr_to_key[symbol] for symbol in symbols]
+        self.data = np.zeros(len(symbols))
+        # each node evaluates the last member of a prefix on the result of its parent node, 0 is the god map itself
+        prefix_to_node = {(): 0}
+        namespace_to_nodes = OrderedDict()
+        namespace_to_leaves = OrderedDict()
+        for i, identifier in enumerate(self.identifiers):
+            namespace = identifier[0]
+            nodes = namespace_to_nodes.setdefault(namespace, [])
+            for j in range(1, len(identifier) + 1):
+                prefix = identifier[:j]
+                if prefix not in prefix_to_node:
+                    prefix_to_node[prefix] = len(prefix_to_node)
+                    nodes.append((prefix_to_node[prefix], prefix_to_node[prefix[:-1]],
+                                  god_map.get_accessor(prefix)))
+            namespace_to_leaves.setdefault(namespace, []).append((i, prefix_to_node[identifier]))
+        self.namespaces = []
+        for namespace, nodes in namespace_to_nodes.items():
+            indices, leaves = zip(*namespace_to_leaves[namespace])
+            self.namespaces.append((namespace, nodes, np.array(indices), leaves))
+        self.values = [None] * len(prefix_to_node)
+        self.versions = {}
+
+    def update(self):
+        """
+        Writes the current values of all symbols into self.data.
+        :return: self.data
+        :rtype: np.ndarray
+        """
+        data = self.god_map._get_lock_free_data()
+        if data is None:
+            with self.god_map.lock:
+                return self._update(self.god_map._data, True)
+        return self._update(data, data is self.god_map._data)
+
+    def _update(self, data, use_versions):
+        values = self.values
+        values[0] = data
+        default_value = self.god_map.default_value
+        versioned_namespaces = self.god_map.versioned_namespaces if use_versions else ()
+        for namespace, nodes, indices, leaves in self.namespaces:
+            if namespace in versioned_namespaces:
+                version = self.god_map.get_version(namespace)
+                if self.versions.get(namespace) == version:
+                    continue
+                self.versions[namespace] = version
+            for node, parent, accessor in nodes:
+                values[node] = accessor(values[parent])
+            self.data[indices] = [default_value if values[leaf] is MISSING else values[leaf] for leaf in leaves]
+        return self.data
 
 
 class GodMap(object):
@@ -193,14 +190,28 @@ class GodMap(object):
         self.expr_to_key = {}
         self.default_value = default_value
         self.last_expr_values = {}
+        self.versions = defaultdict(int)
+        # namespaces that are only changed with set_data or mark_changed, symbol vectors skip them while unchanged
+        self.versioned_namespaces = set()
+        self.accessors = {}
         self.shortcuts = {}
         self.lock = Lock()
+        # data published by the snapshot writer, None outside of snapshot mode
+        self._snapshot = None
+        self._snapshot_writer = None
+        # prefixes of identifiers whose containers the writer has copied since the last publish
+        self._copied = None
+        # changes of other threads, which are applied to the data of the writer when it publishes
+        self._pending_writes = []
+        self._pending_changes = set()
 
     def __copy__(self):
         god_map_copy = GodMap(self.default_value)
         god_map_copy._data = copy(self._data)
         god_map_copy.key_to_expr = copy(self.key_to_expr)
         god_map_copy.expr_to_key = copy(self.expr_to_key)
+        god_map_copy.versions = copy(self.versions)
+        god_map_copy.versioned_namespaces = copy(self.versioned_namespaces)
         return god_map_copy
 
     def __enter__(self):
@@ -223,21 +234,143 @@ class GodMap(object):
         :type identifier: list
         :return: object that is saved at key
         """
+        data = self._get_lock_free_data()
+        if data is None:
+            data = self._data
+        return self._get_data(identifier, data)
+
+    def _get_data(self, identifier, data):
         identifier = tuple(identifier)
         if identifier not in self.shortcuts:
-            result, shortcut = get_data(identifier, self._data, self.default_value)
-            if shortcut:
-                self.shortcuts[identifier] = shortcut
-            return result
-        return self.shortcuts[identifier].c(self._data)
+            self.shortcuts[identifier] = self.get_accessors(identifier)
+        for accessor in self.shortcuts[identifier]:
+            data = accessor(data)
+        if data is MISSING:
+            return self.default_value
+        return data
+
+    def get_accessors(self, identifier):
+        """
+        :return: accessors for all members of identifier, applying them in order returns the value of identifier
+        :rtype: list
+        """
+        return [self.get_accessor(identifier[:i + 1]) for i in range(len(identifier))]
+
+    def get_accessor(self, identifier):
+        """
+        :return: accessor for the last member of identifier, which is shared by all identifiers with this prefix
+        :rtype: MemberAccessor
+        """
+        identifier = tuple(identifier)
+        if identifier not in self.accessors:
+            self.accessors[identifier] = MemberAccessor(identifier[-1])
+        return self.accessors[identifier]
 
     def get_data(self, identifier):
+        data = self._get_lock_free_data()
+        if data is not None:
+            return self._get_data(identifier, data)
         with self.lock:
             r = self.unsafe_get_data(identifier)
         return r
 
+    def _get_lock_free_data(self):
+        """
+        :return: the data of the writer for the writer, the last snapshot for all other threads, None outside of
+                 snapshot mode
+        :rtype: Union[None, dict]
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if self._snapshot_writer == current_thread().ident:
+            return self._data
+        return snapshot
+
+    def start_snapshot_mode(self):
+        """
+        Makes the calling thread the writer, which reads and writes its own data without the lock.
+        All other threads read the state of the last publish_snapshot call without the lock.
+        Dicts and lists are copied on the first write into them after a publish, therefore readers never see
+        changes of an unfinished tick. Other objects are shared, setting their members changes them in all
+        snapshots, replace them with set_data to publish them consistently.
+        Changes of other threads are visible to all readers immediately and reach the writer with its next
+        publish_snapshot call.
+        """
+        with self.lock:
+            self._copied = set()
+            self._pending_writes = []
+            self._pending_changes = set()
+            self._snapshot_writer = current_thread().ident
+            self._snapshot = copy(self._data)
+
+    def publish_snapshot(self):
+        """
+        Applies the changes of other threads to the data of the writer and makes it the new snapshot.
+        Has to be called by the writer.
+        """
+        with self.lock:
+            self._apply_pending_changes()
+            self._copied = set()
+            self._snapshot = copy(self._data)
+
+    def stop_snapshot_mode(self):
+        """
+        Has to be called by the writer, afterwards the data of the writer is used by all threads again.
+        """
+        with self.lock:
+            self._apply_pending_changes()
+            self._snapshot = None
+            self._snapshot_writer = None
+            self._copied = None
+
+    def _apply_pending_changes(self):
+        for identifier, value in self._pending_writes:
+            self._set_data(self._data, identifier, value, self._copied)
+            self.versions[identifier[0]] += 1
+        for namespace in self._pending_changes:
+            self.versions[namespace] += 1
+        self._pending_writes = []
+        self._pending_changes = set()
+
+    def is_snapshot_writer(self):
+        """
+        :return: whether the calling thread has started the snapshot mode
+        :rtype: bool
+        """
+        return self._snapshot_writer == current_thread().ident
+
+    def get_version(self, namespace):
+        """
+        :param namespace: first entry of an identifier
+        :return: change counter of namespace, which is increased every time something in namespace gets set
+        :rtype: int
+        """
+        return self.versions[namespace]
+
+    def add_versioned_namespace(self, identifier):
+        """
+        Allows symbol vectors to skip the namespace of identifier as long as its change counter stays the same.
+        Only use it for namespaces whose data is never modified in place without calling mark_changed afterwards,
+        otherwise symbol vectors return outdated values.
+        :type identifier: list
+        """
+        self.versioned_namespaces.add(identifier[0])
+
+    def mark_changed(self, identifier):
+        """
+        Increases the change counter of the namespace of identifier.
+        Has to be called when data in the god map was modified without using set_data, e.g. by changing an object that
+        was added to the god map directly.
+        :type identifier: list
+        """
+        if self._snapshot is not None and not self.is_snapshot_writer():
+            self._pending_changes.add(identifier[0])
+        else:
+            self.versions[identifier[0]] += 1
+
     def clear_cache(self):
-        # TODO should be possible without clear cache
+        self.accessors = {}
         self.shortcuts = {}
 
     def to_symbol(self, identifier):
@@ -256,6 +389,7 @@ class GodMap(object):
                 raise Exception(u'{} not allowed in key'.format(self.expr_separator))
             self.key_to_expr[identifier] = expr
             self.expr_to_key[str(expr)] = identifier_parts
+            self.shortcuts[identifier] = self.get_accessors(identifier)
         return self.key_to_expr[identifier]
 
     def get_values(self, symbols):
@@ -263,14 +397,26 @@ class GodMap(object):
         :return: a dict which maps all registered expressions to their values or 0 if there is no number entry
         :rtype: dict
         """
-        # TODO potential speedup by only updating entries that have changed
+        # use get_symbol_vector, if only entries that have changed should be updated
         # its a trap, this function only looks slow with lineprofiler
+        data = self._get_lock_free_data()
+        if data is not None:
+            return [self._get_data(self.expr_to_key[expr], data) for expr in symbols]
         with self.lock:
             # if exprs is None:
             #     exprs = self.expr_to_key.keys()
             # return {expr: self.get_data(self.expr_to_key[expr]) for expr in exprs}
             return [self.unsafe_get_data(self.expr_to_key[expr]) for expr in symbols]
 
+    def get_symbol_vector(self, symbols):
+        """
+        Faster alternative to get_values, if the values of the same symbols are needed repeatedly.
+        :param symbols: str of symbols created with to_symbol
+        :type symbols: list
+        :rtype: SymbolVector
+        """
+        return SymbolVector(self, symbols)
+
     def get_registered_symbols(self):
         """
         :rtype: list
@@ -287,27 +433,55 @@ class GodMap(object):
         """
         if len(identifier) == 0:
             raise ValueError(u'key is empty')
+        if self._snapshot is None:
+            self._set_data(self._data, identifier, value)
+        elif self.is_snapshot_writer():
+            self._set_data(self._data, identifier, value, self._copied)
+        else:
+            # readers see the change in a new snapshot, the writer gets it with its next publish
+            snapshot = copy(self._snapshot)
+            self._set_data(snapshot, identifier, value, set())
+            self._snapshot = snapshot
+            self._pending_writes.append((identifier, value))
+            return
+        self.versions[identifier[0]] += 1
+
+    def _set_data(self, data, identifier, value, copied=None):
+        """
+        :param copied: prefixes of identifier whose dicts and lists can be changed in place, all others are copied
+                       before changing them. None changes everything in place.
+        :type copied: Union[None, set]
+        """
         namespace = identifier[0]
-        if namespace not in self._data:
+        if namespace not in data:
             if len(identifier) > 1:
                 raise KeyError(u'Can not access member of unknown namespace: {}'.format(identifier))
             else:
-                self._data[namespace] = value
+                data[namespace] = value
         else:
-            result = self._data[namespace]
-            for member in identifier[1:-1]:
-                result = get_member(result, member)
-            if len(identifier) > 1:
-                member = identifier[-1]
-                if isinstance(result, dict):
-                    result[member] = value
-                elif isinstance(result, list):
-                    result[int(member)] = value
+            container = data
+            for i in range(len(identifier) - 1):
+                member = identifier[i]
+                if i == 0:
+                    result = container[member]
                 else:
-                    setattr(result, member, value)
-            else:
-                self._data[namespace] = value
+                    result = get_member(container, member)
+                if copied is not None:
+                    if isinstance(result, (dict, list)):
+                        prefix = tuple(identifier[:i + 1])
+                        if prefix not in copied:
+                            result = copy(result)
+                            set_member(container, member, result)
+                            copied.add(prefix)
+                    else:
+                        # members of other objects are shared with the snapshots
+                        copied = None
+                container = result
+            set_member(container, identifier[-1], value)
 
     def set_data(self, identifier, value):
+        if self.is_snapshot_writer():
+            self.unsafe_set_data(identifier, value)
+            return
         with self.lock:
             self.unsafe_set_data(identifier, value)
@@ -9,6 +9,8 @@ constraints_identifier = [u'constraints']
 trajectory = [u'traj']
 time = [u'time']
 cmd = [u'cmd']
+# cmd in the order of robot.controlled_joints
+cmd_vector = [u'cmd_vector']
 # last_cmd = [u'last_cmd']
 closest_point = [u'cpi']
 # collisions = [u'collisions']
@@ -82,7 +84,11 @@ joint_weight_override = joint_weight + [u'override']
 
 # qp solver
 qp_solver = rosparam + [u'qp_solver']
+qp_solver_name = qp_solver + [u'name']
 nWSR = qp_solver + [u'nWSR']
+function_cache_size = qp_solver + [u'function_cache_size']
+compiler = qp_solver + [u'compiler']
+qp_history_size = qp_solver + [u'history_size']
 
 # plugins
 plugins = rosparam + [u'plugins']
@@ -102,6 +108,18 @@ frequency_range = plugins + [u'WiggleCancel', u'frequency_range']
 joint_convergence_threshold = plugins + [u'GoalReached', u'joint_convergence_threshold']
 GoalReached_window_size = plugins + [u'GoalReached', u'window_size']
 
+enable_ConvergenceDetector = plugins + [u'ConvergenceDetector', u'enabled']
+ConvergenceDetector_window_size = plugins + [u'ConvergenceDetector', u'window_size']
+ConvergenceDetector_confidence = plugins + [u'ConvergenceDetector', u'confidence']
+ConvergenceDetector_remaining_motion = plugins + [u'ConvergenceDetector', u'remaining_motion']
+
+KinSim_integration = plugins + [u'KinSim', u'integration']
+
+LoopDetector_window_size = plugins + [u'LoopDetector', u'window_size']
+LoopDetector_revolute_precision = plugins + [u'LoopDetector', u'revolute_precision']
+LoopDetector_prismatic_precision = plugins + [u'LoopDetector', u'prismatic_precision']
+LoopDetector_history_size = plugins + [u'LoopDetector', u'history_size']
+
 publish_attached_objects = plugins + [u'tf_publisher', u'publish_attached_objects']
 publish_world_objects = plugins + [u'tf_publisher', u'publish_world_objects']
 tf_topic = plugins + [u'tf_publisher', u'tf_topic']
@@ -132,6 +150,7 @@ self_collision_avoidance_default_override = self_collision_avoidance_distance +
 ignored_self_collisions = self_collision_avoidance + [u'ignore']
 added_self_collisions = self_collision_avoidance + [u'add']
 self_collision_avoidance_repeller = self_collision_avoidance + [u'number_of_repeller']
+self_collision_matrix_processes = self_collision_avoidance + [u'number_of_processes']
 
 external_collision_avoidance = collision_avoidance + [u'external_collision_avoidance']
 external_collision_avoidance_distance = external_collision_avoidance + [u'distance_thresholds']
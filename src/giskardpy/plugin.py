@@ -148,25 +148,32 @@ class PluginBehavior(GiskardBehavior):
         self.my_status = new_state
 
     def loop_over_plugins(self):
+        # other threads read the god map state of the last finished iteration, without blocking this loop
+        self.get_god_map().start_snapshot_mode()
         try:
             # self.init_plugins()
             while self.is_running() and not rospy.is_shutdown():
-                for plugin_name, plugin in self._plugins.items():
+                for plugin_name, plugin in list(self._plugins.items()):
+                    if not self.is_running():
+                        return
+                    for node in plugin.tick():
+                        status = node.status
                     with self.status_lock:
                         if not self.is_running():
                             return
-                        for node in plugin.tick():
-                            status = node.status
                         if status is not None:
                             self.set_status(status)
                         assert self.my_status is not None, u'{} did not return a status'.format(plugin_name)
                         if not self.is_running():
                             return
+                self.get_god_map().publish_snapshot()
                 self.looped_once = True
         except Exception as e:
             traceback.print_exc()
             # TODO make 'exception' string a parameter somewhere
             Blackboard().set('exception', e)
+        finally:
+            self.get_god_map().stop_snapshot_mode()
 
 
 class SuccessPlugin(GiskardBehavior):
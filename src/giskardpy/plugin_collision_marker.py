@@ -5,7 +5,7 @@ from std_msgs.msg import ColorRGBA
 from visualization_msgs.msg import Marker, MarkerArray
 
 import giskardpy.identifier as identifier
-from giskardpy.data_types import Collision, Collisions
+from giskardpy.data_types import Collisions
 from giskardpy.plugin import GiskardBehavior
 
 
@@ -42,14 +42,14 @@ class CollisionMarker(GiskardBehavior):
         m.scale = Vector3(0.003, 0, 0)
         m.pose.orientation.w = 1
         if len(collisions.items()) > 0:
-            for collision in collisions.items():  # type: Collision
+            for collision in collisions.items():
                 red_threshold = 0.05  # TODO don't hardcode this
                 yellow_threshold = red_threshold * 2
                 green_threshold = yellow_threshold * 2
-                contact_distance = collision.get_contact_distance()
+                contact_distance = collision['contact_distance']
                 if contact_distance < green_threshold:
-                    m.points.append(Point(*collision.get_position_on_a_in_map()))
-                    m.points.append(Point(*collision.get_position_on_b_in_map()))
+                    m.points.append(Point(*collision['position_on_a']))
+                    m.points.append(Point(*collision['position_on_b']))
                     m.colors.append(ColorRGBA(0, 1, 0, 1))
                     m.colors.append(ColorRGBA(0, 1, 0, 1))
                 if contact_distance < yellow_threshold:
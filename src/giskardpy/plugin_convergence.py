@@ -0,0 +1,65 @@
+from time import time
+
+import numpy as np
+from py_trees import Status
+
+import giskardpy.identifier as identifier
+from giskardpy import logging
+from giskardpy.plugin import GiskardBehavior
+from giskardpy.plugin_goal_reached import make_velocity_threshold
+from giskardpy.utils import ConvergencePredictor, get_goal_errors
+
+
+class ConvergenceDetector(GiskardBehavior):
+    """
+    Stops planning as soon as the trends of the joint velocities, goal errors and slack of the goal constraints
+    predict that the robot will barely move anymore. Unlike GoalReachedPlugin it doesn't wait for the velocities to
+    fall below their thresholds after a fixed number of sample points.
+    """
+
+    def __init__(self, name):
+        super(ConvergenceDetector, self).__init__(name)
+        self.window_size = self.get_god_map().get_data(identifier.ConvergenceDetector_window_size)
+        self.confidence = self.get_god_map().get_data(identifier.ConvergenceDetector_confidence)
+        self.remaining_motion = self.get_god_map().get_data(identifier.ConvergenceDetector_remaining_motion)
+        self.sample_period = self.get_god_map().get_data(identifier.sample_period)
+
+    def initialise(self):
+        super(ConvergenceDetector, self).initialise()
+        self.thresholds = make_velocity_threshold(self.get_god_map())
+        self.predictor = ConvergencePredictor(self.window_size, self.confidence, self.remaining_motion)
+        self.goal_mask = None
+
+    def make_goal_mask(self):
+        """
+        :return: True for the soft constraints of the qp that are goal constraints
+        :rtype: np.ndarray
+        """
+        self.num_joint_constraints = len(self.get_god_map().get_data(identifier.b_keys))
+        xdot_keys = self.get_god_map().get_data(identifier.xdot_keys)[self.num_joint_constraints:]
+        soft_constraints = self.get_god_map().get_data(identifier.soft_constraint_identifier)
+        return np.array([soft_constraints[key].goal_constraint for key in xdot_keys], dtype=bool)
+
+    @profile
+    def update(self):
+        joint_velocities = self.get_god_map().get_data(identifier.cmd_vector)
+        if joint_velocities is None:
+            return Status.RUNNING
+        if self.goal_mask is None:
+            self.goal_mask = self.make_goal_mask()
+        qp_data = self.get_god_map().get_data(identifier.qp_data)
+        goal_error, slack = get_goal_errors(qp_data[identifier.H[-1]],
+                                            qp_data[identifier.lbA[-1]],
+                                            qp_data[identifier.ubA[-1]],
+                                            qp_data[identifier.xdot_full[-1]],
+                                            self.num_joint_constraints,
+                                            self.goal_mask)
+        velocity = np.max(np.abs(joint_velocities) / self.thresholds) if len(self.thresholds) > 0 else 0.
+        self.predictor.append(velocity, goal_error, slack)
+        if self.predictor.is_converged():
+            planning_time = self.get_god_map().get_data(identifier.time)
+            logging.loginfo(u'predicted convergence, stopped planning.')
+            logging.loginfo(u'found goal trajectory with length {}s in {}s'.format(planning_time * self.sample_period,
+                                                                                   time() - self.get_blackboard().runtime))
+            return Status.SUCCESS
+        return Status.RUNNING
@@ -1,9 +1,15 @@
+import hashlib
 from copy import copy
+from datetime import datetime
 
+import rospy
 from py_trees import Status
+from std_srvs.srv import Trigger, TriggerResponse
 
 import giskardpy.identifier as identifier
+from giskardpy import logging
 from giskardpy.plugin import GiskardBehavior
+from giskardpy.qp_solver import create_qp_solver
 from giskardpy.symengine_controller import InstantaneousController
 from collections import OrderedDict, namedtuple
 
@@ -13,11 +19,20 @@ class ControllerPlugin(GiskardBehavior):
         super(ControllerPlugin, self).__init__(name)
         self.path_to_functions = self.get_god_map().get_data(identifier.data_folder)
         self.nWSR = self.get_god_map().get_data(identifier.nWSR)
+        self.function_cache_size = self.get_god_map().get_data(identifier.function_cache_size)
+        if self.function_cache_size is not None:
+            self.function_cache_size *= 1e6  # MB to bytes
+        self.compiler = self.get_god_map().get_data(identifier.compiler)
+        self.history_size = self.get_god_map().get_data(identifier.qp_history_size)
+        self.jacobian_cache = {}
+        self.jacobian_cache_key = None
+        # keeps the active set of the last goal to hot start the next one
+        self.qp_solver = create_qp_solver(self.get_god_map().get_data(identifier.qp_solver_name))
         self.soft_constraints = None
         self.joint_constraints = None
         self.hard_constraints = None
         self.qp_data = {}
-        self.get_god_map().set_data(identifier.qp_data, self.qp_data)  # safe dict on godmap and work on ref
+        self.get_god_map().set_data(identifier.qp_data, self.qp_data)
         self.rc_prismatic_velocity = self.get_god_map().get_data(identifier.rc_prismatic_velocity)
         self.rc_continuous_velocity = self.get_god_map().get_data(identifier.rc_continuous_velocity)
         self.rc_revolute_velocity = self.get_god_map().get_data(identifier.rc_revolute_velocity)
@@ -28,8 +43,42 @@ class ControllerPlugin(GiskardBehavior):
         self.init_controller()
 
     def setup(self, timeout=0.0):
+        self.print_qp_diagnostics_srv = rospy.Service(u'~print_qp_diagnostics', Trigger, self.print_qp_diagnostics_cb)
+        self.export_qp_history_srv = rospy.Service(u'~export_qp_history', Trigger, self.export_qp_history_cb)
         return super(ControllerPlugin, self).setup(5.0)
 
+    def print_qp_diagnostics_cb(self, data):
+        """
+        Prints the matrices of the last qp as pandas data frames.
+        """
+        if self.history_size == 0:
+            return TriggerResponse(success=False, message=u'the qp history is disabled, set qp_solver/history_size')
+        try:
+            data_frames = self.controller.qp_problem_builder.diagnostics.get_data_frames()
+        except (AttributeError, IndexError):
+            return TriggerResponse(success=False, message=u'no qp has been solved yet')
+        import pandas as pd
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None):
+            for name, data_frame in data_frames.items():
+                logging.loginfo(u'{}:\n{}'.format(name, data_frame))
+        return TriggerResponse(success=True)
+
+    def export_qp_history_cb(self, data):
+        """
+        Saves the last qp solves of the current or last plan as npz file in the data folder,
+        it can be loaded with QPDiagnostics.from_file.
+        """
+        if self.history_size == 0:
+            return TriggerResponse(success=False, message=u'the qp history is disabled, set qp_solver/history_size')
+        try:
+            diagnostics = self.controller.qp_problem_builder.diagnostics
+        except AttributeError:
+            return TriggerResponse(success=False, message=u'no plan has been started yet')
+        path = u'{}qp_history/{}.npz'.format(self.path_to_functions, datetime.now().strftime('%Y-%m-%d-%H-%M-%S'))
+        diagnostics.save(path)
+        logging.loginfo(u'saved {} qp solves in {}'.format(len(diagnostics), path))
+        return TriggerResponse(success=True, message=path)
+
     def init_controller(self):
         new_soft_constraints = self.get_god_map().get_data(identifier.soft_constraint_identifier)
         new_joint_constraints = self.get_god_map().get_data(identifier.joint_constraint_identifier)
@@ -48,10 +97,21 @@ class ControllerPlugin(GiskardBehavior):
         self.hard_constraints = copy(new_hard_constraints)
             # update = True
 
+        # rows of A are cached by constraint name and expression, their columns are the controlled joints
+        jacobian_cache_key = hashlib.md5(str(self.get_robot().controlled_joints).encode(u'utf-8')).hexdigest()
+        if jacobian_cache_key != self.jacobian_cache_key:
+            self.jacobian_cache.clear()
+            self.jacobian_cache_key = jacobian_cache_key
+
         # if update:
         self.controller = InstantaneousController(self.get_robot(),
-                                                  u'{}/{}/'.format(self.path_to_functions,
-                                                                   self.get_robot().get_name()))
+                                                  u'{}functions/{}/'.format(self.path_to_functions,
+                                                                            self.get_robot().get_name()),
+                                                  self.function_cache_size,
+                                                  self.compiler,
+                                                  self.jacobian_cache,
+                                                  self.qp_solver,
+                                                  self.history_size)
 
         controlled_joints = self.get_robot().controlled_joints
         joint_to_symbols_str = OrderedDict(
@@ -63,18 +123,21 @@ class ControllerPlugin(GiskardBehavior):
                                            self.joint_constraints,
                                            self.hard_constraints)
         self.controller.compile()
+        self.symbol_vector = self.get_god_map().get_symbol_vector(self.controller.get_expr())
 
+        self.qp_data = copy(self.qp_data)
         self.qp_data[identifier.weight_keys[-1]], \
         self.qp_data[identifier.b_keys[-1]], \
         self.qp_data[identifier.bA_keys[-1]], \
         self.qp_data[identifier.xdot_keys[-1]] = self.controller.get_qpdata_key_map()
+        self.get_god_map().set_data(identifier.qp_data, self.qp_data)
 
     @profile
     def update(self):
+        expr = self.symbol_vector.update()
 
-        expr = self.controller.get_expr()
-        expr = self.god_map.get_values(expr)
-
+        # a new dict every tick, readers of the god map snapshot must not see a half updated one
+        self.qp_data = copy(self.qp_data)
         next_cmd, \
         self.qp_data[identifier.H[-1]], \
         self.qp_data[identifier.A[-1]], \
@@ -83,6 +146,9 @@ class ControllerPlugin(GiskardBehavior):
         self.qp_data[identifier.lbA[-1]], \
         self.qp_data[identifier.ubA[-1]], \
         self.qp_data[identifier.xdot_full[-1]] = self.controller.get_cmd(expr, self.nWSR)
+        self.get_god_map().set_data(identifier.qp_data, self.qp_data)
         self.get_god_map().set_data(identifier.cmd, next_cmd)
+        # the controller overwrites its array in the next tick, while readers may still use the published one
+        self.get_god_map().set_data(identifier.cmd_vector, self.controller.get_joint_velocities().copy())
 
         return Status.RUNNING
@@ -1,16 +1,24 @@
-import matplotlib.pyplot as plt
 import numpy as np
 from py_trees import Status
 
 import giskardpy.identifier as identifier
 from giskardpy import logging
+from giskardpy.data_types import JointStateArrays
 from giskardpy.exceptions import ShakingException
 from giskardpy.plugin import GiskardBehavior
 # fast
 from giskardpy.plugin_goal_reached import make_velocity_threshold
+from giskardpy.utils import SlidingDFT
 
 
 class WiggleCancel(GiskardBehavior):
+    """
+    Raises a ShakingException, if the changes of the joint velocities of the last window_size sample points have high
+    frequencies with a big amplitude.
+    The spectrum of the moving window is updated with a sliding dft, which only computes the frequencies that count
+    as wiggling.
+    """
+
     def __init__(self, name):
         super(WiggleCancel, self).__init__(name)
         self.amplitude_threshold = self.get_god_map().get_data(identifier.amplitude_threshold)
@@ -21,7 +29,6 @@ class WiggleCancel(GiskardBehavior):
 
     def initialise(self):
         super(WiggleCancel, self).initialise()
-        self.js_samples = []
         self.sample_period = self.get_god_map().get_data(identifier.sample_period)
         self.max_detectable_freq = 1 / (2 * self.sample_period)
         self.min_wiggle_frequency = self.frequency_range * self.max_detectable_freq
@@ -42,26 +49,51 @@ class WiggleCancel(GiskardBehavior):
         self.key_set = set(self.keys)
         self.thresholds = np.array(self.thresholds)
         self.velocity_limits = np.array(self.velocity_limits)
-        self.js_samples = [[] for _ in range(len(self.keys))]
-
+        self.amplitude_thresholds = self.velocity_limits * self.amplitude_threshold
+        # the spectrum is computed from the differences of the velocities
+        N = self.num_samples_in_fft - 1
+        frequencies = np.fft.rfftfreq(N, d=self.sample_period)
+        bins = np.nonzero(frequencies >= self.min_wiggle_frequency)[0]
+        self.frequencies = frequencies[bins]
+        self.dft = SlidingDFT(len(self.keys), N, bins)
+        self.last_velocity = None
+        # a joint counts as moving, if its velocity exceeded its threshold once in the window
+        self.moving = np.zeros((len(self.keys), self.num_samples_in_fft), dtype=bool)
+        self.moving_count = np.zeros(len(self.keys), dtype=int)
+        self.number_of_samples = 0
+        self.joint_names = None
+        self.columns = None
+
+    def get_velocities(self, joint_states):
+        """
+        :return: velocities of the controlled joints
+        :rtype: np.ndarray
+        """
+        if not isinstance(joint_states, JointStateArrays):
+            return np.array([joint_states[key].velocity for key in self.keys])
+        if joint_states.names is not self.joint_names:
+            self.joint_names = joint_states.names
+            self.columns = np.array([joint_states.index[key] for key in self.keys], dtype=int)
+        return joint_states.velocity[self.columns]
+
+    @profile
     def update(self):
-        latest_points = self.get_god_map().get_data(identifier.joint_states)
-
-        for i, key in enumerate(self.keys):
-            self.js_samples[i].append(latest_points[key].velocity)
-
-        if len(self.js_samples[0]) < self.num_samples_in_fft:
+        velocity = self.get_velocities(self.get_god_map().get_data(identifier.joint_states))
+        if self.last_velocity is not None:
+            self.dft.append(velocity - self.last_velocity)
+        self.last_velocity = velocity
+
+        i = self.number_of_samples % self.num_samples_in_fft
+        self.moving_count -= self.moving[:, i]
+        np.greater(velocity, self.thresholds, out=self.moving[:, i])
+        self.moving_count += self.moving[:, i]
+        self.number_of_samples += 1
+
+        if self.number_of_samples < self.num_samples_in_fft:
             return Status.RUNNING
 
-        if len(self.js_samples[0]) > self.num_samples_in_fft:
-            for i in range(len(self.js_samples)):
-                self.js_samples[i].pop(0)
-
-        js_samples_array = np.array(self.js_samples)
-        plot = False
         try:
-            self.detect_shaking(js_samples_array, self.sample_period, self.min_wiggle_frequency,
-                                self.amplitude_threshold, self.thresholds, self.velocity_limits, plot)
+            self.detect_shaking(self.moving_count > 0)
         except ShakingException as e:
             if self.get_god_map().get_data(identifier.cut_off_shaking):
                 trajectory = self.get_god_map().get_data(identifier.trajectory)
@@ -77,65 +109,27 @@ class WiggleCancel(GiskardBehavior):
 
         return Status.RUNNING
 
-    def make_mask(self, js_samples, moving_thresholds):
-        return np.any(js_samples.T > moving_thresholds, axis=0)
-
-    def detect_shaking(self, js_samples, sample_period, min_wiggle_frequency, amplitude_threshold, moving_thresholds,
-                       velocity_limits, plot=False):
-        N = len(js_samples[0]) - 1
-        # remove joints that arent moving
-        mask = self.make_mask(js_samples, moving_thresholds)
-        velocity_limits = velocity_limits[mask]
-        amplitude_thresholds = velocity_limits * amplitude_threshold  # acceleration limit is basically vel*2
-        joints_filtered = js_samples[mask]
-        joints_filtered = np.diff(joints_filtered)
-        # joints_filtered = (joints_filtered.T - joints_filtered.mean(axis=1)).T
-
-        if len(joints_filtered) == 0:
-            return False
-
-        freq = np.fft.rfftfreq(N, d=sample_period)
-
-        # find index in frequency list where frequency >= min_wiggle_frequency
-        try:
-            freq_idx = next(i for i, v in enumerate(freq) if v >= min_wiggle_frequency)
-        except StopIteration:
-            return False
-
-        fft = np.fft.rfft(joints_filtered, axis=1)
-        fft = [2.0 * np.abs(i)/N for i in fft]
-        if plot:
-            y = joints_filtered
-
-            x = np.linspace(0, N * sample_period, N)
-            y = np.array(y)
-            fig, ax = plt.subplots()
-            for yy in y:
-                ax.plot(x, yy)
-            plt.show()
-
-            fig, ax = plt.subplots()
-            for i, yy in enumerate(y):
-                yf = fft[i]
-                # yf = np.fft.rfft(yy)
-                xf = np.fft.rfftfreq(N, d=sample_period)
-                plt.plot(xf, np.abs(yf.real), label=u'real')
-                # plt.plot(xf, np.abs(yf.imag), label=u'img')
-            plt.show()
-
-        fft = (velocity_limits * np.array(fft).T).T
-        violations = fft[:, freq_idx:].T > amplitude_thresholds
+    def detect_shaking(self, mask):
+        """
+        :param mask: joints that are moving, the others are ignored
+        :type mask: np.ndarray
+        :raises: ShakingException
+        """
+        if len(self.frequencies) == 0 or not mask.any():
+            return
+        velocity_limits = self.velocity_limits[mask]
+        amplitudes = self.dft.get_amplitudes(mask)
+        violations = (amplitudes.T * velocity_limits).T > self.amplitude_thresholds[mask][:, None]
         if np.any(violations):
             filtered_keys = self.keys[mask]
             violation_str = u''
-            for i in range(violations.shape[1]):
-                if np.any(violations[:, i]):
+            for i in range(violations.shape[0]):
+                if np.any(violations[i]):
                     joint = filtered_keys[i]
-                    velocity_limit = velocity_limits[i]
-                    hertz_str = u', '.join(u'{} hertz: {} > {}'.format(freq[freq_idx:][j],
-                                                                     fft[:, freq_idx:].T[:, i][j] / velocity_limit,
-                                                                     amplitude_threshold) for j, x in
-                                         enumerate(violations[:, i]) if x)
+                    hertz_str = u', '.join(u'{} hertz: {} > {}'.format(self.frequencies[j],
+                                                                     amplitudes[i, j],
+                                                                     self.amplitude_threshold) for j, x in
+                                         enumerate(violations[i]) if x)
                     violation_str += u'\nshaking of joint: \'{}\' at '.format(joint) + hertz_str
             raise ShakingException(u'endless wiggling detected' + violation_str)
 
@@ -1,13 +1,18 @@
-from collections import OrderedDict
-
+import numpy as np
 from py_trees import Status
 
-from giskardpy.data_types import SingleJointState
+from giskardpy.data_types import JointStateArrays
 import giskardpy.identifier as identifier
 from giskardpy.plugin import GiskardBehavior
 
 
 class KinSimPlugin(GiskardBehavior):
+    """
+    Integrates the commands of the controller for all joints at once.
+    The joint states are kept in arrays with the controlled joints first, in the same order as the commands.
+    """
+    integration_modes = (u'velocity', u'acceleration', u'jerk')
+
     def __init__(self, name):
         """
         :type js_identifier: str
@@ -20,22 +25,54 @@ class KinSimPlugin(GiskardBehavior):
 
     def initialise(self):
         self.sample_period = self.get_god_map().get_data(identifier.sample_period)
+        self.integration = self.get_god_map().get_data(identifier.KinSim_integration)
+        if self.integration is None:
+            self.integration = u'velocity'
+        if self.integration not in self.integration_modes:
+            raise ValueError(u'unknown integration mode {}, use one of {}'.format(self.integration,
+                                                                                self.integration_modes))
+        self.acceleration = None
+        self.joint_names = None
         super(KinSimPlugin, self).initialise()
 
+    def integrate(self, position, velocity, next_velocity):
+        """
+        :param position: positions at the start of the sample period
+        :type position: np.ndarray
+        :param velocity: velocities at the start of the sample period
+        :type velocity: np.ndarray
+        :param next_velocity: velocities at the end of the sample period
+        :type next_velocity: np.ndarray
+        :return: positions at the end of the sample period
+        :rtype: np.ndarray
+        """
+        dt = self.sample_period
+        if self.integration == u'velocity':
+            return position + next_velocity * dt
+        if self.integration == u'acceleration':
+            return position + (velocity + next_velocity) * (dt / 2.)
+        # constant jerk, the acceleration ramps from the last to the current mean acceleration
+        if self.acceleration is None or len(self.acceleration) != len(position):
+            self.acceleration = np.zeros(len(position))
+        acceleration = self.acceleration
+        self.acceleration = (next_velocity - velocity) / dt
+        return position + velocity * dt + (2 * acceleration + self.acceleration) * (dt ** 2 / 6.)
+
     @profile
     def update(self):
-        motor_commands = self.get_god_map().get_data(identifier.cmd)
+        motor_commands = self.get_god_map().get_data(identifier.cmd_vector)
         current_js = self.get_god_map().get_data(identifier.joint_states)
         next_js = None
-        if motor_commands:
-            next_js = OrderedDict()
-            for joint_name, sjs in current_js.items():
-                if joint_name in motor_commands:
-                    cmd = motor_commands[joint_name]
-                else:
-                    cmd = 0.0
-                next_js[joint_name] = SingleJointState(sjs.name, sjs.position + cmd,
-                                                            velocity=cmd/self.sample_period)
+        if motor_commands is not None:
+            if not isinstance(current_js, JointStateArrays) or current_js.names is not self.joint_names:
+                # only necessary in the first tick or if somebody else changed the joint state
+                current_js = JointStateArrays.from_joint_states(current_js, self.get_robot().controlled_joints)
+                self.joint_names = current_js.names
+            next_velocity = np.zeros(len(current_js))
+            next_velocity[:len(motor_commands)] = motor_commands
+            next_velocity /= self.sample_period
+            next_position = self.integrate(current_js.position, current_js.velocity, next_velocity)
+            next_js = JointStateArrays(current_js.names, current_js.index, next_position, next_velocity)
         if next_js is not None:
             self.get_god_map().set_data(identifier.joint_states, next_js)
         else:
@@ -1,7 +1,9 @@
+import numpy as np
 from py_trees import Status
 from time import time
 import giskardpy.identifier as identifier
 from giskardpy import logging
+from giskardpy.data_types import JointStateArrays, QuantizedStateHistory
 from giskardpy.plugin import GiskardBehavior
 
 
@@ -9,35 +11,50 @@ from giskardpy.plugin import GiskardBehavior
 
 
 class LoopDetector(GiskardBehavior):
+    """
+    Stops planning when the robot reaches a joint state again, that it was in before.
+    Joint positions are rounded to a number of decimals, which depends on the joint type, and only the last
+    history_size joint states are remembered.
+    """
+
     def __init__(self, name):
-        self.precision = 3
-        self.window_size = 21
         super(LoopDetector, self).__init__(name)
 
     def initialise(self):
         super(LoopDetector, self).initialise()
-        self.past_joint_states = set()
+        self.window_size = self.get_god_map().get_data(identifier.LoopDetector_window_size)
+        self.revolute_precision = self.get_god_map().get_data(identifier.LoopDetector_revolute_precision)
+        self.prismatic_precision = self.get_god_map().get_data(identifier.LoopDetector_prismatic_precision)
+        self.history_size = self.get_god_map().get_data(identifier.LoopDetector_history_size)
+        self.joint_names = None
+        self.past_joint_states = None
+
+    def make_scale(self, joint_names):
+        """
+        :return: factor for each joint, that shifts the decimals that are kept in front of the decimal point
+        :rtype: np.ndarray
+        """
+        robot = self.get_robot()
+        precision = [self.prismatic_precision if robot.has_joint(joint_name) and robot.is_joint_prismatic(joint_name)
+                     else self.revolute_precision for joint_name in joint_names]
+        return 10. ** np.array(precision)
 
     @profile
     def update(self):
         current_js = self.get_god_map().get_data(identifier.joint_states)
         planning_time = self.get_god_map().get_data(identifier.time)
-        rounded_js = self.round_js(current_js)
-        if planning_time >= self.window_size and rounded_js in self.past_joint_states:
+        if not isinstance(current_js, JointStateArrays):
+            current_js = JointStateArrays.from_joint_states(current_js)
+        if current_js.names is not self.joint_names and current_js.names != self.joint_names:
+            # the keys of the old joint states are meaningless for other joints
+            self.joint_names = current_js.names
+            self.past_joint_states = QuantizedStateHistory(self.make_scale(self.joint_names), self.history_size)
+        key = self.past_joint_states.get_key(current_js.position)
+        if planning_time >= self.window_size and key in self.past_joint_states:
             sample_period = self.get_god_map().get_data(identifier.sample_period)
             logging.loginfo(u'found loop, stopped planning.')
             logging.loginfo(u'found goal trajectory with length {}s in {}s'.format(planning_time * sample_period,
                                                                                    time() - self.get_blackboard().runtime))
             return Status.SUCCESS
-        self.past_joint_states.add(rounded_js)
+        self.past_joint_states.add(key)
         return Status.RUNNING
-
-    def round_js(self, js):
-        """
-        :param js: joint_name -> SingleJointState
-        :type js: dict
-        :return: a sequence of all the rounded joint positions
-        :rtype: tuple
-        """
-        # FIXME weird non deterministic error, happens because pluginbehavior is not stopped fast enough?
-        return tuple(round(x.position, self.precision) for x in js.values())
@@ -161,6 +161,8 @@ class WorldUpdatePlugin(GiskardBehavior):
             pass
             for object_name, object_joint_state in self.object_joint_states.items():
                 self.get_world().get_object(object_name).joint_state = object_joint_state
+            if self.object_joint_states:
+                self.get_god_map().mark_changed(identifier.world)
 
         return Status.SUCCESS
 
@@ -291,6 +293,8 @@ class WorldUpdatePlugin(GiskardBehavior):
                     return UpdateWorldResponse(UpdateWorldResponse.UNSUPPORTED_OPTIONS, str(e))
                 except Exception as e:
                     traceback.print_exc()
+                finally:
+                    self.get_god_map().mark_changed(identifier.world)
                 return UpdateWorldResponse(UpdateWorldResponse.UNSUPPORTED_OPTIONS,
                                            u'{}: {}'.format(e.__class__.__name__,
                                                             str(e)))
@@ -1,18 +1,30 @@
+from collections import defaultdict
+
+import numpy as np
+
 import giskardpy.pybullet_wrapper as p
 from geometry_msgs.msg import Point, Pose
 from giskard_msgs.msg import CollisionEntry
 from pybullet import error
 
 import giskardpy
-from giskardpy.data_types import Collision, Collisions
+from giskardpy.data_types import Collisions, CONTACT_DTYPE
 from giskardpy.exceptions import CorruptShapeException
 from giskardpy.pybullet_world_object import PyBulletWorldObject
 from giskardpy.pybullet_wrapper import ContactInfo
-from giskardpy.utils import resolve_ros_iris
+from giskardpy.utils import resolve_ros_iris, KeyDefaultDict
 from giskardpy.world import World
 from giskardpy.world_object import WorldObject
 
 
+def distance_to_aabb(point, aabb_min, aabb_max):
+    """
+    :return: distance between point and the closest point of the axis aligned bounding box, 0 if point is inside.
+    :rtype: float
+    """
+    return np.linalg.norm(np.maximum(0, np.maximum(aabb_min - point, point - aabb_max)))
+
+
 class PyBulletWorld(World):
     """
     Wraps around the shitty pybullet api.
@@ -46,58 +58,112 @@ class PyBulletWorld(World):
         :param self_collision_d: distances grater than this value will be ignored
         :type self_collision_d: float
         :type enable_self_collision: bool
-        :return: (robot_link, body_b, link_b) -> Collision
         :rtype: Collisions
         """
         collisions = Collisions(self.robot, collision_list_size)
+        aabbs = KeyDefaultDict(self.get_aabb)
+        contacts = self.get_closest_points(cut_off_distances)
+        flip = np.array([self.should_flip_collision(contact, aabbs) for contact in contacts], dtype=bool)
+        position_on_a = contacts['position_on_a'][flip]
+        contacts['position_on_a'][flip] = contacts['position_on_b'][flip]
+        contacts['position_on_b'][flip] = position_on_a
+        contacts['contact_normal'][flip] *= -1
+        collisions.add(contacts)
+        return collisions
+
+    @profile
+    def get_closest_points(self, cut_off_distances):
+        """
+        Entries with the same robot link and body are checked with a single getClosestPoints call, if they cover at
+        least half of the links of the body, otherwise each link is checked individually.
+        :param cut_off_distances: see check_collisions
+        :type cut_off_distances: dict
+        :return: closest points, which are closer than 1.1 * their cut off distance, with dtype CONTACT_DTYPE
+        :rtype: np.ndarray
+        """
         robot_name = self.robot.get_name()
+        robot_id = self.robot.get_pybullet_id()
+        queries = defaultdict(dict)
         for (robot_link, body_b, link_b), distance in cut_off_distances.items():
-            if robot_name == body_b:
-                object_id = self.robot.get_pybullet_id()
-                link_b_id = self.robot.get_pybullet_link_id(link_b)
+            queries[robot_link, body_b][link_b] = distance * 1.1
+        contacts = []
+        for (robot_link, body_b), link_bs in queries.items():
+            if body_b == robot_name:
+                body_b_object = self.robot
             else:
-                object_id = self.__get_pybullet_object_id(body_b)
-                if link_b != CollisionEntry.ALL:
-                    link_b_id = self.get_object(body_b).get_pybullet_link_id(link_b)
-
+                body_b_object = self.get_object(body_b)
+            body_b_id = body_b_object.get_pybullet_id()
             robot_link_id = self.robot.get_pybullet_link_id(robot_link)
-            if body_b == robot_name or link_b != CollisionEntry.ALL:
-                contacts = [ContactInfo(*x) for x in p.getClosestPoints(self.robot.get_pybullet_id(), object_id,
-                                                                        distance * 1.1,
-                                                                        robot_link_id, link_b_id)]
+            if CollisionEntry.ALL in link_bs or \
+                    2 * len(link_bs) >= len(body_b_object.get_link_names_with_collision()):
+                default_distance = link_bs.get(CollisionEntry.ALL)
+                for contact in p.getClosestPoints(robot_id, body_b_id, max(link_bs.values()), robot_link_id):
+                    link_b = body_b_object.pybullet_link_id_to_name(contact[4])
+                    distance = link_bs.get(link_b, default_distance)
+                    if distance is not None and contact[8] <= distance:
+                        contacts.append((robot_link, body_b, link_b, contact[5], contact[6], contact[7], contact[8]))
             else:
-                contacts = [ContactInfo(*x) for x in p.getClosestPoints(self.robot.get_pybullet_id(), object_id,
-                                                                        distance * 1.1,
-                                                                        robot_link_id)]
-            if len(contacts) > 0:
-                try:
-                    body_b_object = self.get_object(body_b)
-                except KeyError:
-                    body_b_object = self.robot
-                pass
-                for contact in contacts:  # type: ContactInfo
-                    if link_b == CollisionEntry.ALL:
-                        link_b_tmp = body_b_object.pybullet_link_id_to_name(contact.link_index_b)
-                    else:
-                        link_b_tmp = link_b
-                    if self.__should_flip_collision(contact.position_on_a, robot_link):
-                        flipped_normal = [-contact.contact_normal_on_b[0],
-                                          -contact.contact_normal_on_b[1],
-                                          -contact.contact_normal_on_b[2]]
-                        collision = Collision(robot_link, body_b, link_b_tmp,
-                                              contact.position_on_b, contact.position_on_a,
-                                              flipped_normal, contact.contact_distance)
-                        collisions.add(collision)
-                    else:
-                        collision = Collision(robot_link, body_b, link_b_tmp,
-                                              contact.position_on_a, contact.position_on_b,
-                                              contact.contact_normal_on_b, contact.contact_distance)
-                        collisions.add(collision)
-        return collisions
+                for link_b, distance in link_bs.items():
+                    link_b_id = body_b_object.get_pybullet_link_id(link_b)
+                    for contact in p.getClosestPoints(robot_id, body_b_id, distance, robot_link_id, link_b_id):
+                        contacts.append((robot_link, body_b, link_b, contact[5], contact[6], contact[7], contact[8]))
+        return np.array(contacts, dtype=CONTACT_DTYPE)
+
+    def get_aabb(self, key):
+        """
+        :param key: (body name, link name)
+        :type key: tuple
+        :return: min and max corner of the axis aligned bounding box of the link in map frame
+        :rtype: tuple
+        """
+        body, link = key
+        if body == self.robot.get_name():
+            body_object = self.robot
+        else:
+            body_object = self.get_object(body)
+        aabb_min, aabb_max = p.getAABB(body_object.get_pybullet_id(), body_object.get_pybullet_link_id(link))
+        return np.array(aabb_min), np.array(aabb_max)
+
+    def should_flip_collision(self, contact, aabbs):
+        """
+        Pybullet sometimes returns a contact where position_on_a lies on link b and vice versa.
+        A point on the surface of a link is always inside of its aabb, so if only one of the assignments puts both
+        points inside of the aabbs of their links, it has to be the correct one.
+        If this is inconclusive, e.g. because the aabbs overlap, the direction from position_on_a to position_on_b
+        is compared with the direction from the center of the aabb of link a to the one of link b. They point in the
+        same direction if the links are apart and in opposite directions if they penetrate each other.
+        should_flip_collision_by_query is only used if this is inconclusive as well, e.g. because the points or the
+        centers are equal.
+        :param contact: entry of an array with dtype CONTACT_DTYPE
+        :param aabbs: (body name, link name) -> aabb, see get_aabb
+        :type aabbs: KeyDefaultDict
+        :rtype: bool
+        """
+        a_min, a_max = aabbs[self.robot.get_name(), contact['link_a']]
+        b_min, b_max = aabbs[contact['body_b'], contact['link_b']]
+        position_on_a = contact['position_on_a']
+        position_on_b = contact['position_on_b']
+        distance = (distance_to_aabb(position_on_a, a_min, a_max) +
+                    distance_to_aabb(position_on_b, b_min, b_max))
+        flipped_distance = (distance_to_aabb(position_on_b, a_min, a_max) +
+                            distance_to_aabb(position_on_a, b_min, b_max))
+        if distance < flipped_distance:
+            return False
+        if flipped_distance < distance:
+            return True
+        a_to_b = np.dot(position_on_b - position_on_a, (b_min + b_max - a_min - a_max) / 2.)
+        a_to_b *= contact['contact_distance']
+        if a_to_b > 0:
+            return False
+        if a_to_b < 0:
+            return True
+        return self.should_flip_collision_by_query(position_on_a, contact['link_a'])
 
-    def __should_flip_collision(self, position_on_a_in_map, link_a):
+    def should_flip_collision_by_query(self, position_on_a_in_map, link_a):
         """
-        :type collision: ContactInfo
+        Moves a tiny ball to position_on_a_in_map and checks if it touches link_a.
+        :type position_on_a_in_map: list
+        :type link_a: str
         :rtype: bool
         """
         new_p = Pose()
@@ -1,11 +1,15 @@
+import os
 from collections import OrderedDict
-from multiprocessing import Lock
+from multiprocessing import Lock, Pool
+
+import numpy as np
 
 import giskardpy.pybullet_wrapper as pw
 from geometry_msgs.msg import Pose
 
 from giskardpy.pybullet_wrapper import load_urdf_string_into_bullet, JointInfo, pybullet_pose_to_msg, \
-    deactivate_rendering, activate_rendering, msg_to_pybullet_pose
+    deactivate_rendering, activate_rendering, msg_to_pybullet_pose, random_string, _check_collisions_in_joint_states
+from giskardpy.utils import write_to_tmp, resolve_ros_iris_in_urdf, joint_state_position_items
 from giskardpy.world_object import WorldObject
 from giskardpy import logging
 
@@ -56,18 +60,26 @@ class PyBulletWorldObject(WorldObject):
                 """
         with self.lock:
             WorldObject.joint_state.fset(self, value)
-            for joint_name, singe_joint_state in value.items():
-                # FIXME hack because pybullet doesn't support mimic joints
-                if not self.is_joint_mimic(joint_name):
-                    pw.resetJointState(self._pybullet_id, self.joint_name_to_info[joint_name].joint_index,
-                                      singe_joint_state.position)
-                if joint_name in self.mimic_cb:
-                    mimic_joint, cb = self.mimic_cb[joint_name]
-                    mimiced_position = cb(singe_joint_state.position)
-                    pw.resetJointState(self._pybullet_id, self.joint_name_to_info[mimic_joint].joint_index,
-                                      mimiced_position)
-                else:
-                    pass
+            for joint_index, position in self.to_pybullet_joint_state(value):
+                pw.resetJointState(self._pybullet_id, joint_index, position)
+
+    def to_pybullet_joint_state(self, joint_state):
+        """
+        :param joint_state: joint name -> SingleJointState
+        :type joint_state: dict
+        :return: list of (pybullet joint index, position) tuples, including the positions of mimic joints
+        :rtype: list
+        """
+        pybullet_joint_state = []
+        for joint_name, position in joint_state_position_items(joint_state):
+            # FIXME hack because pybullet doesn't support mimic joints
+            if not self.is_joint_mimic(joint_name):
+                pybullet_joint_state.append((self.joint_name_to_info[joint_name].joint_index, position))
+            if joint_name in self.mimic_cb:
+                mimic_joint, cb = self.mimic_cb[joint_name]
+                mimiced_position = cb(position)
+                pybullet_joint_state.append((self.joint_name_to_info[mimic_joint].joint_index, mimiced_position))
+        return pybullet_joint_state
 
 
     @WorldObject.base_pose.setter
@@ -167,6 +179,47 @@ class PyBulletWorldObject(WorldObject):
     def pybullet_link_id_to_name(self, link_id):
         return self.link_id_to_name[link_id]
 
+    def check_collisions_in_joint_states(self, link_combinations, distance, joint_states):
+        """
+        Shards the joint states across self.number_of_processes processes, each with its own headless pybullet.
+        The link pairs found by all processes are removed before the next batch of joint states is checked.
+        :param link_combinations: set with link name tuples
+        :type link_combinations: set
+        :param joint_states: list of joint states
+        :type joint_states: list
+        :return: link name tuples, which are in collision in at least one of the joint states
+        :rtype: set
+        """
+        if self.number_of_processes <= 1:
+            return super(PyBulletWorldObject, self).check_collisions_in_joint_states(link_combinations, distance,
+                                                                                     joint_states)
+        id_to_link_combination = {(self.get_pybullet_link_id(link_a), self.get_pybullet_link_id(link_b)):
+                                      (link_a, link_b) for link_a, link_b in link_combinations}
+        rest = set(id_to_link_combination.keys())
+        in_collision = set()
+        joint_states = [self.to_pybullet_joint_state(joint_state) for joint_state in joint_states]
+        # progress is reported after each batch
+        chunk_size = max(1, int(np.ceil(len(joint_states) / (self.number_of_processes * 10.))))
+        batch_size = chunk_size * self.number_of_processes
+        urdf_file_name = write_to_tmp(u'{}_{}.urdf'.format(self.get_name(), random_string()),
+                                      resolve_ros_iris_in_urdf(self.get_urdf_str()))
+        pool = Pool(self.number_of_processes)
+        try:
+            for batch_start in range(0, len(joint_states), batch_size):
+                batch_end = min(batch_start + batch_size, len(joint_states))
+                chunks = [(urdf_file_name, rest, distance, joint_states[i:min(i + chunk_size, batch_end)])
+                          for i in range(batch_start, batch_end, chunk_size)]
+                for in_collision2 in pool.map(_check_collisions_in_joint_states, chunks):
+                    rest = rest.difference(in_collision2)
+                    in_collision = in_collision.union(in_collision2)
+                logging.loginfo(u'checked {}/{} joint states for self collisions'.format(batch_end,
+                                                                                        len(joint_states)))
+        finally:
+            pool.close()
+            pool.join()
+            os.remove(urdf_file_name)
+        return {id_to_link_combination[x] for x in in_collision}
+
     def in_collision(self, link_a, link_b, distance):
         link_id_a = self.get_pybullet_link_id(link_a)
         link_id_b = self.get_pybullet_link_id(link_b)
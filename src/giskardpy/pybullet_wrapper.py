@@ -6,7 +6,7 @@ from collections import namedtuple
 import pybullet as p
 from pybullet import resetJointState, getNumJoints, resetBasePositionAndOrientation, getBasePositionAndOrientation, \
     removeBody
-from pybullet import getClosestPoints
+from pybullet import getClosestPoints, getAABB
 from geometry_msgs.msg import Pose, PoseStamped, Point, Quaternion
 
 import giskardpy
@@ -79,6 +79,46 @@ def load_urdf_string_into_bullet(urdf_string, pose=None):
     return id
 
 
+def check_collisions_in_joint_states(urdf_file_name, link_id_combinations, distance, joint_states):
+    """
+    Loads a urdf into a new headless pybullet instance and checks which link pairs are in collision in any of the
+    joint states. Meant to be called from worker processes, see PyBulletWorldObject.check_collisions_in_joint_states.
+    :param urdf_file_name: path to urdf without ros iris
+    :type urdf_file_name: str
+    :param link_id_combinations: set of pybullet link id tuples
+    :type link_id_combinations: set
+    :type distance: float
+    :param joint_states: list of lists containing (pybullet joint index, position) tuples
+    :type joint_states: list
+    :return: pybullet link id tuples which are in collision in at least one of the joint states
+    :rtype: set
+    """
+    client_id = p.connect(p.DIRECT)
+    try:
+        with NullContextManager() if giskardpy.PRINT_LEVEL == DEBUG else suppress_stdout():
+            body_id = p.loadURDF(urdf_file_name, flags=p.URDF_USE_SELF_COLLISION_EXCLUDE_PARENT,
+                                 physicsClientId=client_id)
+        in_collision = set()
+        rest = set(link_id_combinations)
+        for joint_state in joint_states:
+            for joint_index, position in joint_state:
+                p.resetJointState(body_id, joint_index, position, physicsClientId=client_id)
+            in_collision2 = {(link_a, link_b) for link_a, link_b in rest
+                             if len(p.getClosestPoints(body_id, body_id, distance, link_a, link_b,
+                                                       physicsClientId=client_id)) > 0}
+            if len(in_collision2) > 0:
+                rest = rest.difference(in_collision2)
+                in_collision = in_collision.union(in_collision2)
+        return in_collision
+    finally:
+        p.disconnect(client_id)
+
+
+def _check_collisions_in_joint_states(args):
+    # Pool.map only supports functions with one parameter
+    return check_collisions_in_joint_states(*args)
+
+
 def deactivate_rendering():
     p.configureDebugVisualizer(p.COV_ENABLE_RENDERING, 0)
     p.configureDebugVisualizer(p.COV_ENABLE_TINY_RENDERER, 0)
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from giskardpy.utils import create_path
+
+
+def make_data_frames(b_names, bA_names, H, g, A, lb, ub, lbA, ubA, xdot_full=None):
+    """
+    Builds pandas data frames of a filtered problem, which are sorted by the names of the entries.
+    xdot, Ax, xH, lbA - x and ubA - x are only included if xdot_full is given.
+    :param b_names: names of the entries of lb, ub, g and the diagonal of H
+    :type b_names: np.ndarray
+    :param bA_names: names of the entries of lbA and ubA
+    :type bA_names: np.ndarray
+    :param xdot_full: solution of the problem, None if the solver failed
+    :type xdot_full: np.ndarray
+    :rtype: OrderedDict
+    """
+    import pandas as pd
+
+    def vector(data, names):
+        return pd.DataFrame(data, names, [u'data'], dtype=float).sort_index()
+
+    data_frames = OrderedDict()
+    data_frames[u'H'] = vector(H, b_names)
+    data_frames[u'A'] = pd.DataFrame(A, bA_names, b_names, dtype=float).sort_index(1).sort_index(0)
+    data_frames[u'lbA'] = vector(lbA, bA_names)
+    data_frames[u'ubA'] = vector(ubA, bA_names)
+    data_frames[u'lb'] = vector(lb, b_names)
+    data_frames[u'ub'] = vector(ub, b_names)
+    data_frames[u'g'] = vector(g, b_names)
+    if xdot_full is not None:
+        data_frames[u'xdot'] = vector(xdot_full, b_names)
+        data_frames[u'Ax'] = vector(np.dot(A, xdot_full), bA_names)
+        data_frames[u'xH'] = vector(xdot_full ** 2 * H, b_names)
+        x_soft = xdot_full[len(xdot_full) - len(lbA):]
+        data_frames[u'lbA - x'] = vector(lbA - x_soft, bA_names)
+        data_frames[u'ubA - x'] = vector(ubA - x_soft, bA_names)
+    return data_frames
+
+
+class QPDiagnostics(object):
+    """
+    Ring buffer of the filtered qp problems of the last solves.
+    Appending copies the filtered matrices, the name arrays are only referenced, because the qp problem builder
+    replaces them instead of changing them. Pandas views of a solve are only built on demand.
+    The buffer can be saved as compressed npz file and loaded again to replay the solves offline.
+    """
+    entry_names = [u'b_names', u'bA_names', u'H', u'g', u'A', u'lb', u'ub', u'lbA', u'ubA', u'xdot_full']
+
+    def __init__(self, size=0):
+        """
+        :param size: number of solves that are kept, 0 disables the history
+        :type size: int
+        """
+        self.size = size
+        self.entries = [None] * size
+        self.clear()
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        :param path: npz file created with save
+        :type path: str
+        :return: buffer that is exactly as big as the number of saved solves
+        :rtype: QPDiagnostics
+        """
+        data = np.load(path)
+        number_of_entries = int(data[u'number_of_entries'])
+        self = cls(number_of_entries)
+        for tick in range(number_of_entries):
+            entry = [data[u'{}_{}'.format(name, tick)] for name in self.entry_names]
+            if np.isnan(entry[-1]).any():
+                entry[-1] = None
+            self.append(*entry)
+        return self
+
+    def save(self, path):
+        """
+        Writes the solves in chronological order into a compressed npz file.
+        The problems may differ in size, therefore each entry of each tick is saved as separate array.
+        :type path: str
+        """
+        create_path(path)
+        arrays = {}
+        for tick in range(self.number_of_entries):
+            for name, value in zip(self.entry_names, self.get(tick)):
+                # failed solves have no solution
+                arrays[u'{}_{}'.format(name, tick)] = np.array(np.nan) if value is None else value
+        np.savez_compressed(path, number_of_entries=self.number_of_entries, **arrays)
+
+    def clear(self):
+        self.last = -1
+        self.number_of_entries = 0
+
+    def __len__(self):
+        return self.number_of_entries
+
+    def append(self, b_names, bA_names, H, g, A, lb, ub, lbA, ubA, xdot_full=None):
+        """
+        Overwrites the oldest entry if the buffer is full, does nothing if its size is 0.
+        The arguments are the filtered problem in the order of the arguments of QPSolver.solve.
+        :param b_names: names of the entries of lb, ub, g and the diagonal of H
+        :type b_names: np.ndarray
+        :param bA_names: names of the entries of lbA and ubA
+        :type bA_names: np.ndarray
+        :param xdot_full: solution of the problem, None if the solver failed
+        :type xdot_full: np.ndarray
+        """
+        if self.size == 0:
+            return
+        self.last = (self.last + 1) % self.size
+        self.number_of_entries = min(self.number_of_entries + 1, self.size)
+        self.entries[self.last] = (b_names, bA_names, H.copy(), g.copy(), A.copy(), lb.copy(), ub.copy(),
+                                   lbA.copy(), ubA.copy(), None if xdot_full is None else xdot_full.copy())
+
+    def get_index(self, tick=-1):
+        """
+        :param tick: negative numbers count from the newest entry, others from the oldest one
+        :type tick: int
+        :return: index of tick in entries
+        :rtype: int
+        """
+        if tick >= self.number_of_entries or tick < -self.number_of_entries:
+            raise IndexError(u'tick {} is not in the buffer, it has {} entries'.format(tick,
+                                                                                      self.number_of_entries))
+        if tick < 0:
+            return (self.last + 1 + tick) % self.size
+        return (self.last + 1 - self.number_of_entries + tick) % self.size
+
+    def get(self, tick=-1):
+        """
+        :return: b_names, bA_names, H, g, A, lb, ub, lbA, ubA, xdot_full of tick, xdot_full is None if the solver
+                 failed. They are no copies.
+        :rtype: tuple
+        """
+        return self.entries[self.get_index(tick)]
+
+    def get_data_frames(self, tick=-1):
+        """
+        :return: see make_data_frames
+        :rtype: OrderedDict
+        """
+        return make_data_frames(*self.get(tick))
+
+    def get_filtered(self, tick=-1):
+        """
+        :return: H, g, A, lb, ub, lbA, ubA in the order of the arguments of QPSolver.solve, they are copies
+        :rtype: tuple
+        """
+        return tuple(x.copy() for x in self.get(tick)[2:-1])
+
+    def replay(self, qp_solver, tick=-1, nWSR=None):
+        """
+        Solves the problem of tick again.
+        :type qp_solver: giskardpy.qp_solver.QPSolver
+        :return: solution of the problem
+        :rtype: np.ndarray
+        """
+        return qp_solver.solve(*self.get_filtered(tick), nWSR=nWSR)
@@ -1,4 +1,7 @@
+import hashlib
+import os
 from collections import OrderedDict
+from itertools import chain
 from time import time
 
 import numpy as np
@@ -7,17 +10,20 @@ from giskardpy import logging, casadi_wrapper as w
 from giskardpy.data_types import SoftConstraint
 from giskardpy.exceptions import QPSolverException, InfeasibleException, OutOfJointLimitsException, \
     HardConstraintsViolatedException
-from giskardpy.qp_solver import QPSolver
-from giskardpy.utils import make_filter_masks, create_path
+from giskardpy.qp_diagnostics import QPDiagnostics, make_data_frames
+from giskardpy.qp_solver import create_qp_solver
+from giskardpy.utils import make_filter_bA_mask, create_path
 
 
 class QProblemBuilder(object):
     """
-    Wraps around QPOases. Builds the required matrices from constraints.
+    Wraps around the qp solver. Builds the required matrices from constraints.
     """
+    big_ass_M_blocks = [u'H', u'A', u'lb', u'ub', u'lbA', u'ubA', u'g']
 
     def __init__(self, joint_constraints_dict, hard_constraints_dict, soft_constraints_dict, controlled_joint_symbols,
-                 path_to_functions=''):
+                 path_to_functions=u'', function_cache_size=None, compiler=None, jacobian_cache=None, qp_solver=None,
+                 history_size=0):
         """
         :type joint_constraints_dict: dict
         :type hard_constraints_dict: dict
@@ -25,17 +31,38 @@ class QProblemBuilder(object):
         :type controlled_joint_symbols: list
         :param path_to_functions: location where the compiled functions can be safed.
         :type path_to_functions: str
+        :param function_cache_size: max size of the folder containing path_to_functions in bytes,
+                                    least recently used functions get deleted first. None means no limit.
+        :type function_cache_size: int
+        :param compiler: c compiler used to turn big_ass_M into a shared library, None uses the casadi virtual machine.
+        :type compiler: str
+        :param jacobian_cache: maps constraint names and the hashes of their expressions to their rows in A, only rows
+                               of new or changed constraints get computed and added to it.
+                               Has to be cleared when the controlled joints change.
+        :type jacobian_cache: dict
+        :param qp_solver: reused across goals to hot start the first solve of a new goal, a new one is created if None
+        :type qp_solver: giskardpy.qp_solver.QPSolver
+        :param history_size: number of solves that are kept in diagnostics, 0 disables the history
+        :type history_size: int
         """
         assert (not len(controlled_joint_symbols) > len(joint_constraints_dict))
         assert (not len(controlled_joint_symbols) < len(joint_constraints_dict))
         assert (len(hard_constraints_dict) <= len(controlled_joint_symbols))
         self.path_to_functions = path_to_functions
+        self.function_cache_size = function_cache_size
+        self.compiler = compiler
+        self.jacobian_cache = jacobian_cache if jacobian_cache is not None else {}
         self.joint_constraints_dict = joint_constraints_dict
         self.hard_constraints_dict = hard_constraints_dict
         self.soft_constraints_dict = soft_constraints_dict
         self.controlled_joints = controlled_joint_symbols
-        self.construct_big_ass_M()
-        self.compile_big_ass_M()
+        self.h = len(self.hard_constraints_dict)
+        self.s = len(self.soft_constraints_dict)
+        self.j = len(self.joint_constraints_dict)
+        if not self.load_big_ass_M():
+            self.construct_big_ass_M()
+            self.compile_big_ass_M()
+            self.safe_big_ass_M()
 
         self.shape1 = len(self.hard_constraints_dict) + len(self.soft_constraints_dict)
         self.shape2 = len(self.joint_constraints_dict) + len(self.soft_constraints_dict)
@@ -44,9 +71,72 @@ class QProblemBuilder(object):
         self.num_joint_constraints = len(self.joint_constraints_dict)
         self.num_soft_constraints = len(self.soft_constraints_dict)
 
-        self.qp_solver = QPSolver()
+        self.qp_solver = qp_solver if qp_solver is not None else create_qp_solver(u'qpoases')
+        self.b_names = self.get_b_names()
+        self.bA_names = self.get_bA_names()
+        self.b_mask = None
+        self.bA_mask = None
+        self.b_mask_buffer = np.zeros(self.shape2, dtype=bool)
+        # commands of the last get_cmd, overwritten by the next one
+        self.joint_velocities = np.zeros(self.j)
+        # filtered matrices of the last solves
+        self.diagnostics = QPDiagnostics(history_size)
         self.lbAs = None  # for debugging purposes
 
+    def get_constraint_keys(self):
+        """
+        :return: names of all constraints in the order in which they appear in big_ass_M
+        :rtype: list
+        """
+        return [str(x) for x in chain(self.joint_constraints_dict.keys(),
+                                      self.hard_constraints_dict.keys(),
+                                      self.soft_constraints_dict.keys())]
+
+    def get_b_names(self):
+        """
+        :return: names of the entries in lb, ub and g
+        :rtype: np.ndarray
+        """
+        return np.array([u'j -- ' + str(k) for k in self.joint_constraints_dict.keys()] +
+                        [u's -- ' + str(k) for k in self.soft_constraints_dict.keys()])
+
+    def get_bA_names(self):
+        """
+        :return: names of the entries in lbA and ubA
+        :rtype: np.ndarray
+        """
+        return np.array([u'h -- ' + str(k) for k in self.hard_constraints_dict.keys()] +
+                        [u's -- ' + str(k) for k in self.soft_constraints_dict.keys()])
+
+    def load_big_ass_M(self):
+        """
+        Loads the compiled big_ass_M from path_to_functions, if it was compiled for the same constraints before.
+        :rtype: bool
+        """
+        if not self.path_to_functions:
+            return False
+        t = time()
+        cached = w.load_compiled_function(self.path_to_functions)
+        if cached is None:
+            return False
+        constraint_keys, compiled_big_ass_M = cached
+        if not isinstance(compiled_big_ass_M, w.CompiledSparseFunction) or compiled_big_ass_M.out[0].ndim != 1:
+            logging.loginfo(u'cached controller has an outdated format, recompiling')
+            return False
+        if constraint_keys != self.get_constraint_keys():
+            # same hash but different order, happens because the constraint dicts are not ordered
+            logging.loginfo(u'cached controller has a different constraint order, recompiling')
+            return False
+        self.compiled_big_ass_M = compiled_big_ass_M
+        logging.loginfo(u'loaded compiled controller with {} soft constraints in {:.5f}s'.format(self.s, time() - t))
+        return True
+
+    def safe_big_ass_M(self):
+        if self.path_to_functions:
+            w.safe_compiled_function((self.get_constraint_keys(), self.compiled_big_ass_M), self.path_to_functions)
+            if self.function_cache_size is not None:
+                w.limit_function_cache_size(os.path.dirname(self.path_to_functions), self.function_cache_size)
+
     def get_expr(self):
         return self.compiled_big_ass_M.str_params
 
@@ -60,7 +150,9 @@ class QProblemBuilder(object):
         ubA = []
         linear_weight = []
         soft_expressions = []
+        soft_names = []
         hard_expressions = []
+        hard_names = []
         for constraint_name, constraint in self.joint_constraints_dict.items():
             weights.append(constraint.weight)
             lb.append(constraint.lower)
@@ -70,6 +162,7 @@ class QProblemBuilder(object):
             lbA.append(constraint.lower)
             ubA.append(constraint.upper)
             hard_expressions.append(constraint.expression)
+            hard_names.append(u'h -- ' + str(constraint_name))
         for constraint_name, constraint in self.soft_constraints_dict.items(): # type: (str, SoftConstraint)
             weights.append(constraint.weight)
             lbA.append(constraint.lbA)
@@ -79,33 +172,39 @@ class QProblemBuilder(object):
             linear_weight.append(constraint.linear_weight)
             assert not w.is_matrix(constraint.expression), u'Matrices are not allowed as soft constraint expression'
             soft_expressions.append(constraint.expression)
+            soft_names.append(str(constraint_name))
 
         self.np_g = np.zeros(len(weights))
 
         logging.loginfo(u'constructing new controller with {} soft constraints...'.format(len(soft_expressions)))
-        self.h = len(self.hard_constraints_dict)
-        self.s = len(self.soft_constraints_dict)
-        self.j = len(self.joint_constraints_dict)
 
         self.init_big_ass_M()
 
-        self.set_weights(weights)
+        self.set_weights(self.vector(weights))
+
+        self.construct_A_hard(hard_names, hard_expressions)
+        self.construct_A_soft(soft_names, soft_expressions)
 
-        self.construct_A_hard(hard_expressions)
-        self.construct_A_soft(soft_expressions)
+        self.set_lbA(self.vector(lbA))
+        self.set_ubA(self.vector(ubA))
+        self.set_lb(self.vector(lb))
+        self.set_ub(self.vector(ub))
+        self.set_linear_weights(self.vector(linear_weight))
 
-        self.set_lbA(w.Matrix(lbA))
-        self.set_ubA(w.Matrix(ubA))
-        self.set_lb(w.Matrix(lb))
-        self.set_ub(w.Matrix(ub))
-        self.set_linear_weights(w.Matrix(linear_weight))
+    def vector(self, data):
+        if len(data) == 0:
+            return w.sparse_zeros(0, 1)
+        return w.Matrix(data)
 
     @profile
     def compile_big_ass_M(self):
         t = time()
-        self.free_symbols = w.free_symbols(self.big_ass_M)
-        self.compiled_big_ass_M = w.speed_up(self.big_ass_M,
-                                             self.free_symbols)
+        big_ass_M = [self.big_ass_M[x] for x in self.big_ass_M_blocks]
+        self.free_symbols = w.free_symbols(w.veccat(*big_ass_M))
+        self.compiled_big_ass_M = w.speed_up_sparse(big_ass_M,
+                                                    self.free_symbols,
+                                                    backend=self.compiler,
+                                                    file_name=self.path_to_functions if self.path_to_functions else None)
         logging.loginfo(u'compiled symbolic expressions in {:.5f}s'.format(time() - t))
 
     def init_big_ass_M(self):
@@ -118,101 +217,83 @@ class QProblemBuilder(object):
         #    |--------------------------------------|
         # j+s| H                  | lb    | ub  | g |
         #    | -------------------------------------|
+        The blocks are stored and compiled separately to preserve their sparsity,
+        only their structural nonzeros get evaluated in each iteration.
+        H is diagonal and therefore only stored as vector of weights.
+        """
+        self.big_ass_M = {
+            u'H': w.sparse_zeros(self.j + self.s, 1),
+            u'A': w.sparse_zeros(self.h + self.s, self.j + self.s),
+            u'lb': w.sparse_zeros(self.j + self.s, 1),
+            u'ub': w.sparse_zeros(self.j + self.s, 1),
+            u'lbA': w.sparse_zeros(self.h + self.s, 1),
+            u'ubA': w.sparse_zeros(self.h + self.s, 1),
+            u'g': w.sparse_zeros(self.j + self.s, 1),
+        }
+
+    def jacobian(self, constraint_names, expressions):
+        """
+        Computes the jacobian of expressions with respect to the controlled joints.
+        Rows of constraints that are already in jacobian_cache with the same expression are reused.
+        :type constraint_names: list
+        :type expressions: list
+        :rtype: Matrix
         """
-        self.big_ass_M = w.zeros(self.h + self.s * 2 + self.j,
-                                 self.j + self.s + 3)
+        keys = [self.get_jacobian_cache_key(name, expression)
+                for name, expression in zip(constraint_names, expressions)]
+        missing = [i for i, key in enumerate(keys) if key not in self.jacobian_cache]
+        if missing:
+            J = w.jacobian(w.Matrix([expressions[i] for i in missing]), self.controlled_joints)
+            for row, i in enumerate(missing):
+                self.jacobian_cache[keys[i]] = J[row, :]
+        return w.vstack([self.jacobian_cache[key] for key in keys])
+
+    def get_jacobian_cache_key(self, constraint_name, expression):
+        """
+        :return: key of the row of a constraint in jacobian_cache, it changes when its expression changes
+        :rtype: tuple
+        """
+        return constraint_name, hashlib.md5(str(expression).encode(u'utf-8')).hexdigest()
 
-    def construct_A_hard(self, hard_expressions):
-        A_hard = w.Matrix(hard_expressions)
-        A_hard = w.jacobian(A_hard, self.controlled_joints)
-        self.set_A_hard(A_hard)
+    def construct_A_hard(self, hard_names, hard_expressions):
+        if self.h == 0:
+            return
+        self.set_A_hard(self.jacobian(hard_names, hard_expressions))
 
     def set_A_hard(self, A_hard):
-        self.big_ass_M[:self.h, :self.j] = A_hard
+        self.big_ass_M[u'A'][:self.h, :self.j] = A_hard
 
-    def construct_A_soft(self, soft_expressions):
-        A_soft = w.zeros(self.s, self.j + self.s)
+    def construct_A_soft(self, soft_names, soft_expressions):
+        if self.s == 0:
+            return
         t = time()
-        A_soft[:, :self.j] = w.jacobian(w.Matrix(soft_expressions), self.controlled_joints)
-        logging.loginfo(u'computed Jacobian in {:.5f}s'.format(time() - t))
-        A_soft[:, self.j:] = w.eye(self.s)
-        self.set_A_soft(A_soft)
+        cached = len([name for name, expression in zip(soft_names, soft_expressions)
+                      if self.get_jacobian_cache_key(name, expression) in self.jacobian_cache])
+        jacobian = self.jacobian(soft_names, soft_expressions)
+        logging.loginfo(u'computed Jacobian in {:.5f}s, reused {} of {} rows'.format(time() - t, cached, self.s))
+        self.set_A_soft(jacobian)
 
     def set_A_soft(self, A_soft):
-        self.big_ass_M[self.h:self.h + self.s, :self.j + self.s] = A_soft
+        self.big_ass_M[u'A'][self.h:, :self.j] = A_soft
+        self.big_ass_M[u'A'][self.h:, self.j:] = w.eye(self.s)
 
     def set_lbA(self, lbA):
-        self.big_ass_M[:self.h + self.s, self.j + self.s] = lbA
+        self.big_ass_M[u'lbA'] = lbA
 
     def set_ubA(self, ubA):
-        self.big_ass_M[:self.h + self.s, self.j + self.s + 1] = ubA
+        self.big_ass_M[u'ubA'] = ubA
 
     def set_lb(self, lb):
-        self.big_ass_M[self.h + self.s:, self.j + self.s] = lb
+        self.big_ass_M[u'lb'] = lb
 
     def set_ub(self, ub):
-        self.big_ass_M[self.h + self.s:, self.j + self.s + 1] = ub
+        self.big_ass_M[u'ub'] = ub
 
     def set_linear_weights(self, linear_weights):
-        self.big_ass_M[self.h + self.s:, self.j + self.s + 2] = linear_weights
+        self.big_ass_M[u'g'] = linear_weights
 
     def set_weights(self, weights):
-        self.big_ass_M[self.h + self.s:, :-3] = w.diag(*weights)
-
-    def debug_print(self, unfiltered_H, A, lb, ub, lbA, ubA, g, xdot_full=None, actually_print=False):
-        import pandas as pd
-        bA_mask, b_mask = make_filter_masks(unfiltered_H, self.num_joint_constraints, self.num_hard_constraints)
-        b_names = []
-        bA_names = []
-        for iJ, k in enumerate(self.joint_constraints_dict.keys()):
-            key = 'j -- ' + str(k)
-            b_names.append(key)
-
-        for iH, k in enumerate(self.hard_constraints_dict.keys()):
-            key = 'h -- ' + str(k)
-            bA_names.append(key)
-
-
-        for iS, k in enumerate(self.soft_constraints_dict.keys()):
-            key = 's -- ' + str(k)
-            bA_names.append(key)
-            b_names.append(key)
-
-        b_names = np.array(b_names)
-        filtered_b_names = b_names[b_mask]
-        filtered_bA_names = np.array(bA_names)[bA_mask]
-        filtered_H = unfiltered_H[b_mask][:,b_mask]
-
-        p_lb = pd.DataFrame(lb, filtered_b_names, [u'data'], dtype=float).sort_index()
-        p_ub = pd.DataFrame(ub, filtered_b_names, [u'data'], dtype=float).sort_index()
-        p_g = pd.DataFrame(g, filtered_b_names, [u'data'], dtype=float).sort_index()
-        p_lbA = pd.DataFrame(lbA, filtered_bA_names, [u'data'], dtype=float).sort_index()
-        p_ubA = pd.DataFrame(ubA, filtered_bA_names, [u'data'], dtype=float).sort_index()
-        p_weights = pd.DataFrame(unfiltered_H.dot(np.ones(unfiltered_H.shape[0])), b_names, [u'data'], dtype=float).sort_index()
-        if xdot_full is not None:
-            p_xdot = pd.DataFrame(xdot_full, filtered_b_names, [u'data'], dtype=float).sort_index()
-            Ax = np.dot(A, xdot_full)
-            p_Ax = pd.DataFrame(Ax, filtered_bA_names, [u'data'], dtype=float).sort_index()
-            xH = np.dot((xdot_full**2).T, filtered_H)
-            p_xH = pd.DataFrame(xH, filtered_b_names, [u'data'], dtype=float).sort_index()
-            p_xg = p_g * p_xdot
-            xHx = np.dot(np.dot(xdot_full.T, filtered_H), xdot_full)
-            x_soft = xdot_full[len(xdot_full) - len(lbA):]
-            p_lbA_minus_x = pd.DataFrame(lbA - x_soft, filtered_bA_names, [u'data'], dtype=float).sort_index()
-            p_ubA_minus_x = pd.DataFrame(ubA - x_soft, filtered_bA_names, [u'data'], dtype=float).sort_index()
-        else:
-            p_xdot = None
-
-        p_A = pd.DataFrame(A, filtered_bA_names, filtered_b_names, dtype=float).sort_index(1).sort_index(0)
-        # if self.lbAs is None:
-        #     self.lbAs = p_lbA
-        # else:
-        #     self.lbAs = self.lbAs.T.append(p_lbA.T, ignore_index=True).T
-        # self.lbAs.T[[c for c in self.lbAs.T.columns if 'dist' in c]].plot()
-
-        # self.save_all(p_weights, p_A, p_lbA, p_ubA, p_lb, p_ub, p_xdot)
-        return p_weights, p_A, p_lbA, p_ubA, p_lb, p_ub
-
+        self.big_ass_M[u'H'] = weights
 
     def are_joint_limits_violated(self, p_lb, p_ub):
         violations = (p_ub - p_lb)[p_lb.data > p_ub.data]
@@ -248,15 +329,50 @@ class QProblemBuilder(object):
                 print(array)
 
     def filter_zero_weight_constraints(self, H, A, lb, ub, lbA, ubA, g):
-        bA_mask, b_mask = make_filter_masks(H, self.num_joint_constraints, self.num_hard_constraints)
-        A = A[bA_mask][:, b_mask].copy()
-        lbA = lbA[bA_mask]
-        ubA = ubA[bA_mask]
-        lb = lb[b_mask]
-        ub = ub[b_mask]
-        g = g[b_mask]
-        H = H[b_mask][:, b_mask]
-        return H, A, lb, ub, lbA, ubA, g
+        """
+        Removes variables with zero weight and their constraints.
+        The results are written into buffers that are reused in the next call, they are only reallocated when the
+        set of variables with zero weight changes.
+        :rtype: tuple
+        """
+        np.not_equal(H, 0, out=self.b_mask_buffer)
+        if self.b_mask is None or not np.array_equal(self.b_mask_buffer, self.b_mask):
+            self.update_filter(self.b_mask_buffer)
+        H_filtered, A_filtered, lb_filtered, ub_filtered, lbA_filtered, ubA_filtered, g_filtered = self.filtered
+        # the indices are always valid, with mode raise np.take would write into a temporary copy of out
+        np.take(H, self.b_index, out=H_filtered, mode=u'clip')
+        np.take(A, self.A_index, out=A_filtered, mode=u'clip')
+        np.take(lb, self.b_index, out=lb_filtered, mode=u'clip')
+        np.take(ub, self.b_index, out=ub_filtered, mode=u'clip')
+        np.take(lbA, self.bA_index, out=lbA_filtered, mode=u'clip')
+        np.take(ubA, self.bA_index, out=ubA_filtered, mode=u'clip')
+        np.take(g, self.b_index, out=g_filtered, mode=u'clip')
+        return self.filtered
+
+    def update_filter(self, b_mask):
+        """
+        Computes the indices of the entries that survive the filter and allocates the buffers for them.
+        The name arrays are replaced as well, which allows the solver to detect changes by identity.
+        """
+        self.b_mask = b_mask.copy()
+        self.bA_mask = make_filter_bA_mask(self.b_mask, self.num_joint_constraints, self.num_hard_constraints)
+        self.b_index = np.nonzero(self.b_mask)[0]
+        # joints come first, their indices are smaller than the number of joints
+        self.joint_b_index = self.b_index[:np.searchsorted(self.b_index, self.j)]
+        self.bA_index = np.nonzero(self.bA_mask)[0]
+        # indices into the flattened A
+        self.A_index = self.bA_index[:, None] * self.shape2 + self.b_index
+        self.filtered_b_names = self.b_names[self.b_mask]
+        self.filtered_bA_names = self.bA_names[self.bA_mask]
+        number_of_b = len(self.b_index)
+        number_of_bA = len(self.bA_index)
+        self.filtered = (np.zeros(number_of_b),
+                         np.zeros((number_of_bA, number_of_b)),
+                         np.zeros(number_of_b),
+                         np.zeros(number_of_b),
+                         np.zeros(number_of_bA),
+                         np.zeros(number_of_bA),
+                         np.zeros(number_of_b))
 
     @profile
     def get_cmd(self, substitutions, nWSR=None):
@@ -264,46 +380,38 @@ class QProblemBuilder(object):
         Uses substitutions for each symbol to compute the next commands for each joint.
         :param substitutions:
         :type substitutions: list
-        :return: joint name -> joint command
-        :rtype: dict
+        :return: joint name -> joint command, H, A, lb, ub, lbA, ubA, xdot_full. The matrices are copies, because
+                 compiled_big_ass_M reuses its output arrays.
+        :rtype: tuple
         """
-        np_big_ass_M = self.compiled_big_ass_M.call2(substitutions)
-        np_H = np_big_ass_M[self.shape1:, :-3].copy()
-        np_A = np_big_ass_M[:self.shape1, :self.shape2].copy()
-        np_lb = np_big_ass_M[self.shape1:, -3].copy()
-        np_ub = np_big_ass_M[self.shape1:, -2].copy()
-        np_g = np_big_ass_M[self.shape1:, -1].copy()
-        np_lbA = np_big_ass_M[:self.shape1, -3].copy()
-        np_ubA = np_big_ass_M[:self.shape1, -2].copy()
+        # the arrays are reused by compiled_big_ass_M and get overwritten in the next iteration
+        np_H, np_A, np_lb, np_ub, np_lbA, np_ubA, np_g = self.compiled_big_ass_M.call2(substitutions)
         H, A, lb, ub, lbA, ubA, g = self.filter_zero_weight_constraints(np_H, np_A, np_lb, np_ub, np_lbA, np_ubA, np_g)
-        # self.debug_print(np_H, A, lb, ub, lbA, ubA)
         try:
-            xdot_full = self.qp_solver.solve(H, g, A, lb, ub, lbA, ubA, nWSR)
+            xdot_full = self.qp_solver.solve(H, g, A, lb, ub, lbA, ubA, nWSR,
+                                             self.filtered_b_names, self.filtered_bA_names)
         except QPSolverException as e:
-            p_weights, p_A, p_lbA, p_ubA, p_lb, p_ub = self.debug_print(np_H, A, lb, ub, lbA, ubA, g, actually_print=True)
+            self.diagnostics.append(self.filtered_b_names, self.filtered_bA_names, H, g, A, lb, ub, lbA, ubA)
+            data_frames = make_data_frames(self.filtered_b_names, self.filtered_bA_names, H, g, A, lb, ub, lbA, ubA)
             if isinstance(e, InfeasibleException):
-                if self.are_joint_limits_violated(p_lb, p_ub):
+                if self.are_joint_limits_violated(data_frames[u'lb'], data_frames[u'ub']):
                     raise OutOfJointLimitsException(e)
                 raise HardConstraintsViolatedException(e)
             if isinstance(e, QPSolverException):
-                arrays = [(p_weights, u'H'),
-                          (p_A, u'A'),
-                          (p_lbA, u'lbA'),
-                          (p_ubA, u'ubA'),
-                          (p_lb, u'lb'),
-                          (p_ub, u'ub')]
                 any_nan = False
-                for a, name in arrays:
-                    any_nan |= self.is_nan_in_array(name, a)
+                for name in [u'H', u'A', u'lbA', u'ubA', u'lb', u'ub']:
+                    any_nan |= self.is_nan_in_array(name, data_frames[name])
                 if any_nan:
                     raise e
             raise e
         if xdot_full is None:
             return None
-        # TODO enable debug print in an elegant way, preferably without slowing anything down
-        self.debug_print(np_H, A, lb, ub, lbA, ubA, g, xdot_full)
-        return OrderedDict((observable, xdot_full[i]) for i, observable in enumerate(self.controlled_joints)), \
-               np_H, np_A, np_lb, np_ub, np_lbA, np_ubA, xdot_full
+        self.diagnostics.append(self.filtered_b_names, self.filtered_bA_names, H, g, A, lb, ub, lbA, ubA, xdot_full)
+        # filtered joints don't move
+        self.joint_velocities.fill(0)
+        self.joint_velocities[self.joint_b_index] = xdot_full[:len(self.joint_b_index)]
+        return OrderedDict((observable, self.joint_velocities[i]) for i, observable in enumerate(self.controlled_joints)), \
+               np_H.copy(), np_A.copy(), np_lb.copy(), np_ub.copy(), np_lbA.copy(), np_ubA.copy(), xdot_full
 
 def print_pd_dfs(dfs, names):
     import pandas as pd
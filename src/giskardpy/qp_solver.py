@@ -1,41 +1,88 @@
-import numpy as np
+from abc import ABCMeta, abstractmethod
 
-import qpoases
-from qpoases import PyReturnValue
+import numpy as np
 
 from giskardpy.exceptions import MAX_NWSR_REACHEDException, QPSolverException, InfeasibleException
-from giskardpy import logging
 
 
-class QPSolver(object):
-    RETURN_VALUE_DICT = {value: name for name, value in vars(PyReturnValue).items()}
+def assign_slots(slots, names):
+    """
+    Assigns names to slots, names that already have a slot keep it and new names get the slots of names that are gone.
+    :param slots: name or None for each slot
+    :type slots: list
+    :param names: has to be smaller or equal to the number of slots
+    :type names: np.ndarray
+    :return: the new slots, slot index of each name
+    :rtype: tuple
+    """
+    name_to_slot = {name: i for i, name in enumerate(slots) if name is not None}
+    new_slots = [None] * len(slots)
+    index = np.empty(len(names), dtype=int)
+    new_names = []
+    for i, name in enumerate(names):
+        slot = name_to_slot.get(name)
+        if slot is None:
+            new_names.append(i)
+        else:
+            new_slots[slot] = name
+            index[i] = slot
+    free_slots = (i for i, name in enumerate(new_slots) if name is None)
+    for i in new_names:
+        slot = next(free_slots)
+        new_slots[slot] = names[i]
+        index[i] = slot
+    return new_slots, index
+
+
+# abc.ABC doesn't exist in python 2 and the metaclass syntax differs, the class name has to be a native str
+ABC = ABCMeta('ABC', (object,), {})
+
+
+class QPSolver(ABC):
+    """
+    Base class of the qp solver backends.
+    Backends implement init and _solve and map their return values onto the QPSolverException hierarchy.
+    """
+    # unused slots are filled with variables that are zero and constraints that are never active
+    padding_bound = 1
+    padding_constraint_bound = 1e9
+    # return values of the backend that are turned into the corresponding exceptions by raise_exception
+    infeasible_return_values = ()
+    max_iterations_return_values = ()
 
     def __init__(self):
-        """
-        :param dim_a: number of joint constraints + number of soft constraints
-        :type int
-        :param dim_b: number of hard constraints + number of soft constraints
-        :type int
-        """
         self.started = False
         self.shape = (0,0)
+        self.b_names = None
+        self.bA_names = None
+        self.b_slots = []
+        self.bA_slots = []
+        self.H_matrix = np.zeros((0, 0))
+        # number of working set recalculations or iterations the backend needed in the last solve
+        self.iterations = None
 
+    @abstractmethod
     def init(self, dim_a, dim_b):
-        self.qpProblem = qpoases.PySQProblem(dim_a, dim_b)
-        options = qpoases.PyOptions()
-        options.setToMPC()
-        options.printLevel = qpoases.PyPrintLevel.NONE
-        self.qpProblem.setOptions(options)
-        self.xdot_full = np.zeros(dim_a)
-
-        self.started = False
+        """
+        Creates a new problem, the next solve will be a cold start.
+        :param dim_a: number of joint constraints + number of soft constraints
+        :type dim_a: int
+        :param dim_b: number of hard constraints + number of soft constraints
+        :type dim_b: int
+        """
 
-    def solve(self, H, g, A, lb, ub, lbA, ubA, nWSR=None):
+    def solve(self, H, g, A, lb, ub, lbA, ubA, nWSR=None, b_names=None, bA_names=None):
         """
+        If names are given, the problem is reordered such that entries keep the position they had in the last
+        problem, even if other constraints were added or removed. Positions of removed constraints are reused by new
+        ones or padded, as long as the new problem fits into the old one. This keeps the dimensions of the problem
+        constant, such that the first solve of a new goal and solves after constraints were filtered can hot start
+        with the active set of the previous solve.
         x^T*H*x + x^T*g
         s.t.: lbA < A*x < ubA
         and    lb <  x  < ub
-        :param H: 2d diagonal weight matrix, shape = (jc (joint constraints) + sc (soft constraints)) * (jc + sc)
+        :param H: 1d vector with the diagonal of the weight matrix, len = jc (joint constraints) + sc (soft constraints)
+                  or the 2d weight matrix, shape = (jc + sc) * (jc + sc)
         :type np.array
         :param g: 1d zero vector of len joint constraints + soft constraints
         :type np.array
@@ -51,76 +98,117 @@ class QPSolver(object):
         :type np.array
         :param nWSR:
         :type np.array
+        :param b_names: names of the entries of lb, ub and g, the same object has to be used while they don't change
+        :type b_names: np.ndarray
+        :param bA_names: names of the entries of lbA and ubA, the same object has to be used while they don't change
+        :type bA_names: np.ndarray
         :return: x according to the equations above, len = joint constraints + soft constraints
         :type np.array
         """
-        if A.shape != self.shape:
-            self.started = False
-            self.shape = A.shape
-
-        number_of_retries = 2
-        while number_of_retries > 0:
-            if nWSR is None:
-                nWSR = np.array([sum(A.shape) * 2])
-            else:
-                nWSR = np.array([nWSR])
-            number_of_retries -= 1
-            if not self.started:
-                self.init(A.shape[1], A.shape[0])
-                success = self.qpProblem.init(H, g, A, lb, ub, lbA, ubA, nWSR)
-                if success == PyReturnValue.MAX_NWSR_REACHED:
-                    self.started = False
-                    raise MAX_NWSR_REACHEDException(u'Failed to initialize QP-problem.')
-            else:
-                success = self.qpProblem.hotstart(H, g, A, lb, ub, lbA, ubA, nWSR)
-                if success == PyReturnValue.MAX_NWSR_REACHED:
-                    self.started = False
-                    raise MAX_NWSR_REACHEDException(u'Failed to hot start QP-problem.')
-            if success == PyReturnValue.SUCCESSFUL_RETURN:
-                self.started = True
-                break
-            elif success == PyReturnValue.NAN_IN_LB:
-                # TODO nans get replaced with 0 document this somewhere
-                # TODO might still be buggy when nan occur when the qp problem is already initialized
-                lb[np.isnan(lb)] = 0
-                nWSR = None
-                self.started = False
-                number_of_retries += 1
-                continue
-            elif success == PyReturnValue.NAN_IN_UB:
-                ub[np.isnan(ub)] = 0
-                nWSR = None
-                self.started = False
-                number_of_retries += 1
-                continue
-            elif success == PyReturnValue.NAN_IN_LBA:
-                lbA[np.isnan(lbA)] = 0
-                nWSR = None
-                self.started = False
-                number_of_retries += 1
-                continue
-            elif success == PyReturnValue.NAN_IN_UBA:
-                ubA[np.isnan(ubA)] = 0
-                nWSR = None
-                self.started = False
-                number_of_retries += 1
-                continue
-            else:
-                logging.loginfo(u'{}; retrying with A rounded to 5 decimal places'.format(self.RETURN_VALUE_DICT[success]))
-                r = 5
-                A = np.round(A, r)
-                nWSR = None
-                self.started = False
-        else:  # if not break
-            self.started = False
-            message = u''.format(self.RETURN_VALUE_DICT[success])
-            if success in [PyReturnValue.INIT_FAILED_INFEASIBILITY,
-                           PyReturnValue.QP_INFEASIBLE,
-                           PyReturnValue.HOTSTART_STOPPED_INFEASIBILITY,
-                           PyReturnValue.ADDBOUND_FAILED_INFEASIBILITY,
-                           PyReturnValue.ADDCONSTRAINT_FAILED_INFEASIBILITY]:
-                raise InfeasibleException(message)
-            raise QPSolverException(message)
-
-        self.qpProblem.getPrimalSolution(self.xdot_full)
-        return self.xdot_full
+        if b_names is None or bA_names is None:
+            return self._solve(H, g, A, lb, ub, lbA, ubA, nWSR)
+        if b_names is not self.b_names or bA_names is not self.bA_names:
+            self.update_slots(b_names, bA_names)
+        if self.identity_slots:
+            return self._solve(H, g, A, lb, ub, lbA, ubA, nWSR)
+        b_index = self.b_index
+        bA_index = self.bA_index
+        g_slots, A_slots, lb_slots, ub_slots, lbA_slots, ubA_slots = self.padded_problem
+        if H.ndim == 1:
+            H_slots = self.padded_weights
+            H_slots[b_index] = H
+        else:
+            if self.padded_H is None:
+                self.padded_H = np.eye(len(self.b_slots))
+            H_slots = self.padded_H
+            H_slots[b_index[:, None], b_index] = H
+        g_slots[b_index] = g
+        A_slots[bA_index[:, None], b_index] = A
+        lb_slots[b_index] = lb
+        ub_slots[b_index] = ub
+        lbA_slots[bA_index] = lbA
+        ubA_slots[bA_index] = ubA
+        xdot_full = self._solve(H_slots, g_slots, A_slots, lb_slots, ub_slots, lbA_slots, ubA_slots, nWSR)
+        return xdot_full[b_index]
+
+    def update_slots(self, b_names, bA_names):
+        """
+        Maps the new names onto the positions of the last problem, if they fit into it and don't need less than half
+        of it. Otherwise the problem is resized to fit the names exactly.
+        """
+        self.b_names = b_names
+        self.bA_names = bA_names
+        if len(b_names) > len(self.b_slots) or len(bA_names) > len(self.bA_slots) or \
+                len(b_names) * 2 < len(self.b_slots) or len(bA_names) * 2 < len(self.bA_slots):
+            self.b_slots = list(b_names)
+            self.bA_slots = list(bA_names)
+            self.b_index = np.arange(len(b_names))
+            self.bA_index = np.arange(len(bA_names))
+        else:
+            self.b_slots, self.b_index = assign_slots(self.b_slots, b_names)
+            self.bA_slots, self.bA_index = assign_slots(self.bA_slots, bA_names)
+        self.identity_slots = len(b_names) == len(self.b_slots) and len(bA_names) == len(self.bA_slots) and \
+                              (self.b_index == np.arange(len(b_names))).all() and \
+                              (self.bA_index == np.arange(len(bA_names))).all()
+        if not self.identity_slots:
+            number_of_b = len(self.b_slots)
+            number_of_bA = len(self.bA_slots)
+            self.padded_weights = np.ones(number_of_b)
+            self.padded_H = None
+            self.padded_problem = (np.zeros(number_of_b),
+                                   np.zeros((number_of_bA, number_of_b)),
+                                   np.ones(number_of_b) * -self.padding_bound,
+                                   np.ones(number_of_b) * self.padding_bound,
+                                   np.ones(number_of_bA) * -self.padding_constraint_bound,
+                                   np.ones(number_of_bA) * self.padding_constraint_bound)
+
+    @abstractmethod
+    def _solve(self, H, g, A, lb, ub, lbA, ubA, nWSR=None):
+        """
+        Solves the problem, starting from the last solution if the shape of A did not change.
+        Same parameters as solve. Implementations also update iterations.
+        :raises: QPSolverException
+        :rtype: np.ndarray
+        """
+
+    def diagonal_to_matrix(self, weights):
+        """
+        Writes the weights into the diagonal of a matrix, which is only allocated when the size changes.
+        :type weights: np.ndarray
+        :rtype: np.ndarray
+        """
+        number_of_weights = len(weights)
+        if self.H_matrix.shape[0] != number_of_weights:
+            self.H_matrix = np.zeros((number_of_weights, number_of_weights))
+        self.H_matrix.flat[::number_of_weights + 1] = weights
+        return self.H_matrix
+
+    def return_value_to_str(self, return_value):
+        return str(return_value)
+
+    def raise_exception(self, return_value):
+        """
+        Raises the exception that matches the return value of the backend.
+        """
+        self.started = False
+        message = self.return_value_to_str(return_value)
+        if return_value in self.infeasible_return_values:
+            raise InfeasibleException(message)
+        if return_value in self.max_iterations_return_values:
+            raise MAX_NWSR_REACHEDException(message)
+        raise QPSolverException(message)
+
+
+def create_qp_solver(name):
+    """
+    :param name: qpoases or osqp
+    :type name: str
+    :rtype: QPSolver
+    """
+    if name == u'qpoases':
+        from giskardpy.qp_solver_qpoases import QPSolverQPOases
+        return QPSolverQPOases()
+    if name == u'osqp':
+        from giskardpy.qp_solver_osqp import QPSolverOSQP
+        return QPSolverOSQP()
+    raise QPSolverException(u'unknown qp solver {}'.format(name))
@@ -0,0 +1,133 @@
+import numpy as np
+import osqp
+from scipy import sparse
+
+from giskardpy.qp_solver import QPSolver
+
+
+class SparsityPattern(object):
+    """
+    Nonzero entries of a dense matrix in the order in which they are stored in a scipy csc matrix.
+    Diagonal matrices are represented by vectors.
+    """
+
+    def __init__(self, mask, upper_triangular=False):
+        """
+        :param mask: True for entries that are part of the pattern, 1d for diagonal matrices
+        :type mask: np.ndarray
+        :param upper_triangular: only keep the upper triangular part of mask
+        :type upper_triangular: bool
+        """
+        self.upper_triangular = upper_triangular
+        if upper_triangular and mask.ndim == 2:
+            mask = np.triu(mask)
+        self.mask = mask
+        if mask.ndim == 1:
+            self.rows = np.nonzero(mask)[0]
+            self.columns = self.rows
+            self.matrix = sparse.csc_matrix((np.ones(len(self.rows)), (self.rows, self.columns)),
+                                            shape=(len(mask), len(mask)))
+        else:
+            self.matrix = sparse.csc_matrix(mask.astype(float))
+            self.matrix.sort_indices()
+            self.rows = self.matrix.indices
+            self.columns = np.repeat(np.arange(mask.shape[1]), np.diff(self.matrix.indptr))
+
+    def contains(self, matrix):
+        """
+        :return: whether all nonzero entries of matrix are part of the pattern
+        :rtype: bool
+        """
+        if matrix.shape != self.mask.shape:
+            return False
+        if self.upper_triangular and matrix.ndim == 2:
+            matrix = np.triu(matrix)
+        return not (matrix != 0)[~self.mask].any()
+
+    def values(self, matrix):
+        """
+        :return: entries of matrix in the pattern
+        :rtype: np.ndarray
+        """
+        if matrix.ndim == 1:
+            return matrix[self.rows]
+        return matrix[self.rows, self.columns]
+
+    def to_csc(self, matrix):
+        """
+        :rtype: sparse.csc_matrix
+        """
+        m = self.matrix.copy()
+        m.data = self.values(matrix)
+        return m
+
+
+class QPSolverOSQP(QPSolver):
+    """
+    Sparse ADMM solver, warm starts with the primal and dual solution of the last solve.
+    The sparsity pattern of H and A is kept between solves and only grows, if entries outside of it become nonzero.
+    """
+    infeasible_return_values = (u'primal infeasible', u'primal infeasible inaccurate',
+                                u'dual infeasible', u'dual infeasible inaccurate')
+    max_iterations_return_values = (u'maximum iterations reached', u'run time limit reached')
+    solved_return_values = (u'solved', u'solved inaccurate')
+    settings = {'verbose': False,
+                'eps_abs': 1e-6,
+                'eps_rel': 1e-6}
+
+    def init(self, dim_a, dim_b):
+        self.H_pattern = None
+        self.A_pattern = None
+        self.x = None
+        self.y = None
+        self.started = False
+
+    def setup(self, H, g, A, lb, ub, lbA, ubA):
+        """
+        Creates a new osqp problem for the sparsity pattern of H and A, which includes the old pattern.
+        Bounds of x are added to A as identity.
+        """
+        H_mask = H != 0
+        A_mask = A != 0
+        if self.H_pattern is not None:
+            if self.H_pattern.mask.shape == H_mask.shape:
+                H_mask |= self.H_pattern.mask
+            A_mask |= self.A_pattern.mask[:A.shape[0]]
+        self.H_pattern = SparsityPattern(H_mask, upper_triangular=True)
+        self.A_pattern = SparsityPattern(np.vstack((A_mask, np.eye(A.shape[1], dtype=bool))))
+        self.A_with_bounds = np.vstack((A, np.eye(A.shape[1])))
+        self.problem = osqp.OSQP()
+        self.problem.setup(P=self.H_pattern.to_csc(H),
+                           q=g,
+                           A=self.A_pattern.to_csc(self.A_with_bounds),
+                           l=np.concatenate((lbA, lb)),
+                           u=np.concatenate((ubA, ub)),
+                           **self.settings)
+        if self.x is not None:
+            self.problem.warm_start(x=self.x, y=self.y)
+
+    def _solve(self, H, g, A, lb, ub, lbA, ubA, nWSR=None):
+        if A.shape != self.shape:
+            self.init(A.shape[1], A.shape[0])
+            self.shape = A.shape
+        for bound in (lb, ub, lbA, ubA):
+            # same as qpoases
+            bound[np.isnan(bound)] = 0
+        if self.started:
+            self.A_with_bounds[:A.shape[0]] = A
+        if not self.started or not self.H_pattern.contains(H) or not self.A_pattern.contains(self.A_with_bounds):
+            self.setup(H, g, A, lb, ub, lbA, ubA)
+        else:
+            self.problem.update(Px=self.H_pattern.values(H),
+                                q=g,
+                                Ax=self.A_pattern.values(self.A_with_bounds),
+                                l=np.concatenate((lbA, lb)),
+                                u=np.concatenate((ubA, ub)))
+        result = self.problem.solve()
+        if result.info.status not in self.solved_return_values:
+            self.raise_exception(result.info.status)
+        self.started = True
+        self.iterations = result.info.iter
+        self.x = result.x
+        self.y = result.y
+        return self.x
@@ -11,7 +11,7 @@ from giskardpy.data_types import SingleJointState, HardConstraint, JointConstrai
 from giskardpy.god_map import GodMap
 from giskardpy.pybullet_world_object import PyBulletWorldObject
 from giskardpy.utils import KeyDefaultDict, \
-    homo_matrix_to_pose, memoize
+    homo_matrix_to_pose, memoize, joint_state_position_items
 from giskardpy.world_object import WorldObject
 
 if WORLD_IMPLEMENTATION == u'pybullet':
@@ -21,7 +21,8 @@ else:
 
 
 class Robot(Backend):
-    def __init__(self, urdf, base_pose=None, controlled_joints=None, path_to_data_folder=u'', *args, **kwargs):
+    def __init__(self, urdf, base_pose=None, controlled_joints=None, path_to_data_folder=u'', compiler=None, *args,
+                 **kwargs):
         """
         :param urdf:
         :type urdf: str
@@ -29,7 +30,10 @@ class Robot(Backend):
         :type joints_to_symbols_map: dict
         :param joint_vel_limit: all velocity limits which are undefined or higher than this will be set to this
         :type joint_vel_limit: Symbol
+        :param compiler: c compiler used for the fk functions, None uses the casadi virtual machine
+        :type compiler: str
         """
+        self._compiler = compiler
         self._fk_expressions = {}
         self._fks = {}
         self._evaluated_fks = {}
@@ -60,8 +64,8 @@ class Robot(Backend):
         :return:
         """
         Backend.joint_state.fset(self, value)
-        self.__joint_state_positions = {str(self._joint_position_symbols[k]): v.position for k, v in
-                                        self.joint_state.items()}
+        # computed in get_joint_state_positions, when it is needed
+        self.__joint_state_positions = None
         # self._evaluated_fks.clear()
         self.get_fk_np.memo.clear()
 
@@ -116,6 +120,9 @@ class Robot(Backend):
 
     def get_joint_state_positions(self):
         try:
+            if self.__joint_state_positions is None:
+                self.__joint_state_positions = {str(self._joint_position_symbols[k]): position for k, position in
+                                                joint_state_position_items(self.joint_state)}
             return self.__joint_state_positions
         except:
             return {str(self._joint_position_symbols[x]): 0 for x in self.get_movable_joints()}
@@ -258,7 +265,7 @@ class Robot(Backend):
         def f(key):
             root, tip = key
             fk = self.get_fk_expression(root, tip)
-            m = w.speed_up(fk, w.free_symbols(fk))
+            m = w.speed_up(fk, w.free_symbols(fk), backend=self._compiler)
             return m
 
         self._fks = KeyDefaultDict(f)
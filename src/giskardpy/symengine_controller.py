@@ -14,13 +14,29 @@ class InstantaneousController(object):
     # TODO should anybody who uses this class know about constraints?
 
 
-    def __init__(self, robot, path_to_functions):
+    def __init__(self, robot, path_to_functions, function_cache_size=None, compiler=None, jacobian_cache=None,
+                 qp_solver=None, history_size=0):
         """
         :type robot: Robot
         :param path_to_functions: location where compiled functions are stored
         :type: str
+        :param function_cache_size: max size of path_to_functions in bytes, None means no limit
+        :type function_cache_size: int
+        :param compiler: c compiler used for the qp matrices, None uses the casadi virtual machine
+        :type compiler: str
+        :param jacobian_cache: see QProblemBuilder
+        :type jacobian_cache: dict
+        :param qp_solver: see QProblemBuilder
+        :type qp_solver: giskardpy.qp_solver.QPSolver
+        :param history_size: see QProblemBuilder
+        :type history_size: int
         """
         self.path_to_functions = path_to_functions
+        self.function_cache_size = function_cache_size
+        self.compiler = compiler
+        self.jacobian_cache = jacobian_cache
+        self.qp_solver = qp_solver
+        self.history_size = history_size
         self.robot = robot
         self.controlled_joints = []
         self.hard_constraints = {}
@@ -73,13 +89,24 @@ class InstantaneousController(object):
         a = ''.join(str(x) for x in sorted(chain([(x,) for x in self.soft_constraints.keys()],
                                                  self.hard_constraints.keys(),
                                                  self.joint_constraints.keys())))
-        function_hash = hashlib.md5((a + self.robot.get_urdf_str()).encode('utf-8')).hexdigest()
+        # the expressions are included in the hash, because constraints with the same name can change,
+        # e.g. their goals are constants or the reachability check is active
+        b = ''.join(str(x) for _, x in sorted(chain(self.soft_constraints.items(),
+                                                    self.hard_constraints.items(),
+                                                    self.joint_constraints.items()),
+                                              key=lambda x: str(x[0])))
+        function_hash = hashlib.md5((a + b + self.robot.get_urdf_str()).encode('utf-8')).hexdigest()
         path_to_functions = self.path_to_functions + function_hash
         self.qp_problem_builder = QProblemBuilder(self.joint_constraints,
                                                   self.hard_constraints,
                                                   self.soft_constraints,
                                                   list(self.joint_to_symbols_str.values()),
-                                                  path_to_functions)
+                                                  path_to_functions,
+                                                  self.function_cache_size,
+                                                  self.compiler,
+                                                  self.jacobian_cache,
+                                                  self.qp_solver,
+                                                  self.history_size)
 
     @profile
     def get_cmd(self, substitutions, nWSR=None):
@@ -98,6 +125,14 @@ class InstantaneousController(object):
         return {name: next_cmd[symbol] for name, symbol in self.joint_to_symbols_str.items()}, \
                H, A, lb, ub, lbA, ubA, xdot_full
 
+    def get_joint_velocities(self):
+        """
+        :return: commands of the last get_cmd in the order of the controlled joints, the array is overwritten by the
+                 next get_cmd
+        :rtype: np.ndarray
+        """
+        return self.qp_problem_builder.joint_velocities
+
     def get_expr(self):
         return self.qp_problem_builder.get_expr()
 
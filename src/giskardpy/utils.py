@@ -34,7 +34,7 @@ from trajectory_msgs.msg import JointTrajectory, JointTrajectoryPoint
 from visualization_msgs.msg import Marker
 
 from giskardpy import logging
-from giskardpy.data_types import SingleJointState
+from giskardpy.data_types import SingleJointState, JointStateArrays
 from giskardpy.plugin import PluginBehavior
 from giskardpy.tfwrapper import kdl_to_pose, np_to_kdl
 
@@ -246,6 +246,18 @@ def write_dict(d, f):
     json.dump(d,f, sort_keys=True, indent=4, separators=(',', ': '))
     f.write('\n')
 
+def joint_state_position_items(joint_state):
+    """
+    :param joint_state: joint name -> SingleJointState
+    :type joint_state: dict
+    :return: (joint name, position) tuples
+    :rtype: iterator
+    """
+    if isinstance(joint_state, JointStateArrays):
+        return joint_state.position_items()
+    return ((joint_name, single_joint_state.position) for joint_name, single_joint_state in joint_state.items())
+
+
 def position_dict_to_joint_states(joint_state_dict):
     """
     :param joint_state_dict: maps joint_name to position
@@ -391,23 +403,13 @@ def plot_trajectory(tj, controlled_joints, path_to_data_folder, sample_period, o
         return np.floor((float)(val - base) / stride) * stride + base
 
     order = max(order, 2)
-    if len(tj._points) <= 0:
+    if len(tj) <= 0:
         return
     colors = [u'b', u'g', u'r', u'c', u'm', u'y', u'k']
     line_styles = [u'', u'--', u'-.', u':']
     fmts = [u''.join(i) for i in product(line_styles, colors)]
-    data = [[] for i in range(order)]
-    times = []
-    names = list(sorted([i for i in tj._points[0.0].keys() if i in controlled_joints]))
-    for time, point in tj.items():
-        for i in range(order):
-            if i == 0:
-                data[0].append([point[joint_name].position for joint_name in names])
-            elif i == 1:
-                data[1].append([point[joint_name].velocity for joint_name in names])
-        times.append(time)
-    data[0] = np.array(data[0])
-    data[1] = np.array(data[1])
+    data = [None for i in range(order)]
+    names, data[0], data[1], times = trajectory_to_np(tj, controlled_joints)
     if(normalize_position):
         data[0] = data[0] - (data[0].max(0) + data[0].min(0)) / 2
     for i in range(2, order):
@@ -848,34 +850,213 @@ def traj_to_msg(sample_period, trajectory, controlled_joints, fill_velocity_valu
     trajectory_msg = JointTrajectory()
     trajectory_msg.header.stamp = rospy.get_rostime() + rospy.Duration(0.5)
     trajectory_msg.joint_names = controlled_joints
-    for time, traj_point in trajectory.items():
+    if len(trajectory) == 0:
+        return trajectory_msg
+    if any(joint_name not in trajectory.index for joint_name in controlled_joints):
+        raise NotImplementedError(u'generated traj does not contain all joints')
+    positions = trajectory.get_positions(controlled_joints)
+    velocities = trajectory.get_velocities(controlled_joints)
+    for i, time in enumerate(trajectory.keys()):
         p = JointTrajectoryPoint()
         p.time_from_start = rospy.Duration(time*sample_period)
-        for joint_name in controlled_joints:
-            if joint_name in traj_point:
-                p.positions.append(traj_point[joint_name].position)
-                if fill_velocity_values:
-                    p.velocities.append(traj_point[joint_name].velocity)
-            else:
-                raise NotImplementedError(u'generated traj does not contain all joints')
+        p.positions = positions[i].tolist()
+        if fill_velocity_values:
+            p.velocities = velocities[i].tolist()
         trajectory_msg.points.append(p)
     return trajectory_msg
 
 def make_filter_b_mask(H):
-    return H.sum(axis=1) != 0
+    """
+    :param H: diagonal of the weight matrix
+    :type H: np.ndarray
+    :return: mask that removes variables with zero weight
+    :rtype: np.ndarray
+    """
+    return H != 0
 
-def make_filter_masks(H, num_joint_constraints, num_hard_constraints):
-    b_mask = make_filter_b_mask(H)
+def make_filter_bA_mask(b_mask, num_joint_constraints, num_hard_constraints):
+    """
+    :param b_mask: see make_filter_b_mask
+    :type b_mask: np.ndarray
+    :return: mask that removes the constraints of soft constraints with zero weight
+    :rtype: np.ndarray
+    """
     s_mask = b_mask[num_joint_constraints:]
     if num_hard_constraints == 0:
-        bA_mask = s_mask
-    else:
-        bA_mask = np.concatenate((np.array([True] * num_hard_constraints), s_mask))
+        return s_mask
+    return np.concatenate((np.array([True] * num_hard_constraints), s_mask))
 
+def make_filter_masks(H, num_joint_constraints, num_hard_constraints):
+    b_mask = make_filter_b_mask(H)
+    bA_mask = make_filter_bA_mask(b_mask, num_joint_constraints, num_hard_constraints)
     return bA_mask, b_mask
 
 
-
+class SlidingDFT(object):
+    """
+    Discrete fourier transform of the last window_size samples of several signals, that is updated with each new
+    sample instead of being recomputed. Only the given bins are computed, they are defined like in np.fft.rfft.
+    """
+
+    def __init__(self, number_of_signals, window_size, bins):
+        """
+        :type number_of_signals: int
+        :type window_size: int
+        :param bins: indices of the frequencies that are computed
+        :type bins: np.ndarray
+        """
+        self.window_size = window_size
+        self.bins = np.asarray(bins, dtype=int)
+        self.samples = np.zeros((number_of_signals, window_size))
+        self.dft = np.zeros((number_of_signals, len(self.bins)), dtype=complex)
+        self.twiddle = np.exp(2j * np.pi * self.bins / window_size)
+        self.basis = np.exp(-2j * np.pi * np.outer(np.arange(window_size), self.bins) / window_size)
+        # index of the oldest sample in the ring buffer
+        self.next = 0
+        self.number_of_samples = 0
+
+    def is_full(self):
+        """
+        :return: whether window_size samples were appended and dft is valid
+        :rtype: bool
+        """
+        return self.number_of_samples == self.window_size
+
+    def append(self, sample):
+        """
+        Replaces the oldest sample.
+        :param sample: one value for each signal
+        :type sample: np.ndarray
+        """
+        if self.is_full():
+            self.dft += (sample - self.samples[:, self.next])[:, None]
+            self.dft *= self.twiddle
+        self.samples[:, self.next] = sample
+        self.next = (self.next + 1) % self.window_size
+        self.number_of_samples = min(self.number_of_samples + 1, self.window_size)
+        if self.next == 0 and self.is_full():
+            # the ring buffer is in chronological order, recomputing the dft removes accumulated rounding errors
+            self.dft = np.dot(self.samples, self.basis)
+
+    def get_amplitudes(self, mask=None):
+        """
+        :param mask: only compute the amplitudes of these signals
+        :type mask: np.ndarray
+        :return: amplitude of each bin and signal, shape = number of signals * number of bins
+        :rtype: np.ndarray
+        """
+        dft = self.dft if mask is None else self.dft[mask]
+        return np.abs(dft) * (2. / self.window_size)
+
+
+def get_goal_errors(H, lbA, ubA, xdot_full, num_joint_constraints, goal_mask):
+    """
+    :param H: unfiltered diagonal of the weight matrix, lbA and ubA are unfiltered as well
+    :type H: np.ndarray
+    :param xdot_full: solution of the filtered problem
+    :type xdot_full: np.ndarray
+    :param goal_mask: True for soft constraints that are goal constraints
+    :type goal_mask: np.ndarray
+    :return: largest distance of 0 to the bounds of a goal constraint, largest absolute slack of a goal constraint
+    :rtype: tuple
+    """
+    if not goal_mask.any():
+        return 0., 0.
+    number_of_soft_constraints = len(goal_mask)
+    goal_lbA = lbA[len(lbA) - number_of_soft_constraints:][goal_mask]
+    goal_ubA = ubA[len(ubA) - number_of_soft_constraints:][goal_mask]
+    goal_error = max(goal_lbA.max(), -goal_ubA.min(), 0.)
+    # slack of filtered soft constraints is 0
+    b_mask = make_filter_b_mask(H)
+    slack = np.zeros(number_of_soft_constraints)
+    slack[b_mask[num_joint_constraints:]] = xdot_full[np.count_nonzero(b_mask[:num_joint_constraints]):]
+    return goal_error, np.abs(slack[goal_mask]).max()
+
+
+class ConvergencePredictor(object):
+    """
+    Predicts from the trends of the last window_size ticks, whether the robot will barely move anymore.
+    The joint velocities are assumed to decay geometrically, the decay rate is estimated from the ratios of
+    consecutive ticks. Additionally, the goal errors have to shrink or the slack has to take up the goal error,
+    which means the goals are blocked.
+    """
+
+    def __init__(self, window_size, confidence, remaining_motion=1.):
+        """
+        :param window_size: number of ratios that are used to estimate the decay rates
+        :type window_size: int
+        :param confidence: quantile of the ratios that is used as decay rate, higher values are more conservative
+        :type confidence: float
+        :param remaining_motion: converged if the predicted sum of all future velocities is below this value
+        :type remaining_motion: float
+        """
+        self.window_size = window_size
+        self.confidence = confidence
+        self.remaining_motion = remaining_motion
+        self.velocities = np.zeros(window_size + 1)
+        self.goal_errors = np.zeros(window_size + 1)
+        self.slack = 0.
+        self.number_of_samples = 0
+
+    def append(self, velocity, goal_error, slack):
+        """
+        :param velocity: largest joint velocity of this tick, relative to the velocity that counts as standing still
+        :type velocity: float
+        :param goal_error: see get_goal_errors
+        :type goal_error: float
+        :param slack: see get_goal_errors
+        :type slack: float
+        """
+        i = self.number_of_samples % len(self.velocities)
+        self.velocities[i] = velocity
+        self.goal_errors[i] = goal_error
+        self.slack = slack
+        self.number_of_samples += 1
+
+    def get_last(self, samples):
+        return samples[(self.number_of_samples - 1) % len(samples)]
+
+    def get_decay_rate(self, samples):
+        """
+        :param samples: ring buffer of a signal
+        :type samples: np.ndarray
+        :return: quantile of the ratios between consecutive samples, 0 / 0 counts as 0 and x / 0 as inf
+        :rtype: float
+        """
+        chronological = samples[(np.arange(len(samples)) + self.number_of_samples) % len(samples)]
+        previous = chronological[:-1]
+        current = chronological[1:]
+        ratios = np.zeros(len(previous))
+        np.divide(current, previous, out=ratios, where=previous > 0)
+        ratios[(previous <= 0) & (current > 0)] = np.inf
+        ratios.sort()
+        return ratios[int(np.ceil(self.confidence * (len(ratios) - 1)))]
+
+    def predict_remaining_motion(self):
+        """
+        :return: sum of the predicted velocities of all future ticks
+        :rtype: float
+        """
+        velocity = self.get_last(self.velocities)
+        if velocity == 0:
+            return 0.
+        decay_rate = self.get_decay_rate(self.velocities)
+        if decay_rate >= 1:
+            return np.inf
+        return velocity * decay_rate / (1 - decay_rate)
+
+    def is_converged(self):
+        """
+        :rtype: bool
+        """
+        if self.number_of_samples <= self.window_size:
+            return False
+        if self.predict_remaining_motion() >= self.remaining_motion:
+            return False
+        goal_error = self.get_last(self.goal_errors)
+        return goal_error == 0 or \
+               self.get_decay_rate(self.goal_errors) < 1 or \
+               self.slack >= self.confidence * goal_error
 
 
 def trajectory_to_np(tj, joint_names):
@@ -883,17 +1064,11 @@ def trajectory_to_np(tj, joint_names):
     :type tj: Trajectory
     :return:
     """
-    names = list(sorted([i for i in tj._points[0.0].keys() if i in joint_names]))
-    position = []
-    velocity = []
-    times = []
-    for time, point in tj.items():
-        position.append([point[joint_name].position for joint_name in names])
-        velocity.append([point[joint_name].velocity for joint_name in names])
-        times.append(time)
-    position = np.array(position)
-    velocity = np.array(velocity)
-    times = np.array(times)
+    names = list(sorted([i for i in tj.names if i in joint_names]))
+    # copies, such that the trajectory can't be modified through them
+    position = np.array(tj.get_positions(names))
+    velocity = np.array(tj.get_velocities(names))
+    times = tj.get_times()
     return names, position, velocity, times
 
 def publish_marker_sphere(position, frame_id=u'map', radius=0.05, id_=0):
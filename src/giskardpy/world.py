@@ -109,11 +109,16 @@ class World(object):
     # Robot ------------------------------------------------------------------------------------------------------------
 
     @profile
-    def add_robot(self, robot, base_pose, controlled_joints, ignored_pairs, added_pairs):
+    def add_robot(self, robot, base_pose, controlled_joints, ignored_pairs, added_pairs, compiler=None,
+                  number_of_processes=1):
         """
         :type robot: giskardpy.world_object.WorldObject
         :type controlled_joints: list
         :type base_pose: PoseStamped
+        :param compiler: c compiler used for the fk functions of the robot, None uses the casadi virtual machine
+        :type compiler: str
+        :param number_of_processes: number of processes used to compute the self collision matrix
+        :type number_of_processes: int
         """
         if not isinstance(robot, WorldObject):
             raise TypeError(u'only WorldObject can be added to world')
@@ -127,7 +132,9 @@ class World(object):
                                              controlled_joints=controlled_joints,
                                              path_to_data_folder=self._path_to_data_folder,
                                              ignored_pairs=ignored_pairs,
-                                             added_pairs=added_pairs)
+                                             added_pairs=added_pairs,
+                                             compiler=compiler,
+                                             number_of_processes=number_of_processes)
         logging.loginfo(u'--> added {} to world'.format(robot.get_name()))
 
     @property
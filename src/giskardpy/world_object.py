@@ -10,14 +10,20 @@ from geometry_msgs.msg import Pose, Quaternion
 from tf.transformations import euler_from_quaternion, rotation_from_matrix, quaternion_matrix
 
 from giskardpy import logging
-from giskardpy.data_types import SingleJointState
+from giskardpy.data_types import SingleJointState, JointStateArrays
 from giskardpy.tfwrapper import msg_to_kdl
 from giskardpy.urdf_object import URDFObject
+from giskardpy.utils import create_path
 
 
 class WorldObject(URDFObject):
     def __init__(self, urdf, base_pose=None, controlled_joints=None, path_to_data_folder=u'',
-                 calc_self_collision_matrix=True, ignored_pairs=None, added_pairs=None, *args, **kwargs):
+                 calc_self_collision_matrix=True, ignored_pairs=None, added_pairs=None, number_of_processes=1,
+                 *args, **kwargs):
+        """
+        :param number_of_processes: number of processes used to compute self collision matrices
+        :type number_of_processes: int
+        """
         super(WorldObject, self).__init__(urdf, *args, **kwargs)
         self.path_to_data_folder = path_to_data_folder + u'collision_matrix/'
         self.controlled_joints = controlled_joints
@@ -30,6 +36,7 @@ class WorldObject(URDFObject):
         else:
             self.added_pairs = {tuple(x) for x in added_pairs}
         self._calc_self_collision_matrix = calc_self_collision_matrix
+        self.number_of_processes = number_of_processes
         if base_pose is None:
             p = Pose()
             p.orientation.w = 1
@@ -45,6 +52,12 @@ class WorldObject(URDFObject):
 
     @joint_state.setter
     def joint_state(self, value):
+        if isinstance(value, JointStateArrays) and \
+                (isinstance(self._js, JointStateArrays) and value.names is self._js.names or
+                 all(joint_name in value for joint_name in self._js)):
+            # nothing to merge, keep the arrays
+            self._js = value
+            return
         new_js = {}
         new_js.update(self._js)
         self._js = new_js
@@ -142,12 +155,9 @@ class WorldObject(URDFObject):
         sometimes2 = self.check_collisions(rest, d2)
         rest = rest.difference(sometimes2)
         sometimes = sometimes.union(sometimes2)
-        for i in range(num_rnd_tries):
-            self.joint_state = self.get_rnd_joint_state()
-            sometimes2 = self.check_collisions(rest, d2)
-            if len(sometimes2) > 0:
-                rest = rest.difference(sometimes2)
-                sometimes = sometimes.union(sometimes2)
+        # all joint states are sampled upfront, so that the result does not depend on how they are checked
+        joint_states = [self.get_rnd_joint_state() for _ in range(num_rnd_tries)]
+        sometimes = sometimes.union(self.check_collisions_in_joint_states(rest, d2, joint_states))
         sometimes = sometimes.union(self.added_pairs)
         logging.loginfo(u'calculated self collision matrix in {:.3f}s'.format(time() - t))
         self.joint_state = joint_state_tmp
@@ -170,6 +180,25 @@ class WorldObject(URDFObject):
                 in_collision.add((link_a, link_b))
         return in_collision
 
+    def check_collisions_in_joint_states(self, link_combinations, distance, joint_states):
+        """
+        :param link_combinations: set with link name tuples
+        :type link_combinations: set
+        :param joint_states: list of joint states
+        :type joint_states: list
+        :return: link name tuples, which are in collision in at least one of the joint states
+        :rtype: set
+        """
+        in_collision = set()
+        rest = link_combinations
+        for joint_state in joint_states:
+            self.joint_state = joint_state
+            in_collision2 = self.check_collisions(rest, distance)
+            if len(in_collision2) > 0:
+                rest = rest.difference(in_collision2)
+                in_collision = in_collision.union(in_collision2)
+        return in_collision
+
     def in_collision(self, link_a, link_b, distance):
         return self.are_linked(link_a, link_b)
 
@@ -255,8 +284,8 @@ class WorldObject(URDFObject):
                     self._self_collision_matrix = pickle.load(f)
                     logging.loginfo(u'loaded self collision matrix {}'.format(path))
                     return True
-            except Exception:
-                logging.loginfo('failed to load collision matrix at {}'.format(path))
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+                logging.logwarn(u'failed to load collision matrix at {}: {}'.format(path, e))
         return False
 
     def safe_self_collision_matrix(self, path):
@@ -279,10 +308,68 @@ class WorldObject(URDFObject):
         m.pose = self.base_pose
         return m
 
+    def get_attachment_hash(self, urdf_object, parent_link, pose, round_to=3):
+        """
+        :return: hash of everything that influences the self collision entries of urdf_object after attaching it,
+                    has to be called before attaching it.
+        :rtype: str
+        """
+        pose = np.round([pose.position.x,
+                         pose.position.y,
+                         pose.position.z,
+                         pose.orientation.x,
+                         pose.orientation.y,
+                         pose.orientation.z,
+                         pose.orientation.w], round_to) + 0.  # + 0. turns -0. into 0.
+        key = u'{}{}{}{}{}{}'.format(self.get_urdf_str(),
+                                     urdf_object.get_urdf_str(),
+                                     parent_link,
+                                     pose.tolist(),
+                                     sorted(self.ignored_pairs),
+                                     sorted(self.added_pairs))
+        return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def get_attachment_collision_matrix_path(self, attachment_hash):
+        return u'{}/{}/attachments/{}'.format(self.path_to_data_folder, self.get_name(), attachment_hash)
+
+    def load_attachment_collision_matrix(self, attachment_hash):
+        """
+        Adds the self collision entries of an attached object, if they were computed before.
+        :type attachment_hash: str
+        :rtype: bool
+        """
+        path = self.get_attachment_collision_matrix_path(attachment_hash)
+        if os.path.isfile(path):
+            try:
+                with open(path, 'rb') as f:
+                    self._self_collision_matrix.update(pickle.load(f))
+                    logging.loginfo(u'loaded self collision matrix {}'.format(path))
+                    return True
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+                logging.logwarn(u'failed to load collision matrix at {}: {}'.format(path, e))
+        return False
+
+    def safe_attachment_collision_matrix(self, attachment_hash, link_names):
+        """
+        :param link_names: links of the attached object
+        :type link_names: list
+        """
+        path = self.get_attachment_collision_matrix_path(attachment_hash)
+        create_path(path)
+        link_names = set(link_names)
+        attachment_collision_matrix = {(link_a, link_b) for link_a, link_b in self._self_collision_matrix
+                                       if link_a in link_names or link_b in link_names}
+        with open(path, u'wb') as file:
+            logging.loginfo(u'saved self collision matrix {}'.format(path))
+            pickle.dump(attachment_collision_matrix, file)
+
     def attach_urdf_object(self, urdf_object, parent_link, pose):
+        attachment_hash = self.get_attachment_hash(urdf_object, parent_link, pose)
         super(WorldObject, self).attach_urdf_object(urdf_object, parent_link, pose)
-        self.update_self_collision_matrix(added_links=set(product(self.get_links_with_collision(),
-                                                                  urdf_object.get_links_with_collision())))
+        if not self.load_attachment_collision_matrix(attachment_hash):
+            self.update_self_collision_matrix(added_links=set(product(self.get_links_with_collision(),
+                                                                      urdf_object.get_links_with_collision())))
+            self.safe_attachment_collision_matrix(attachment_hash, urdf_object.get_link_names())
         # TODO set joint state for controllable joints of added urdf?
 
     def detach_sub_tree(self, joint_name):
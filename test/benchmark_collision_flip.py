@@ -0,0 +1,90 @@
+"""
+Compares PyBulletWorld.should_flip_collision with the old query based should_flip_collision_by_query on random pr2
+configurations next to a second pr2 and prints how often they agree, how long they take and how often
+should_flip_collision has to fall back to the query.
+Run from the test folder: python benchmark_collision_flip.py
+"""
+from __future__ import print_function
+
+import random
+from collections import defaultdict
+from time import time
+
+from geometry_msgs.msg import Pose
+
+import giskardpy
+
+giskardpy.WORLD_IMPLEMENTATION = u'pybullet'
+import giskardpy.pybullet_wrapper as pbw
+from giskardpy.data_types import SingleJointState
+from giskardpy.pybullet_world import PyBulletWorld
+from giskardpy.utils import KeyDefaultDict
+from giskardpy.world_object import WorldObject
+from utils_for_tests import pr2_urdf
+
+NUMBER_OF_CONFIGURATIONS = 50
+
+
+def random_joint_state(robot):
+    js = {}
+    for joint_name in robot.get_movable_joints():
+        lower_limit, upper_limit = robot.get_joint_limits(joint_name)
+        if lower_limit is None or upper_limit is None:
+            lower_limit, upper_limit = -3.14, 3.14
+        js[joint_name] = SingleJointState(joint_name, random.uniform(lower_limit, upper_limit))
+    return js
+
+
+def main():
+    random.seed(1337)
+    pbw.start_pybullet(False)
+    world = PyBulletWorld(False, u'tmp_data/')
+    world.add_robot(WorldObject(pr2_urdf()), None, [], set(), set())
+    pr22 = WorldObject(pr2_urdf())
+    pr22.set_name(u'pr22')
+    world.add_object(pr22)
+    base_pose = Pose()
+    base_pose.position.x = 0.6
+    base_pose.orientation.w = 1
+    world.set_object_pose(u'pr22', base_pose)
+    min_dist = defaultdict(lambda: {u'zero_weight_distance': 0.1})
+    cut_off_distances = world.collision_goals_to_collision_matrix([], min_dist)
+
+    # counts the calls of should_flip_collision_by_query that are made by should_flip_collision
+    fallbacks = [0]
+    should_flip_collision_by_query = world.should_flip_collision_by_query
+
+    def count_fallbacks(position_on_a_in_map, link_a):
+        fallbacks[0] += 1
+        return should_flip_collision_by_query(position_on_a_in_map, link_a)
+
+    contacts = 0
+    mismatches = 0
+    aabb_time = 0
+    query_time = 0
+    for i in range(NUMBER_OF_CONFIGURATIONS):
+        world.robot.joint_state = random_joint_state(world.robot)
+        for contact in world.get_closest_points(cut_off_distances):
+            contacts += 1
+            t = time()
+            aabbs = KeyDefaultDict(world.get_aabb)
+            world.should_flip_collision_by_query = count_fallbacks
+            flip = world.should_flip_collision(contact, aabbs)
+            world.should_flip_collision_by_query = should_flip_collision_by_query
+            aabb_time += time() - t
+            t = time()
+            flip_by_query = world.should_flip_collision_by_query(contact['position_on_a'], contact['link_a'])
+            query_time += time() - t
+            if flip != flip_by_query:
+                mismatches += 1
+    pbw.stop_pybullet()
+
+    print(u'contacts: {}, mismatches: {}, fallbacks to the query: {} ({:.1f}%)'.format(
+        contacts, mismatches, fallbacks[0], 100. * fallbacks[0] / max(contacts, 1)))
+    print(u'aabb: {:.6f}s per contact'.format(aabb_time / max(contacts, 1)))
+    print(u'query: {:.6f}s per contact'.format(query_time / max(contacts, 1)))
+    print(u'speedup: {:.2f}'.format(query_time / max(aabb_time, 1e-9)))
+
+
+if __name__ == u'__main__':
+    main()
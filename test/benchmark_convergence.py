@@ -0,0 +1,165 @@
+"""
+Compares the number of ticks until planning stops with only the GoalReached criterion and with the ConvergenceDetector
+in addition to it. The goals resemble the ones of the integration tests: joint goals for all movable joints, small
+joint goals close to the start state and cartesian position goals for the leaf links of the bundled robots.
+Also prints how far the joints would have moved between the two stops.
+Run from the test folder: python benchmark_convergence.py
+"""
+from __future__ import print_function
+
+from collections import OrderedDict
+
+import numpy as np
+
+import giskardpy
+
+giskardpy.WORLD_IMPLEMENTATION = None
+from benchmark_qp_solver import ROBOTS
+from giskardpy import casadi_wrapper as w
+from giskardpy.data_types import JointConstraint, SoftConstraint
+from giskardpy.qp_problem_builder import QProblemBuilder
+from giskardpy.qp_solver import create_qp_solver
+from giskardpy.robot import Robot
+from giskardpy.utils import ConvergencePredictor, get_goal_errors
+
+NUMBER_OF_GOALS = 10
+MAX_TICKS = 1000
+VELOCITY_LIMIT = 1
+JOINT_WEIGHT = 0.01
+GOAL_WEIGHT = 1
+# default config
+SAMPLE_PERIOD = 0.05
+JOINT_CONVERGENCE_THRESHOLD = 0.02
+GOAL_REACHED_WINDOW_SIZE = 21
+WINDOW_SIZE = 5
+CONFIDENCE = 0.9
+REMAINING_MOTION = 1
+
+
+def build_goal_problem(robot, goal_type):
+    """
+    Joint and cartesian position goals like the ones of JointPosition and CartesianPosition, the weights and limits
+    are normalized like in Robot.init_joint_constraints and Constraint.normalize_weight.
+    The solution of the qp is the change of the joint positions during one sample period.
+    """
+    joint_names = robot.get_movable_joints()
+    joint_symbols = [robot.get_joint_position_symbol(joint_name) for joint_name in joint_names]
+    max_change = VELOCITY_LIMIT * SAMPLE_PERIOD
+    joint_weight = JOINT_WEIGHT / max_change ** 2
+    goal_weight = GOAL_WEIGHT / max_change ** 2
+    joint_constraints = OrderedDict((joint_name, JointConstraint(-max_change, max_change, joint_weight, 0))
+                                    for joint_name in joint_names)
+    soft_constraints = OrderedDict()
+    goal_symbols = []
+    if goal_type == u'cartesian':
+        root = robot.get_root()
+        for leaf in robot.get_leaves():
+            if not robot.get_chain(root, leaf, links=False, fixed=False):
+                continue
+            r_P_c = w.position_of(robot.get_fk_expression(root, leaf))
+            goal = [w.Symbol(u'{}_{}'.format(leaf, axis)) for axis in u'xyz']
+            goal_symbols.extend(goal)
+            r_P_error = w.vector3(*goal) - r_P_c
+            trans_error = w.norm(r_P_error)
+            r_P_intermediate_error = w.save_division(r_P_error, trans_error) * w.Min(trans_error, max_change)
+            for i, axis in enumerate(u'xyz'):
+                soft_constraints[u'{}/{}'.format(leaf, axis)] = SoftConstraint(r_P_intermediate_error[i],
+                                                                               r_P_intermediate_error[i],
+                                                                               goal_weight, r_P_c[i], True,
+                                                                               -1e9, 1e9, 0)
+    else:
+        for joint_name, joint_symbol in zip(joint_names, joint_symbols):
+            goal = w.Symbol(u'{}_goal'.format(joint_name))
+            goal_symbols.append(goal)
+            error = w.Max(w.Min(goal - joint_symbol, max_change), -max_change)
+            soft_constraints[joint_name] = SoftConstraint(error, error, goal_weight, joint_symbol, True,
+                                                          -1e9, 1e9, 0)
+    qp_problem_builder = QProblemBuilder(joint_constraints, OrderedDict(), soft_constraints, joint_symbols)
+    return qp_problem_builder, joint_symbols, goal_symbols
+
+
+def make_thresholds(robot):
+    """
+    Same as make_velocity_threshold with the velocity limit of the benchmark.
+    """
+    thresholds = []
+    for joint_name in robot.get_movable_joints():
+        velocity_limit = VELOCITY_LIMIT * JOINT_CONVERGENCE_THRESHOLD
+        if robot.is_joint_prismatic(joint_name):
+            velocity_limit = min(max(0.003, velocity_limit), 0.01)
+        else:
+            velocity_limit = min(max(0.02, velocity_limit), 0.13)
+        thresholds.append(velocity_limit * SAMPLE_PERIOD)
+    return np.array(thresholds)
+
+
+def plan(qp_problem_builder, joint_symbols, goal_symbols, thresholds, goal_range, seed):
+    """
+    :return: tick in which GoalReached stops, tick in which the ConvergenceDetector stops or None,
+             largest joint motion between these ticks
+    :rtype: tuple
+    """
+    qp_solver = create_qp_solver(u'qpoases')
+    predictor = ConvergencePredictor(WINDOW_SIZE, CONFIDENCE, REMAINING_MOTION)
+    goal_mask = np.ones(qp_problem_builder.num_soft_constraints, dtype=bool)
+    number_of_joints = len(joint_symbols)
+    np.random.seed(seed)
+    values = {str(s): 0. for s in joint_symbols}
+    values.update({str(s): np.random.uniform(-goal_range, goal_range) for s in goal_symbols})
+    converged_tick = None
+    converged_position = None
+    for tick in range(MAX_TICKS):
+        substitutions = [values[x] for x in qp_problem_builder.get_expr()]
+        np_H, np_A, np_lb, np_ub, np_lbA, np_ubA, np_g = qp_problem_builder.compiled_big_ass_M.call2(substitutions)
+        H, A, lb, ub, lbA, ubA, g = qp_problem_builder.filter_zero_weight_constraints(np_H, np_A, np_lb, np_ub,
+                                                                                     np_lbA, np_ubA, np_g)
+        xdot_full = qp_solver.solve(H, g, A, lb, ub, lbA, ubA, None,
+                                    qp_problem_builder.filtered_b_names, qp_problem_builder.filtered_bA_names)
+        joint_velocities = np.zeros(number_of_joints)
+        joint_velocities[qp_problem_builder.joint_b_index] = xdot_full[:len(qp_problem_builder.joint_b_index)]
+        position = np.array([values[str(s)] for s in joint_symbols])
+        if converged_tick is None:
+            goal_error, slack = get_goal_errors(np_H, np_lbA, np_ubA, xdot_full, number_of_joints, goal_mask)
+            predictor.append(np.max(np.abs(joint_velocities) / thresholds), goal_error, slack)
+            if predictor.is_converged():
+                converged_tick = tick
+                converged_position = position
+        if tick >= GOAL_REACHED_WINDOW_SIZE and (np.abs(joint_velocities) < thresholds).all():
+            break
+        for joint_symbol, velocity in zip(joint_symbols, joint_velocities):
+            values[str(joint_symbol)] += velocity
+    if converged_tick is None:
+        return tick, None, 0.
+    return tick, converged_tick, np.abs(position - converged_position).max()
+
+
+def main():
+    print(u'goal reached window size {}, convergence window size {}, confidence {}, remaining motion {}'.format(
+        GOAL_REACHED_WINDOW_SIZE, WINDOW_SIZE, CONFIDENCE, REMAINING_MOTION))
+    for urdf in ROBOTS:
+        with open(urdf, u'r') as f:
+            robot = Robot(f.read())
+        thresholds = make_thresholds(robot)
+        # goals are sampled from [-goal range, goal range]
+        for name, goal_type, goal_range in ((u'joint', u'joint', 1),
+                                            (u'small joint', u'joint', 0.05),
+                                            (u'cartesian', u'cartesian', 1)):
+            qp_problem_builder, joint_symbols, goal_symbols = build_goal_problem(robot, goal_type)
+            goal_reached_ticks = []
+            ticks = []
+            motions = []
+            for seed in range(NUMBER_OF_GOALS):
+                goal_reached_tick, converged_tick, motion = plan(qp_problem_builder, joint_symbols, goal_symbols,
+                                                                 thresholds, goal_range, seed)
+                goal_reached_ticks.append(goal_reached_tick)
+                ticks.append(goal_reached_tick if converged_tick is None else min(goal_reached_tick,
+                                                                                  converged_tick))
+                motions.append(motion)
+            print(u'{} {} goals: goal reached {:.1f} ticks, with convergence detector {:.1f} ticks ({:.1f}% less), '
+                  u'max skipped joint motion {:.5f}'.format(
+                urdf, name, np.mean(goal_reached_ticks), np.mean(ticks),
+                100 * (1 - np.sum(ticks) / float(np.sum(goal_reached_ticks))), np.max(motions)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Measures how long gathering the symbol values for the QP takes per tick for the pr2 configuration.
+Only the joint states change during a plan, the weights, limits and goals are constant.
+Run from the test folder: python benchmark_god_map.py
+"""
+from __future__ import print_function
+
+import random
+from time import time
+
+import giskardpy
+
+giskardpy.WORLD_IMPLEMENTATION = None
+
+import giskardpy.identifier as identifier
+from giskardpy.data_types import SingleJointState
+from giskardpy.god_map import GodMap
+from giskardpy.world import World
+from giskardpy.world_object import WorldObject
+from utils_for_tests import pr2_urdf
+
+NUMBER_OF_TICKS = 1000
+NUMBER_OF_GOALS = 10
+
+
+def main():
+    random.seed(1337)
+    god_map = GodMap()
+    world = World()
+    world.add_robot(WorldObject(pr2_urdf()), None, [], set(), set())
+    god_map.set_data(identifier.world, world)
+    joint_names = world.robot.get_movable_joints()
+    god_map.set_data(identifier.rosparam, {u'general_options': {
+        u'joint_weights': {joint_name: 0.01 for joint_name in joint_names},
+        u'joint_vel_limit': {joint_name: 1.0 for joint_name in joint_names},
+        u'sample_period': 0.05}})
+    goals = {}
+    for i in range(NUMBER_OF_GOALS):
+        goals[u'goal{}'.format(i)] = {u'position': [random.random() for _ in range(3)],
+                                      u'orientation': [0, 0, 0, 1],
+                                      u'weight': 1.0}
+    god_map.set_data(identifier.constraints_identifier, goals)
+    god_map.add_versioned_namespace(identifier.rosparam)
+    god_map.add_versioned_namespace(identifier.constraints_identifier)
+
+    identifiers = [identifier.sample_period]
+    for joint_name in joint_names:
+        identifiers.append(identifier.joint_states + [joint_name, u'position'])
+        identifiers.append(identifier.joint_weight + [joint_name])
+        identifiers.append(identifier.general_options + [u'joint_vel_limit', joint_name])
+    for goal_name in goals:
+        goal = identifier.constraints_identifier + [goal_name]
+        identifiers.extend(goal + [u'position', i] for i in range(3))
+        identifiers.extend(goal + [u'orientation', i] for i in range(4))
+        identifiers.append(goal + [u'weight'])
+    symbols = [str(god_map.to_symbol(x)) for x in identifiers]
+    symbol_vector = god_map.get_symbol_vector(symbols)
+
+    joint_states = []
+    for i in range(NUMBER_OF_TICKS):
+        joint_states.append({joint_name: SingleJointState(joint_name, random.random()) for joint_name in joint_names})
+
+    t = time()
+    for joint_state in joint_states:
+        god_map.set_data(identifier.joint_states, joint_state)
+        god_map.get_values(symbols)
+    get_values_time = (time() - t) / NUMBER_OF_TICKS
+
+    t = time()
+    for joint_state in joint_states:
+        god_map.set_data(identifier.joint_states, joint_state)
+        for namespace in identifier.rosparam, identifier.constraints_identifier:
+            god_map.mark_changed(namespace)
+        symbol_vector.update()
+    all_namespaces_time = (time() - t) / NUMBER_OF_TICKS
+
+    t = time()
+    for joint_state in joint_states:
+        god_map.set_data(identifier.joint_states, joint_state)
+        symbol_vector.update()
+    changed_namespaces_time = (time() - t) / NUMBER_OF_TICKS
+
+    print(u'{} symbols, {} of them are joint states'.format(len(symbols), len(joint_names)))
+    print(u'get_values: {:.6f}s per tick'.format(get_values_time))
+    print(u'symbol vector, all namespaces: {:.6f}s per tick'.format(all_namespaces_time))
+    print(u'symbol vector, changed namespaces: {:.6f}s per tick'.format(changed_namespaces_time))
+
+
+if __name__ == u'__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Replays recorded qp problems through the qp solver backends without ros.
+Each tick is solved once with a new solver, which is an init, and once in order with the same solver, where all but
+the first solve are hot starts. Prints percentiles of the solve times and of the iterations, which are the number of
+working set recalculations for qpoases.
+
+The arguments are npz files saved by the ~export_qp_history service or urdfs, for which a plan where all leaf links
+move to random positions is recorded like in benchmark_qp_solver.py. Without arguments the bundled pr2, boxy and donbot
+are used. For the hsr, save its robot_description into a urdf file and pass it as argument.
+Run from the test folder: python benchmark_qp_replay.py [file.npz|file.urdf ...]
+"""
+from __future__ import print_function
+
+import sys
+from collections import OrderedDict
+from time import time
+
+import numpy as np
+
+from benchmark_qp_solver import SOLVERS, NUMBER_OF_TICKS, SAMPLE_PERIOD, build_problem
+from giskardpy.qp_diagnostics import QPDiagnostics
+from giskardpy.qp_solver import create_qp_solver
+from giskardpy.robot import Robot
+
+ROBOTS = [u'urdfs/pr2_with_base.urdf', u'urdfs/boxy.urdf', u'urdfs/iai_donbot.urdf']
+PERCENTILES = [50, 90, 99, 100]
+
+
+def record(urdf, solver_name):
+    """
+    :return: history of a plan that moves all leaf links of the robot in urdf to random positions
+    :rtype: QPDiagnostics
+    """
+    with open(urdf, u'r') as f:
+        robot = Robot(f.read())
+    qp_problem_builder, joint_symbols, goal_symbols = build_problem(robot, NUMBER_OF_TICKS)
+    qp_problem_builder.qp_solver = create_qp_solver(solver_name)
+    np.random.seed(1337)
+    values = {str(s): 0. for s in joint_symbols}
+    values.update({str(s): np.random.uniform(-1, 1) for s in goal_symbols})
+    for i in range(NUMBER_OF_TICKS):
+        next_cmd = qp_problem_builder.get_cmd([values[x] for x in qp_problem_builder.get_expr()])[0]
+        for joint_symbol, velocity in next_cmd.items():
+            values[str(joint_symbol)] += velocity * SAMPLE_PERIOD
+    return qp_problem_builder.diagnostics
+
+
+def replay(history, solver_name, hot_start):
+    """
+    :param hot_start: solve all ticks with the same solver, otherwise every tick gets a new one
+    :type hot_start: bool
+    :return: solve time and iterations of each tick
+    :rtype: tuple
+    """
+    # solvers may modify the bounds
+    problems = [history.get_filtered(tick) for tick in range(len(history))]
+    times = []
+    iterations = []
+    qp_solver = create_qp_solver(solver_name)
+    for problem in problems:
+        if not hot_start:
+            qp_solver = create_qp_solver(solver_name)
+        t = time()
+        qp_solver.solve(*problem)
+        times.append(time() - t)
+        iterations.append(qp_solver.iterations)
+    return np.array(times), np.array(iterations)
+
+
+def print_statistics(name, data, unit=u''):
+    percentiles = [u'p{} {:.6g}{}'.format(p, v, unit) for p, v in zip(PERCENTILES, np.percentile(data, PERCENTILES))]
+    print(u'    {}: mean {:.6g}{}, {}'.format(name, np.mean(data), unit, u', '.join(percentiles)))
+
+
+def main(files):
+    solver_names = []
+    for solver_name in SOLVERS:
+        try:
+            create_qp_solver(solver_name)
+            solver_names.append(solver_name)
+        except ImportError as e:
+            print(u'{} is not installed: {}'.format(solver_name, e))
+    histories = OrderedDict()
+    for file_name in files:
+        if file_name.endswith(u'.npz'):
+            histories[file_name] = QPDiagnostics.from_file(file_name)
+        else:
+            histories[file_name] = record(file_name, solver_names[0])
+    for file_name, history in histories.items():
+        b_names, bA_names = history.get()[:2]
+        print(u'{}: {} ticks, {} variables, {} constraints in the last tick'.format(file_name, len(history),
+                                                                                   len(b_names), len(bA_names)))
+        for solver_name in solver_names:
+            for hot_start in [False, True]:
+                times, iterations = replay(history, solver_name, hot_start)
+                print(u'  {} {}:'.format(solver_name, u'hot start' if hot_start else u'init'))
+                print_statistics(u'time', times * 1000, u'ms')
+                print_statistics(u'iterations', iterations)
+
+
+if __name__ == u'__main__':
+    main(sys.argv[1:] if len(sys.argv) > 1 else ROBOTS)
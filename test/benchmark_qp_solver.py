@@ -0,0 +1,121 @@
+"""
+Compares the solve time per tick of the qp solver backends on the bundled robots.
+Each robot moves all of its leaf links to random positions, starting from the zero joint state.
+Also measures the memory allocated per tick by filter_zero_weight_constraints, if tracemalloc is available.
+Run from the test folder: python benchmark_qp_solver.py
+"""
+from __future__ import print_function
+
+from collections import OrderedDict
+from time import time
+
+import numpy as np
+
+import giskardpy
+
+giskardpy.WORLD_IMPLEMENTATION = None
+from giskardpy import casadi_wrapper as w
+from giskardpy.data_types import JointConstraint, SoftConstraint
+from giskardpy.qp_problem_builder import QProblemBuilder
+from giskardpy.qp_solver import create_qp_solver
+from giskardpy.robot import Robot
+
+ROBOTS = [u'urdfs/pr2_with_base.urdf', u'urdfs/boxy.urdf', u'urdfs/iai_donbot.urdf']
+SOLVERS = [u'qpoases', u'osqp']
+NUMBER_OF_TICKS = 200
+SAMPLE_PERIOD = 0.05
+
+
+def build_problem(robot, history_size=0):
+    joint_names = robot.get_movable_joints()
+    joint_symbols = [robot.get_joint_position_symbol(joint_name) for joint_name in joint_names]
+    joint_constraints = OrderedDict((joint_name, JointConstraint(-1, 1, 0.01, 0)) for joint_name in joint_names)
+    soft_constraints = OrderedDict()
+    goal_symbols = []
+    root = robot.get_root()
+    for leaf in robot.get_leaves():
+        if not robot.get_chain(root, leaf, links=False, fixed=False):
+            continue
+        fk = robot.get_fk_expression(root, leaf)
+        for i, axis in enumerate(u'xyz'):
+            goal = w.Symbol(u'{}_{}'.format(leaf, axis))
+            goal_symbols.append(goal)
+            error = goal - fk[i, 3]
+            soft_constraints[u'{}/{}'.format(leaf, axis)] = SoftConstraint(error, error, 1, fk[i, 3], False,
+                                                                           -1e9, 1e9, 0)
+    qp_problem_builder = QProblemBuilder(joint_constraints, OrderedDict(), soft_constraints, joint_symbols,
+                                         history_size=history_size)
+    return qp_problem_builder, joint_symbols, goal_symbols
+
+
+def run(qp_problem_builder, joint_symbols, goal_symbols, solver_name):
+    qp_solver = create_qp_solver(solver_name)
+    np.random.seed(1337)
+    values = {str(s): 0. for s in joint_symbols}
+    values.update({str(s): np.random.uniform(-1, 1) for s in goal_symbols})
+    solve_time = 0
+    joint_velocities = np.zeros(len(joint_symbols))
+    for i in range(NUMBER_OF_TICKS):
+        substitutions = [values[x] for x in qp_problem_builder.get_expr()]
+        np_H, np_A, np_lb, np_ub, np_lbA, np_ubA, np_g = qp_problem_builder.compiled_big_ass_M.call2(substitutions)
+        H, A, lb, ub, lbA, ubA, g = qp_problem_builder.filter_zero_weight_constraints(np_H, np_A, np_lb, np_ub,
+                                                                                     np_lbA, np_ubA, np_g)
+        t = time()
+        xdot_full = qp_solver.solve(H, g, A, lb, ub, lbA, ubA, None,
+                                    qp_problem_builder.filtered_b_names, qp_problem_builder.filtered_bA_names)
+        solve_time += time() - t
+        # joints with zero weight are filtered, xdot_full only contains the remaining ones
+        joint_velocities[:] = 0
+        joint_velocities[qp_problem_builder.joint_b_index] = xdot_full[:len(qp_problem_builder.joint_b_index)]
+        for joint_symbol, velocity in zip(joint_symbols, joint_velocities):
+            values[str(joint_symbol)] += velocity * SAMPLE_PERIOD
+    return solve_time / NUMBER_OF_TICKS, joint_velocities
+
+
+def filter_memory_peak(qp_problem_builder, joint_symbols, goal_symbols):
+    """
+    :return: peak of the memory in bytes that filter_zero_weight_constraints allocates temporarily in a tick
+    :rtype: int
+    """
+    import tracemalloc
+    values = {str(s): 0. for s in joint_symbols + goal_symbols}
+    substitutions = [values[x] for x in qp_problem_builder.get_expr()]
+    matrices = qp_problem_builder.compiled_big_ass_M.call2(substitutions)
+    tracemalloc.start()
+    qp_problem_builder.filter_zero_weight_constraints(*matrices)
+    current = tracemalloc.get_traced_memory()[0]
+    for i in range(NUMBER_OF_TICKS):
+        qp_problem_builder.filter_zero_weight_constraints(*matrices)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - current
+
+
+def main():
+    for urdf in ROBOTS:
+        with open(urdf, u'r') as f:
+            robot = Robot(f.read())
+        qp_problem_builder, joint_symbols, goal_symbols = build_problem(robot)
+        print(u'{}: {} joints, {} soft constraints'.format(robot.get_name(), len(joint_symbols),
+                                                           len(goal_symbols)))
+        try:
+            print(u'  filter: {} bytes allocated per tick'.format(
+                filter_memory_peak(qp_problem_builder, joint_symbols, goal_symbols)))
+        except ImportError:
+            pass
+        results = OrderedDict()
+        for solver_name in SOLVERS:
+            try:
+                results[solver_name] = run(qp_problem_builder, joint_symbols, goal_symbols, solver_name)
+            except ImportError as e:
+                print(u'  {} is not installed: {}'.format(solver_name, e))
+                continue
+            print(u'  {}: {:.6f}s per tick'.format(solver_name, results[solver_name][0]))
+        if len(results) == len(SOLVERS):
+            velocities = [x[1] for x in results.values()]
+            print(u'  max difference of the last joint velocities: {:.6f}'.format(
+                np.max(np.abs(velocities[0] - velocities[1]))))
+
+
+if __name__ == u'__main__':
+    main()
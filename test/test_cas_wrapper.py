@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 import PyKDL
@@ -192,6 +193,41 @@ class TestCASWrapper(unittest.TestCase):
             rotation_matrix(angle, axis))
 
 
+    @given(unit_vector(length=3),
+           angle())
+    def test_compiled_function_pickle(self, axis, angle):
+        axis_s = [w.Symbol(u'x'), w.Symbol(u'y'), w.Symbol(u'z')]
+        angle_s = w.Symbol(u'angle')
+        f = w.speed_up(w.rotation_matrix_from_axis_angle(w.vector3(*axis_s), angle_s), axis_s + [angle_s])
+        f2 = pickle.loads(pickle.dumps(f))
+        self.assertEqual(f.str_params, f2.str_params)
+        np.testing.assert_array_almost_equal(f2.call2(list(axis) + [angle]),
+                                             rotation_matrix(angle, axis))
+
+    def test_speed_up_gcc(self):
+        axis_s = [w.Symbol(u'x'), w.Symbol(u'y'), w.Symbol(u'z')]
+        angle_s = w.Symbol(u'angle')
+        expr = w.rotation_matrix_from_axis_angle(w.vector3(*axis_s), angle_s)
+        f = w.speed_up(expr, axis_s + [angle_s])
+        f_gcc = w.speed_up(expr, axis_s + [angle_s], backend=u'gcc')
+        self.assertIsNotNone(f_gcc.library)
+        f_gcc2 = pickle.loads(pickle.dumps(f_gcc))
+        for args in [[1, 0, 0, 0.5], [0, 0, 1, -2], [0.6, 0.8, 0, 3]]:
+            np.testing.assert_array_almost_equal(f_gcc.call2(args), f.call2(args))
+            np.testing.assert_array_almost_equal(f_gcc2.call2(args), f.call2(args))
+
+    @given(float_no_nan_no_inf(),
+           float_no_nan_no_inf())
+    def test_speed_up_sparse(self, a, b):
+        a_s = w.Symbol(u'a')
+        b_s = w.Symbol(u'b')
+        f = w.speed_up_sparse([w.diag(a_s, 0, b_s), w.Matrix([a_s * b_s, 0, 1]), w.sparse_zeros(2, 1)], [a_s, b_s])
+        f2 = pickle.loads(pickle.dumps(f))
+        for m, v, z in [f.call2([a, b]), f2.call2([a, b])]:
+            np.testing.assert_array_almost_equal(m, np.diag([a, 0, b]))
+            np.testing.assert_array_almost_equal(v, [a * b, 0, 1])
+            np.testing.assert_array_almost_equal(z, [0, 0])
+
     @given(vector(3),
            vector(3))
     def test_cross(self, u, v):
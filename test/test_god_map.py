@@ -5,6 +5,7 @@ import giskardpy
 giskardpy.WORLD_IMPLEMENTATION = None
 import unittest
 from collections import namedtuple
+from threading import Thread
 
 from geometry_msgs.msg import PoseStamped
 from hypothesis import given, assume
@@ -305,6 +306,159 @@ class TestGodMap(unittest.TestCase):
             gm.to_symbol([key])
         self.assertEqual(len(gm.get_values(keys)), len(keys))
 
+    @given(lists_of_same_length([variable_name(), st.floats(allow_nan=False)], unique=True))
+    def test_symbol_vector(self, keys_values):
+        keys, values = keys_values
+        gm = GodMap()
+        for key, value in zip(keys, values):
+            gm.set_data([key], value)
+            gm.to_symbol([key])
+        symbol_vector = gm.get_symbol_vector(keys)
+        data = symbol_vector.data
+        np.testing.assert_array_equal(symbol_vector.update(), values)
+        for key, value in zip(keys, values):
+            gm.set_data([key], value + 1)
+        np.testing.assert_array_equal(symbol_vector.update(), np.array(values) + 1)
+        self.assertIs(symbol_vector.update(), data)
+
+    def test_symbol_vector_shared_prefix(self):
+        Point = namedtuple(u'Point', [u'x', u'y'])
+        gm = GodMap()
+        gm.set_data([u'a'], {u'p': Point(1, 2), u'l': [3, 4]})
+        keys = [[u'a', u'p', u'x'], [u'a', u'p', u'y'], [u'a', u'l', 1], [u'a', u'muh']]
+        symbols = [str(gm.to_symbol(key)) for key in keys]
+        symbol_vector = gm.get_symbol_vector(symbols)
+        np.testing.assert_array_equal(symbol_vector.update(), [1, 2, 4, gm.default_value])
+        gm.set_data([u'a', u'p'], Point(5, 6))
+        gm.set_data([u'a', u'muh'], 7)
+        np.testing.assert_array_equal(symbol_vector.update(), [5, 6, 4, 7])
+
+    def test_symbol_vector_skips_unchanged_namespaces(self):
+        gm = GodMap()
+        gm.set_data([u'a'], {u'x': 1})
+        gm.set_data([u'b'], {u'x': 2})
+        gm.add_versioned_namespace([u'a'])
+        gm.add_versioned_namespace([u'b'])
+        symbols = [str(gm.to_symbol([u'a', u'x'])), str(gm.to_symbol([u'b', u'x']))]
+        symbol_vector = gm.get_symbol_vector(symbols)
+        np.testing.assert_array_equal(symbol_vector.update(), [1, 2])
+        gm.get_data([u'a'])[u'x'] = 3
+        gm.set_data([u'b', u'x'], 4)
+        np.testing.assert_array_equal(symbol_vector.update(), [1, 4])
+        gm.mark_changed([u'a'])
+        np.testing.assert_array_equal(symbol_vector.update(), [3, 4])
+
+    def test_symbol_vector_refreshes_unversioned_namespaces(self):
+        gm = GodMap()
+        gm.set_data([u'a'], {u'b': {u'x': 1}})
+        gm.set_data([u'c'], {u'x': 2})
+        gm.add_versioned_namespace([u'c'])
+        symbols = [str(gm.to_symbol([u'a', u'b', u'x'])), str(gm.to_symbol([u'c', u'x']))]
+        symbol_vector = gm.get_symbol_vector(symbols)
+        np.testing.assert_array_equal(symbol_vector.update(), [1, 2])
+        gm.get_data([u'a', u'b'])[u'x'] = 3
+        np.testing.assert_array_equal(symbol_vector.update(), [3, 2])
+
+    def test_snapshot_mode(self):
+        gm = GodMap()
+        gm.set_data([u'a'], 1)
+        gm.start_snapshot_mode()
+        result = []
+
+        def read():
+            result.append(gm.get_data([u'a']))
+
+        with gm.lock:
+            # neither the writer nor the readers wait for the lock in snapshot mode
+            gm.set_data([u'a'], 2)
+            self.assertEqual(gm.get_data([u'a']), 2)
+            t = Thread(target=read)
+            t.start()
+            t.join(1)
+            self.assertFalse(t.is_alive())
+        gm.publish_snapshot()
+        t = Thread(target=read)
+        t.start()
+        t.join()
+        self.assertEqual(result, [1, 2])
+
+        def write_and_read():
+            gm.set_data([u'b'], 3)
+            result.append(gm.get_data([u'b']))
+
+        # other threads see their own changes immediately, the writer after its next publish
+        t = Thread(target=write_and_read)
+        t.start()
+        t.join()
+        self.assertEqual(result[-1], 3)
+        self.assertEqual(gm.get_data([u'b']), 0)
+        gm.publish_snapshot()
+        self.assertEqual(gm.get_data([u'b']), 3)
+        gm.stop_snapshot_mode()
+        self.assertEqual(gm.get_data([u'b']), 3)
+
+    def test_snapshot_mode_copy_on_write(self):
+        gm = GodMap()
+        d = {u'x': {u'y': 1, u'z': 1}, u'l': [1, 2]}
+        gm.set_data([u'd'], d)
+        gm.start_snapshot_mode()
+        gm.set_data([u'd', u'x', u'y'], 2)
+        gm.set_data([u'd', u'x', u'z'], 2)
+        gm.set_data([u'd', u'l', 0], 3)
+        result = []
+
+        def read():
+            result.append((gm.get_data([u'd', u'x', u'y']), gm.get_data([u'd', u'x', u'z']),
+                           gm.get_data([u'd', u'l', 0])))
+
+        # the published dicts and lists are not changed by the writer
+        t = Thread(target=read)
+        t.start()
+        t.join()
+        self.assertEqual(result[-1], (1, 1, 1))
+        self.assertEqual(d, {u'x': {u'y': 1, u'z': 1}, u'l': [1, 2]})
+        self.assertEqual(gm.get_data([u'd', u'x', u'y']), 2)
+        gm.publish_snapshot()
+        t = Thread(target=read)
+        t.start()
+        t.join()
+        self.assertEqual(result[-1], (2, 2, 3))
+        # a published snapshot stays the same after the next write
+        gm.set_data([u'd', u'x', u'y'], 4)
+        t = Thread(target=read)
+        t.start()
+        t.join()
+        self.assertEqual(result[-1], (2, 2, 3))
+        gm.stop_snapshot_mode()
+        self.assertEqual(gm.get_data([u'd', u'x', u'y']), 4)
+
+    def test_snapshot_mode_symbol_vector(self):
+        gm = GodMap()
+        gm.set_data([u'a'], 1)
+        gm.add_versioned_namespace([u'a'])
+        symbol = str(gm.to_symbol([u'a']))
+        writer_vector = gm.get_symbol_vector([symbol])
+        reader_vector = gm.get_symbol_vector([symbol])
+        gm.start_snapshot_mode()
+        result = []
+
+        def read():
+            result.append(reader_vector.update()[0])
+
+        with gm.lock:
+            gm.set_data([u'a'], 2)
+            self.assertEqual(writer_vector.update()[0], 2)
+            t = Thread(target=read)
+            t.start()
+            t.join(1)
+            self.assertFalse(t.is_alive())
+        gm.publish_snapshot()
+        t = Thread(target=read)
+        t.start()
+        t.join()
+        self.assertEqual(result, [1, 2])
+        gm.stop_snapshot_mode()
+
     def test_god_map_with_world(self):
         gm = GodMap()
         w = World()
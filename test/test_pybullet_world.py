@@ -1,17 +1,19 @@
 import shutil
 from collections import defaultdict
-from itertools import product
+from itertools import product, combinations
 
+import numpy as np
 import pybullet as p
 import pytest
 from geometry_msgs.msg import Pose, Point, Quaternion
 
 import giskardpy.pybullet_wrapper as pbw
 from giskardpy import logging
+from giskardpy.data_types import Collisions
 from giskardpy.pybullet_world import PyBulletWorld
 from giskardpy.pybullet_world_object import PyBulletWorldObject
 from giskardpy.robot import Robot
-from giskardpy.utils import make_world_body_box, make_world_body_sphere, make_world_body_cylinder
+from giskardpy.utils import make_world_body_box, make_world_body_sphere, make_world_body_cylinder, KeyDefaultDict
 from giskardpy.world_object import WorldObject
 from utils_for_tests import pr2_urdf, base_bot_urdf, donbot_urdf
 
@@ -126,6 +128,13 @@ class TestPyBulletRobot(test_world.TestRobot):
         actual = r.get_self_collision_matrix()
         assert expected == actual
 
+    def test_calc_collision_matrix_with_processes(self, test_folder):
+        r = self.cls(donbot_urdf(), path_to_data_folder=test_folder)
+        link_combinations = set(combinations(r.get_link_names_with_collision(), 2))
+        expected = r.calc_collision_matrix(link_combinations)
+        r.number_of_processes = 4
+        assert r.calc_collision_matrix(link_combinations) == expected
+
     def test_attach_urdf_object1_2(self, test_folder):
         parsed_pr2 = self.cls(donbot_urdf(), path_to_data_folder=test_folder)
         parsed_pr2.init_self_collision_matrix()
@@ -145,6 +154,25 @@ class TestPyBulletRobot(test_world.TestRobot):
         assert scm.difference(parsed_pr2.get_self_collision_matrix()) == set()
         assert len(scm) < len(parsed_pr2.get_self_collision_matrix())
 
+    def test_attachment_collision_matrix_cache(self, test_folder, delete_test_folder):
+        r = self.cls(donbot_urdf(), path_to_data_folder=test_folder)
+        r.init_self_collision_matrix()
+        box = self.cls.from_world_body(make_world_body_box())
+        p = Pose()
+        p.position = Point(0, 0, 0.1)
+        p.orientation = Quaternion(0, 0, 0, 1)
+        attachment_hash = r.get_attachment_hash(box, u'gripper_tool_frame', p)
+        assert not r.load_attachment_collision_matrix(attachment_hash)
+        r.attach_urdf_object(box, u'gripper_tool_frame', p)
+        expected = set(r.get_self_collision_matrix())
+        r.detach_sub_tree(box.get_name())
+
+        p.position = Point(0, 0, 0.10001)
+        assert r.get_attachment_hash(box, u'gripper_tool_frame', p) == attachment_hash
+        assert r.get_attachment_hash(box, u'ur5_wrist_3_link', p) != attachment_hash
+        r.attach_urdf_object(box, u'gripper_tool_frame', p)
+        assert r.get_self_collision_matrix() == expected
+
     def test_detach_object2(self, test_folder):
         r = self.cls(donbot_urdf(), path_to_data_folder=test_folder)
         r.init_self_collision_matrix()
@@ -449,6 +477,83 @@ class TestPyBulletWorld(test_world.TestWorld):
         for i in range(160):
             assert len(w.check_collisions(cut_off_distances).all_collisions) == 60
 
+    def test_check_collisions_closest(self, test_folder):
+        w = self.make_world_with_pr2()
+        pr22 = self.cls(pr2_urdf())
+        pr22.set_name('pr22')
+        w.add_object(pr22)
+        base_pose = Pose()
+        base_pose.position.x = 0.05
+        base_pose.orientation.w = 1
+        w.set_object_pose('pr22', base_pose)
+        min_dist = defaultdict(lambda: {u'zero_weight_distance': 0.1})
+        cut_off_distances = w.collision_goals_to_collision_matrix([], min_dist)
+        collision_list_size = 5
+        collisions = w.check_collisions(cut_off_distances, collision_list_size)
+
+        distances = defaultdict(list)
+        for contact in collisions.items():
+            if contact['body_b'] != w.robot.get_name():
+                movable_joint = w.robot.get_controlled_parent_joint(contact['link_a'])
+                distances[w.robot.get_child_link_of_joint(movable_joint)].append(contact['contact_distance'])
+        assert len(distances) > 0
+        for link_a, link_distances in distances.items():
+            expected = sorted(link_distances)[:collision_list_size]
+            number_of_collisions = collisions.get_number_of_external_collisions(link_a)
+            assert number_of_collisions == len(expected)
+            result = collisions.get_external_collisions(link_a)
+            assert result.shape == (collision_list_size, Collisions.SIZE)
+            np.testing.assert_array_almost_equal(result[:number_of_collisions, Collisions.CONTACT_DISTANCE],
+                                                 expected)
+            assert np.all(result[number_of_collisions:, Collisions.CONTACT_DISTANCE] == 100)
+
+    def test_get_closest_points(self, test_folder):
+        w = self.make_world_with_pr2()
+        pr22 = self.cls(pr2_urdf())
+        pr22.set_name('pr22')
+        w.add_object(pr22)
+        base_pose = Pose()
+        base_pose.position.x = 0.05
+        base_pose.orientation.w = 1
+        w.set_object_pose('pr22', base_pose)
+        min_dist = defaultdict(lambda: {u'zero_weight_distance': 0.1})
+        cut_off_distances = w.collision_goals_to_collision_matrix([], min_dist)
+        # only a few links of pr22, so that some entries are checked individually
+        cut_off_distances.update({(link1, 'pr22', link2): 0.05 for link1, link2 in
+                                  product(w.robot.get_link_names_with_collision(),
+                                          pr22.get_link_names_with_collision()[:5])})
+
+        expected = []
+        for (link_a, body_b, link_b), distance in cut_off_distances.items():
+            body_b_object = w.robot if body_b == w.robot.get_name() else w.get_object(body_b)
+            for contact in p.getClosestPoints(w.robot.get_pybullet_id(), body_b_object.get_pybullet_id(),
+                                              distance * 1.1,
+                                              w.robot.get_pybullet_link_id(link_a),
+                                              body_b_object.get_pybullet_link_id(link_b)):
+                expected.append((link_a, body_b, link_b, round(contact[8], 6)))
+
+        contacts = w.get_closest_points(cut_off_distances)
+        actual = [(c['link_a'], c['body_b'], c['link_b'], round(c['contact_distance'], 6)) for c in contacts]
+        assert sorted(actual) == sorted(expected)
+
+    def test_should_flip_collision(self, test_folder):
+        w = self.make_world_with_pr2()
+        pr22 = self.cls(pr2_urdf())
+        pr22.set_name('pr22')
+        w.add_object(pr22)
+        base_pose = Pose()
+        base_pose.position.x = 0.05
+        base_pose.orientation.w = 1
+        w.set_object_pose('pr22', base_pose)
+        min_dist = defaultdict(lambda: {u'zero_weight_distance': 0.1})
+        cut_off_distances = w.collision_goals_to_collision_matrix([], min_dist)
+        aabbs = KeyDefaultDict(w.get_aabb)
+        contacts = w.get_closest_points(cut_off_distances)
+        assert len(contacts) > 0
+        for contact in contacts:
+            assert w.should_flip_collision(contact, aabbs) == \
+                   w.should_flip_collision_by_query(contact['position_on_a'], contact['link_a'])
+
     # TODO test that has collision entries of robot links without collision geometry
 
     # TODO test that makes sure adding avoid specific self collisions works
@@ -1,6 +1,15 @@
+import os
+from collections import OrderedDict
+
 import numpy as np
+import pytest
 
-from giskardpy.qp_solver import QPSolver
+from giskardpy import casadi_wrapper as w
+from giskardpy.data_types import JointConstraint, HardConstraint, SoftConstraint
+from giskardpy.qp_diagnostics import QPDiagnostics
+from giskardpy.qp_problem_builder import QProblemBuilder
+from giskardpy.qp_solver_osqp import QPSolverOSQP
+from giskardpy.qp_solver_qpoases import QPSolverQPOases
 
 
 def test_simple_problem():
@@ -11,7 +20,7 @@ def test_simple_problem():
     lb = np.array([-10., -10.])
     ub = np.array([10., 10.])
 
-    qp = QPSolver()
+    qp = QPSolverQPOases()
     x = qp.solve(H, g, A, lb, ub, lba, lba)
     np.testing.assert_array_almost_equal(x, np.array([5, 5]), decimal=4)
 
@@ -27,7 +36,7 @@ def test_simple_problem_split():
     lb = np.array([-10., -10., -1e9, -1e9])
     ub = np.array([10., 10., 1e9, 1e9])
 
-    qp = QPSolver()
+    qp = QPSolverQPOases()
     x1 = qp.solve(H, g, A, lb, ub, lba, lba)
     print(x1)
 
@@ -38,7 +47,7 @@ def test_simple_problem_split():
     lb = np.array([-10., -10., -1e9])
     ub = np.array([10., 10., 1e9])
 
-    qp = QPSolver()
+    qp = QPSolverQPOases()
     x2 = qp.solve(H, g, A, lb, ub, lba, lba)
     print(x2)
 
@@ -49,7 +58,7 @@ def test_simple_problem_split():
     lb = np.array([-10., -10., -1e9])
     ub = np.array([10., 10., 1e9])
 
-    qp = QPSolver()
+    qp = QPSolverQPOases()
     x3 = qp.solve(H, g, A, lb, ub, lba, lba)
     print(x3)
 
@@ -64,7 +73,7 @@ def test_simple_problem_split():
     lb = np.array([-10., -10., -1e9, -1e9, -1e9, -1e9])
     ub = np.array([10., 10., 1e9, 1e9, 1e9, 1e9])
 
-    qp = QPSolver()
+    qp = QPSolverQPOases()
     x4 = qp.solve(H, g, A, lb, ub, lba, lba)
     print(x4)
 
@@ -79,7 +88,7 @@ def test_simple_problem_split():
     lb = np.array([-10., -10., -1e9, -1e9, -1e9, -1e9])
     ub = np.array([10., 10., 1e9, 1e9, 1e9, 1e9])
 
-    qp = QPSolver()
+    qp = QPSolverQPOases()
     x5 = qp.solve(H, g, A, lb, ub, lba, lba)
     print(x5)
     print((x2[:2] + x3[:2]) / 2)
@@ -87,6 +96,72 @@ def test_simple_problem_split():
     # np.testing.assert_array_almost_equal(x, np.array([5.,5.]), decimal=4)
 
 
+def test_hot_start_with_different_constraints():
+    qp = QPSolverQPOases()
+    H = np.diag([1., 1, 10, 100])
+    A = np.array([[1., 1, 1, 0],
+                  [1, 0, 0, 1]])
+    g = np.zeros(4)
+    lb = np.array([-10., -10., -1e9, -1e9])
+    ub = np.array([10., 10., 1e9, 1e9])
+    lba = np.array([10., 5.])
+    qp.solve(H, g, A, lb, ub, lba, lba, b_names=np.array([u'j1', u'j2', u's1', u's2']),
+             bA_names=np.array([u's1', u's2']))
+
+    # s1 is gone and s3 is new
+    H = np.diag([1., 1, 1000])
+    A = np.array([[0., 1, 1]])
+    g = np.zeros(3)
+    lb = np.array([-10., -10., -1e9])
+    ub = np.array([10., 10., 1e9])
+    lba = np.array([3.])
+    x = qp.solve(H, g, A, lb, ub, lba, lba, b_names=np.array([u'j1', u'j2', u's3']), bA_names=np.array([u's3']))
+    assert qp.shape == (2, 4)
+    assert qp.b_slots == [u'j1', u'j2', u's3', None]
+    np.testing.assert_array_almost_equal(x, QPSolverQPOases().solve(H, g, A, lb, ub, lba, lba), decimal=4)
+
+
+def equality_constrained_solution(H, A, b):
+    """
+    Closed form solution of min x^T*H*x s.t. A*x = b, which is the solution of the qp if no bound is active.
+    """
+    H_inv_A_T = np.linalg.solve(H, A.T)
+    return H_inv_A_T.dot(np.linalg.solve(A.dot(H_inv_A_T), b))
+
+
+def test_osqp():
+    H = np.diag([1., 1, 10, 100])
+    A = np.array([[1., 1, 1, 0],
+                  [1, 0, 0, 1]])
+    g = np.zeros(4)
+    lba = np.array([10., 5.])
+    lb = np.array([-10., -10., -1e9, -1e9])
+    ub = np.array([10., 10., 1e9, 1e9])
+    qp = QPSolverOSQP()
+    x = qp.solve(H, g, A, lb, ub, lba, lba)
+    np.testing.assert_array_almost_equal(x, equality_constrained_solution(H, A, lba), decimal=4)
+
+    # entry outside of the sparsity pattern
+    A[1, 1] = 1
+    x = qp.solve(H, g, A, lb, ub, lba, lba)
+    np.testing.assert_array_almost_equal(x, equality_constrained_solution(H, A, lba), decimal=4)
+    assert qp.A_pattern.mask[1, 1]
+    assert qp.iterations > 0
+
+
+def test_diagonal_H():
+    weights = np.array([1., 1, 10, 100])
+    A = np.array([[1., 1, 1, 0],
+                  [1, 0, 0, 1]])
+    g = np.zeros(4)
+    lba = np.array([10., 5.])
+    lb = np.array([-10., -10., -1e9, -1e9])
+    ub = np.array([10., 10., 1e9, 1e9])
+    expected = QPSolverQPOases().solve(np.diag(weights), g, A, lb, ub, lba, lba)
+    np.testing.assert_array_almost_equal(QPSolverQPOases().solve(weights, g, A, lb, ub, lba, lba), expected)
+    np.testing.assert_array_almost_equal(QPSolverOSQP().solve(weights, g, A, lb, ub, lba, lba), expected, decimal=4)
+
+
 def test_non_diagonal_H():
     H = np.array([[1, -0.5],
                   [-1, -1]])
@@ -96,8 +171,190 @@ def test_non_diagonal_H():
     lb = np.array([-10., -10.])
     ub = np.array([10., 10.])
 
-    qp = QPSolver()
+    qp = QPSolverQPOases()
     x = qp.solve(H, g, A, lb, ub, lba, lba)
     print(x)
     print(qp.qpProblem.getObjVal())
     # np.testing.assert_array_almost_equal(x, np.array([5,5]), decimal=4)
+
+
+def test_jacobian_cache():
+    j1 = w.Symbol(u'j1')
+    j2 = w.Symbol(u'j2')
+    joint_constraints = OrderedDict([(u'j1', JointConstraint(-1, 1, 0.1, 0)),
+                                     (u'j2', JointConstraint(-1, 1, 0.1, 0))])
+    hard_constraints = OrderedDict([(u'j1', HardConstraint(-1 - j1, 1 - j1, j1))])
+    soft_constraints = OrderedDict([(u's1', SoftConstraint(-j1, 1, 1, j1 * j2, False, -1e9, 1e9, 0))])
+    jacobian_cache = {}
+    QProblemBuilder(joint_constraints, hard_constraints, soft_constraints, [j1, j2], jacobian_cache=jacobian_cache)
+    assert len(jacobian_cache) == 2
+
+    soft_constraints[u's2'] = SoftConstraint(0, 1, 1, j1 + 3 * j2, False, -1e9, 1e9, 0)
+    cached = QProblemBuilder(joint_constraints, hard_constraints, soft_constraints, [j1, j2],
+                             jacobian_cache=jacobian_cache)
+    assert len(jacobian_cache) == 3
+    uncached = QProblemBuilder(joint_constraints, hard_constraints, soft_constraints, [j1, j2])
+    args = {u'j1': 0.5, u'j2': 2.}
+    A1 = cached.compiled_big_ass_M.call2([args[x] for x in cached.get_expr()])[1]
+    A2 = uncached.compiled_big_ass_M.call2([args[x] for x in uncached.get_expr()])[1]
+    np.testing.assert_array_almost_equal(A1, A2)
+    np.testing.assert_array_almost_equal(A1, [[1, 0, 0, 0],
+                                              [2, 0.5, 1, 0],
+                                              [1, 3, 0, 1]])
+
+    # same name with a different expression must not reuse the old row
+    soft_constraints[u's2'] = SoftConstraint(0, 1, 1, 2 * j1, False, -1e9, 1e9, 0)
+    changed = QProblemBuilder(joint_constraints, hard_constraints, soft_constraints, [j1, j2],
+                              jacobian_cache=jacobian_cache)
+    assert len(jacobian_cache) == 4
+    A3 = changed.compiled_big_ass_M.call2([args[x] for x in changed.get_expr()])[1]
+    np.testing.assert_array_almost_equal(A3, [[1, 0, 0, 0],
+                                              [2, 0.5, 1, 0],
+                                              [2, 0, 0, 1]])
+
+
+def test_filter_zero_weight_constraints():
+    j1 = w.Symbol(u'j1')
+    j2 = w.Symbol(u'j2')
+    weight = w.Symbol(u'weight')
+    joint_constraints = OrderedDict([(u'j1', JointConstraint(-1, 1, 0.1, 0)),
+                                     (u'j2', JointConstraint(-1, 1, weight, 0))])
+    hard_constraints = OrderedDict([(u'j1', HardConstraint(-1 - j1, 1 - j1, j1))])
+    soft_constraints = OrderedDict([(u's1', SoftConstraint(-j1, 1, 1, j1 * j2, False, -1e9, 1e9, 0)),
+                                    (u's2', SoftConstraint(0, 2, weight, j1 + 3 * j2, False, -1e9, 1e9, 0))])
+    qp_problem_builder = QProblemBuilder(joint_constraints, hard_constraints, soft_constraints, [j1, j2])
+
+    def filter_zero_weight_constraints(args):
+        matrices = qp_problem_builder.compiled_big_ass_M.call2([args[x] for x in qp_problem_builder.get_expr()])
+        H, A, lb, ub, lbA, ubA, g = matrices
+        b_mask = H != 0
+        bA_mask = np.concatenate(([True], b_mask[2:]))
+        expected = (H[b_mask], A[bA_mask][:, b_mask], lb[b_mask], ub[b_mask], lbA[bA_mask], ubA[bA_mask], g[b_mask])
+        filtered = qp_problem_builder.filter_zero_weight_constraints(*matrices)
+        for x, y in zip(filtered, expected):
+            np.testing.assert_array_almost_equal(x, y)
+        return filtered
+
+    filtered1 = filter_zero_weight_constraints({u'j1': 0.5, u'j2': 2., u'weight': 1})
+    b_names = qp_problem_builder.filtered_b_names
+    assert len(b_names) == 4
+    filtered2 = filter_zero_weight_constraints({u'j1': 0.2, u'j2': 1., u'weight': 2})
+    assert qp_problem_builder.filtered_b_names is b_names
+    for x, y in zip(filtered1, filtered2):
+        assert x is y
+    filter_zero_weight_constraints({u'j1': 0.2, u'j2': 1., u'weight': 0})
+    assert len(qp_problem_builder.filtered_b_names) == 2
+    assert len(qp_problem_builder.filtered_bA_names) == 2
+
+
+def test_qp_diagnostics_ring_buffer():
+    b_names = np.array([u'j -- j1', u's -- s1'])
+    bA_names = np.array([u'h -- h1', u's -- s1'])
+    diagnostics = QPDiagnostics(size=3)
+    assert len(diagnostics) == 0
+    H = np.array([1., 1.])
+    for i in range(5):
+        A = np.ones((2, 2)) * i
+        diagnostics.append(b_names, bA_names, H, np.zeros(2), A, -np.ones(2), np.ones(2), -np.ones(2) * i,
+                           np.ones(2) * i, np.array([i, -i]))
+        # the filtered buffers of the qp problem builder get overwritten in the next tick
+        A[:] = -1
+    assert len(diagnostics) == 3
+    for tick, i in [(-1, 4), (-3, 2), (0, 2), (2, 4)]:
+        b_names2, bA_names2, H, g, A, lb, ub, lbA, ubA, xdot_full = diagnostics.get(tick)
+        assert b_names2 is b_names
+        np.testing.assert_array_almost_equal(A, np.ones((2, 2)) * i)
+        np.testing.assert_array_almost_equal(ubA, np.ones(2) * i)
+        np.testing.assert_array_almost_equal(xdot_full, [i, -i])
+    diagnostics.append(b_names, bA_names, H, g, A, lb, ub, lbA, ubA)
+    assert diagnostics.get()[-1] is None
+    try:
+        diagnostics.get(3)
+        assert False
+    except IndexError:
+        pass
+
+
+def test_qp_diagnostics_disabled():
+    diagnostics = QPDiagnostics(size=0)
+    diagnostics.append(np.array([u'j -- j1']), np.array([]), np.ones(1), np.zeros(1), np.zeros((0, 1)),
+                       -np.ones(1), np.ones(1), np.zeros(0), np.zeros(0), np.zeros(1))
+    assert len(diagnostics) == 0
+
+
+def test_qp_history_save_and_replay(tmpdir):
+    j1 = w.Symbol(u'j1')
+    j2 = w.Symbol(u'j2')
+    joint_constraints = OrderedDict([(u'j1', JointConstraint(-1, 1, 0.1, 0)),
+                                     (u'j2', JointConstraint(-1, 1, 0.1, 0))])
+    hard_constraints = OrderedDict([(u'j1', HardConstraint(-1 - j1, 1 - j1, j1))])
+    soft_constraints = OrderedDict([(u's1', SoftConstraint(-j1, 1, 1, j1 * j2, False, -1e9, 1e9, 0))])
+    qp_problem_builder = QProblemBuilder(joint_constraints, hard_constraints, soft_constraints, [j1, j2],
+                                         qp_solver=QPSolverOSQP(), history_size=3)
+    solutions = []
+    for i in range(4):
+        args = {u'j1': 0.1 * i, u'j2': 2.}
+        solutions.append(qp_problem_builder.get_cmd([args[x] for x in qp_problem_builder.get_expr()])[-1].copy())
+    path = str(tmpdir.join(u'history.npz'))
+    qp_problem_builder.diagnostics.save(path)
+    history = QPDiagnostics.from_file(path)
+    assert len(history) == 3
+    np.testing.assert_array_equal(history.get()[0], qp_problem_builder.filtered_b_names)
+    for tick in range(3):
+        for x, y in zip(history.get(tick), qp_problem_builder.diagnostics.get(tick)):
+            np.testing.assert_array_equal(x, y)
+        np.testing.assert_array_almost_equal(history.replay(QPSolverOSQP(), tick), solutions[tick + 1], decimal=4)
+
+
+def test_get_cmd_returns_copies():
+    j1 = w.Symbol(u'j1')
+    j2 = w.Symbol(u'j2')
+    joint_constraints = OrderedDict([(u'j1', JointConstraint(-1, 1, 0.1, 0)),
+                                     (u'j2', JointConstraint(-1, 1, 0.1, 0))])
+    hard_constraints = OrderedDict([(u'j1', HardConstraint(-1 - j1, 1 - j1, j1))])
+    soft_constraints = OrderedDict([(u's1', SoftConstraint(-j1, 1, 1, j1 * j2, False, -1e9, 1e9, 0))])
+    qp_problem_builder = QProblemBuilder(joint_constraints, hard_constraints, soft_constraints, [j1, j2],
+                                         qp_solver=QPSolverOSQP())
+    joint_velocities = qp_problem_builder.joint_velocities
+    args = {u'j1': 0.1, u'j2': 2.}
+    result1 = qp_problem_builder.get_cmd([args[x] for x in qp_problem_builder.get_expr()])
+    expected = [x.copy() for x in result1[1:]]
+    args = {u'j1': 0.5, u'j2': 1.}
+    result2 = qp_problem_builder.get_cmd([args[x] for x in qp_problem_builder.get_expr()])
+    # the output arrays of the compiled function are overwritten by the second call
+    for x, y in zip(result1[1:], expected):
+        np.testing.assert_array_equal(x, y)
+    assert not np.allclose(result1[2], result2[2])
+    assert qp_problem_builder.joint_velocities is joint_velocities
+
+
+def test_function_cache_size(tmpdir):
+    j1 = w.Symbol(u'j1')
+    j2 = w.Symbol(u'j2')
+    joint_constraints = OrderedDict([(u'j1', JointConstraint(-1, 1, 0.1, 0)),
+                                     (u'j2', JointConstraint(-1, 1, 0.1, 0))])
+    soft_constraints = OrderedDict([(u's1', SoftConstraint(-j1, 1, 1, j1 * j2, False, -1e9, 1e9, 0))])
+    folder = str(tmpdir)
+    path_a = os.path.join(folder, u'a')
+    path_b = os.path.join(folder, u'b')
+    args = {u'j1': 0.5, u'j2': 2.}
+
+    def build(path, function_cache_size=None):
+        qp_problem_builder = QProblemBuilder(joint_constraints, OrderedDict(), soft_constraints, [j1, j2],
+                                             path, function_cache_size, u'gcc')
+        return qp_problem_builder.compiled_big_ass_M.call2([args[x] for x in qp_problem_builder.get_expr()])[1]
+
+    A = build(path_a).copy()
+    if not os.path.isfile(path_a + u'.so'):
+        pytest.skip(u'gcc is not available')
+    entry_size = os.path.getsize(path_a) + os.path.getsize(path_a + u'.so')
+    # only one pickle and its shared library fit into the cache, they are deleted together
+    build(path_b, entry_size * 1.5)
+    assert sorted(os.listdir(folder)) == [u'b', u'b.so']
+    np.testing.assert_array_almost_equal(build(path_a, entry_size * 1.5), A)
+    assert sorted(os.listdir(folder)) == [u'a', u'a.so']
+
+    # a pickle whose shared library is gone gets compiled again
+    os.remove(path_a + u'.so')
+    np.testing.assert_array_almost_equal(build(path_a), A)
+    assert os.path.isfile(path_a + u'.so')
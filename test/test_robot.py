@@ -1,6 +1,6 @@
 
 import giskardpy
-from giskardpy.data_types import SingleJointState
+from giskardpy.data_types import SingleJointState, JointStateArrays, Trajectory, QuantizedStateHistory
 from giskardpy.tfwrapper import msg_to_kdl, kdl_to_pose
 
 giskardpy.WORLD_IMPLEMENTATION = None
@@ -253,6 +253,88 @@ class TestSymengineController(object):
 
         assert set(parsed_boxy.get_joint_names_controllable()).difference(expected) == set()
 
+    def test_joint_state_arrays(self, parsed_pr2):
+        root = u'odom_combined'
+        tip = u'l_gripper_tool_frame'
+        js = OrderedDict((joint_name, SingleJointState(joint_name, 0.1 * i, 0.2))
+                         for i, joint_name in enumerate(parsed_pr2.get_movable_joints()))
+        parsed_pr2.joint_state = js
+        expected = parsed_pr2.get_fk_np(root, tip)
+        js_arrays = JointStateArrays.from_joint_states(js, parsed_pr2.controlled_joints)
+        assert js_arrays.names[:len(parsed_pr2.controlled_joints)] == parsed_pr2.controlled_joints
+        assert set(js_arrays.keys()) == set(js.keys())
+        for joint_name, single_joint_state in js.items():
+            assert js_arrays[joint_name].position == single_joint_state.position
+            assert js_arrays[joint_name].velocity == single_joint_state.velocity
+
+        parsed_pr2.joint_state = parsed_pr2.get_zero_joint_state()
+        parsed_pr2.joint_state = js_arrays
+        assert parsed_pr2.joint_state is js_arrays
+        np.testing.assert_array_almost_equal(parsed_pr2.get_fk_np(root, tip), expected)
+
+        # joint states that don't contain all joints get merged
+        partial = JointStateArrays.from_joint_states({joint_name: js[joint_name] for joint_name in list(js)[:2]})
+        parsed_pr2.joint_state = partial
+        assert parsed_pr2.joint_state is not partial
+        assert len(parsed_pr2.joint_state) == len(js)
+
+    def test_trajectory(self):
+        joint_names = [u'joint_{}'.format(i) for i in range(3)]
+        trajectory = Trajectory()
+        for time in range(200):
+            js = OrderedDict((joint_name, SingleJointState(joint_name, time + i, -time))
+                             for i, joint_name in enumerate(joint_names))
+            if time % 2 == 0:
+                # points with another order of joints are stored in the columns of the first point
+                js = JointStateArrays.from_joint_states(js, joint_names[::-1])
+            trajectory.set(time, js)
+        assert len(trajectory) == 200
+        assert trajectory.get_exact(150)[u'joint_2'].position == 152
+        assert trajectory.get_exact(150)[u'joint_2'].velocity == -150
+        assert trajectory.get_closest(150.4)[u'joint_0'].position == 150
+        with pytest.raises(KeyError):
+            trajectory.set(100, js)
+        # points with other joints would lose or make up joints
+        with pytest.raises(KeyError):
+            trajectory.set(200, JointStateArrays.from_joint_states({joint_name: js[joint_name]
+                                                                    for joint_name in joint_names[1:]}))
+        with pytest.raises(KeyError):
+            trajectory.set(200, {joint_name: SingleJointState(joint_name) for joint_name in joint_names + [u'muh']})
+
+        positions = trajectory.get_positions(joint_names[1:])
+        assert positions.base is not None
+        np.testing.assert_array_equal(positions[:, 0], np.arange(200) + 1)
+        np.testing.assert_array_equal(trajectory.get_positions(joint_names[::-1])[:, 0], np.arange(200) + 2)
+
+        trajectory.delete_last()
+        trajectory.delete(10)
+        assert len(trajectory) == 198
+        assert trajectory.keys()[10] == 11
+        assert trajectory.get_exact(11)[u'joint_0'].position == 11
+
+        sub_trajectory = trajectory.get_sub_trajectory(20, 29)
+        assert sub_trajectory.keys() == list(range(20, 30))
+        sub_trajectory.set(29, trajectory.get_exact(11))
+        assert trajectory.get_exact(29)[u'joint_0'].position == 29
+        assert sub_trajectory.get_exact(29)[u'joint_0'].position == 11
+
+    def test_quantized_state_history(self):
+        history = QuantizedStateHistory(np.array([1e3, 1e2]), 3)
+        key = history.get_key(np.array([0.1234, -0.0001]))
+        assert key == history.get_key(np.array([0.12336, 0.004]))
+        assert key != history.get_key(np.array([0.1236, 0.]))
+        assert key not in history
+        history.add(key)
+        history.add(key)
+        assert key in history
+        assert len(history) == 1
+        for i in range(1, 4):
+            history.add(history.get_key(np.array([i, 0.])))
+        # the oldest state is forgotten
+        assert key not in history
+        assert len(history) == 3
+        assert history.get_key(np.array([3, 0.])) in history
+
 
 if __name__ == '__main__':
     import rosunit
@@ -0,0 +1,66 @@
+import numpy as np
+
+from giskardpy.utils import SlidingDFT, ConvergencePredictor, get_goal_errors
+
+
+def test_sliding_dft():
+    np.random.seed(23)
+    window_size = 20
+    signals = np.random.rand(3, 200)
+    signals[1] = np.sin(np.arange(200) * 2)
+    bins = np.arange(8, window_size // 2 + 1)
+    dft = SlidingDFT(len(signals), window_size, bins)
+    for i in range(signals.shape[1]):
+        dft.append(signals[:, i])
+        if i < window_size - 1:
+            assert not dft.is_full()
+            continue
+        assert dft.is_full()
+        window = signals[:, i + 1 - window_size:i + 1]
+        expected = np.fft.rfft(window, axis=1)[:, bins]
+        np.testing.assert_array_almost_equal(dft.dft, expected)
+        np.testing.assert_array_almost_equal(dft.get_amplitudes(np.array([False, True, False])),
+                                             2.0 * np.abs(expected[1:2]) / window_size)
+
+
+def test_convergence_predictor():
+    predictor = ConvergencePredictor(window_size=5, confidence=0.9, remaining_motion=1)
+    # the velocities halve in every tick, the goal error shrinks
+    for i in range(5):
+        predictor.append(10 * 0.5 ** i, 0.1 * 0.5 ** i, 0)
+        assert not predictor.is_converged()
+    predictor.append(10 * 0.5 ** 5, 0.1 * 0.5 ** 5, 0)
+    assert predictor.get_decay_rate(predictor.velocities) == 0.5
+    assert predictor.predict_remaining_motion() == 10 * 0.5 ** 5
+    assert predictor.is_converged()
+
+    # constant velocities never converge
+    predictor = ConvergencePredictor(window_size=5, confidence=0.9, remaining_motion=1)
+    for i in range(20):
+        predictor.append(0.5, 0.1, 0)
+        assert not predictor.is_converged()
+
+    # the velocities vanish, but the goal error neither shrinks nor is it taken up by the slack
+    predictor = ConvergencePredictor(window_size=2, confidence=0.9, remaining_motion=1)
+    for i in range(3):
+        predictor.append(0.1 ** i, 0.1, 0)
+    assert not predictor.is_converged()
+    # the goal is blocked
+    predictor.append(0, 0.1, 0.1)
+    assert predictor.is_converged()
+
+
+def test_get_goal_errors():
+    # 2 joints, 1 hard constraint, 3 soft constraints, the second one has zero weight
+    H = np.array([1, 1, 1, 0, 1])
+    lbA = np.array([-1, 0.2, 0, -0.3])
+    ubA = np.array([1, 0.2, 0, -0.1])
+    # the slack of the filtered soft constraint is missing
+    xdot_full = np.array([0.1, 0.2, 0.05, -0.01])
+    goal_error, slack = get_goal_errors(H, lbA, ubA, xdot_full, 2, np.array([True, True, True]))
+    assert goal_error == 0.2
+    assert slack == 0.05
+    goal_error, slack = get_goal_errors(H, lbA, ubA, xdot_full, 2, np.array([False, False, True]))
+    np.testing.assert_almost_equal(goal_error, 0.1)
+    assert slack == 0.01
+    assert get_goal_errors(H, lbA, ubA, xdot_full, 2, np.array([False, False, False])) == (0., 0.)
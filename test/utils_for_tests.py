@@ -24,6 +24,7 @@ from sensor_msgs.msg import JointState
 from tf.transformations import rotation_from_matrix, quaternion_matrix
 
 from giskardpy import logging, identifier
+from giskardpy.data_types import Collisions
 from giskardpy.garden import grow_tree
 from giskardpy.identifier import robot, world
 from giskardpy.pybullet_world import PyBulletWorld
@@ -543,14 +544,14 @@ class GiskardTestWrapper(GiskardWrapper):
     def get_result_trajectory_position(self):
         trajectory = self.get_god_map().unsafe_get_data(identifier.trajectory)
         trajectory2 = []
-        for t, p in trajectory._points.items():
+        for t, p in trajectory.items():
             trajectory2.append({joint_name: js.position for joint_name, js in p.items()})
         return trajectory2
 
     def get_result_trajectory_velocity(self):
         trajectory = self.get_god_map().get_data(identifier.trajectory)
         trajectory2 = []
-        for t, p in trajectory._points.items():
+        for t, p in trajectory.items():
             trajectory2.append({joint_name: js.velocity for joint_name, js in p.items()})
         return trajectory2
 
@@ -737,7 +738,8 @@ class GiskardTestWrapper(GiskardWrapper):
     def get_external_collisions(self, link, distance_threshold):
         """
         :param distance_threshold:
-        :rtype: list
+        :return: rows of Collisions, sorted by contact distance
+        :rtype: np.ndarray
         """
         collision_goals = [CollisionEntry(type=CollisionEntry.AVOID_ALL_COLLISIONS, min_dist=distance_threshold)]
         collision_matrix = self.get_world().collision_goals_to_collision_matrix(collision_goals,
@@ -745,26 +747,27 @@ class GiskardTestWrapper(GiskardWrapper):
         collisions = self.get_world().check_collisions(collision_matrix)
         controlled_parent_joint = self.get_robot().get_controlled_parent_joint(link)
         controlled_parent_link = self.get_robot().get_child_link_of_joint(controlled_parent_joint)
-        collision_list = collisions.get_external_collisions(controlled_parent_link)
+        collision_list = [collisions.get_external_collisions(controlled_parent_link)]
         for key, self_collisions in collisions.self_collisions.items():
             if controlled_parent_link in key:
-                collision_list.update(self_collisions)
-        return collision_list
+                collision_list.append(self_collisions)
+        collision_list = np.vstack(collision_list)
+        return collision_list[np.argsort(collision_list[:, Collisions.CONTACT_DISTANCE])]
 
     def check_cpi_geq(self, links, distance_threshold):
         for link in links:
             collisions = self.get_external_collisions(link, distance_threshold)
-            assert collisions[0].get_contact_distance() >= distance_threshold, \
+            assert collisions[0, Collisions.CONTACT_DISTANCE] >= distance_threshold, \
                 u'distance for {}: {} >= {}'.format(link,
-                                                    collisions[0].get_contact_distance(),
+                                                    collisions[0, Collisions.CONTACT_DISTANCE],
                                                     distance_threshold)
 
     def check_cpi_leq(self, links, distance_threshold):
         for link in links:
             collisions = self.get_external_collisions(link, distance_threshold)
-            assert collisions[0].get_contact_distance() <= distance_threshold, \
+            assert collisions[0, Collisions.CONTACT_DISTANCE] <= distance_threshold, \
                 u'distance for {}: {} <= {}'.format(link,
-                                                    collisions[0].get_contact_distance(),
+                                                    collisions[0, Collisions.CONTACT_DISTANCE],
                                                     distance_threshold)
 
     def move_base(self, goal_pose):